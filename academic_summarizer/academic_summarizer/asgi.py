@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academic_summarizer.settings')
 
 application = get_asgi_application()
+
+# Only server workers (and runserver) import this module, so other manage.py commands,
+# e.g. migrate, never load the ML stack or resume jobs.
+from api import jobs
+
+jobs.start()
+
+if settings.EMBEDDINGS_WARMUP:
+    from api import pipeline
+
+    pipeline.warm_up()
@@ -40,6 +40,32 @@ DEBUG = os.getenv("DEBUG") == "True"
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "").split(",")
 
+# Load the embedding model when the worker starts instead of on the first request.
+EMBEDDINGS_WARMUP = os.getenv("EMBEDDINGS_WARMUP") == "True"
+
+# Background summarization jobs (POST /api/summarize/ with async=true), per worker process.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "16"))
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR") or str(BASE_DIR / ".cache" / "jobs")
+# A queued or running job whose worker has not heartbeated for this long is taken over by another.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# On-disk FAISS index of the cross-paper search corpus (api.corpus).
+CORPUS_INDEX_PATH = os.getenv("CORPUS_INDEX_PATH") or str(BASE_DIR / ".cache" / "corpus" / "index.faiss")
+
+# Most queries accepted by one POST /api/summarize/batch/.
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+
+# Uploads up to this size stay in memory and are opened by PyMuPDF in place; larger
+# ones are spooled to a temporary file that Django deletes after the request.
+# HashingUploadHandler computes the paper cache key while the upload is received.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("UPLOAD_MAX_MEMORY_BYTES", str(16 * 1024 * 1024)))
+FILE_UPLOAD_HANDLERS = [
+    "api.uploads.HashingUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
 
 
 # Application definition
@@ -134,3 +160,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Logging: surface pipeline timings (model load, warm-up) and job events from the apps.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'rag': {'handlers': ['console'], 'level': os.getenv("LOG_LEVEL", "INFO")},
+        'llm': {'handlers': ['console'], 'level': os.getenv("LOG_LEVEL", "INFO")},
+        'api': {'handlers': ['console'], 'level': os.getenv("LOG_LEVEL", "INFO")},
+    },
+}
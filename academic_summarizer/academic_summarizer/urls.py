@@ -18,10 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
 
 from academic_summarizer.views import HomeView, SummarizeToolView
+from api.views import HealthView, MetricsView, ReadinessView
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('summarize/', SummarizeToolView.as_view(), name='summarize'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('healthz', HealthView.as_view(), name='healthz'),
+    path('readyz', ReadinessView.as_view(), name='readyz'),
 ]
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import Paper, SummaryJob
+
+
+@admin.register(SummaryJob)
+class SummaryJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "started_at", "finished_at")
+
+
+@admin.register(Paper)
+class PaperAdmin(admin.ModelAdmin):
+    list_display = ("id", "title", "chunk_count", "deleted", "created_at")
+    list_filter = ("deleted",)
+    search_fields = ("title", "content_hash")
@@ -0,0 +1,257 @@
+"""
+Persistent cross-paper search corpus.
+
+Papers and chunks live in the database (Paper, Chunk), together with each chunk's
+embedding. A FAISS index on disk (settings.CORPUS_INDEX_PATH) maps vector ids to
+Chunk ids, so a search only embeds the query. The database is the source of truth:
+
+- ingest() appends a paper's vectors to the index incrementally and saves it.
+- delete() only sets Paper.deleted (a tombstone); search skips tombstoned papers.
+- compact() rebuilds the index from the live chunks, retraining approximate index
+  types for the current corpus size, and purges tombstoned papers.
+
+Each worker process keeps the index in memory. Before searching it picks up chunks
+other workers ingested (by id, from their stored embeddings) and reloads the file
+after another process saved it.
+
+Writers in every process (ingest, compact) hold an exclusive lock on a file next to
+the index (CORPUS_INDEX_PATH + ".lock") while they insert chunks and rewrite the
+index, so two gunicorn workers never overwrite each other's file. Because chunks
+are inserted under that lock too, chunk ids are committed in increasing order, and
+catching up on "ids above the largest one indexed" never skips a chunk.
+
+Searches do not wait for writers. An index is never changed once other threads can
+see it: catch-up adds to a copy, which then replaces the shared reference, so the
+FAISS search itself runs outside the lock.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, fine for a single dev server.
+    fcntl = None
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Chunk, Paper
+
+logger = logging.getLogger(__name__)
+
+# Fetch extra neighbours so tombstoned chunks filtered out of a result still leave k hits.
+_OVERFETCH = 4
+
+_lock = threading.Lock()
+_index = None
+# (inode, mtime_ns, size) of the index file last loaded or saved; os.replace gives each save a new inode.
+_index_version = None
+_max_chunk_id = 0
+
+
+def _index_path() -> Path:
+    return Path(settings.CORPUS_INDEX_PATH)
+
+
+@contextmanager
+def _write_lock():
+    """Exclusive across processes (flock on the index's lock file), then across threads."""
+    path = _index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f"{path.name}.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with _lock:
+                yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _file_version(path: Path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _encode(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def _decode(rows) -> np.ndarray:
+    return np.vstack([np.frombuffer(bytes(row), dtype=np.float16) for row in rows]).astype(np.float32)
+
+
+def _new_index(dim: int, n: int):
+    import faiss
+    from rag.vector_store import make_index
+
+    return faiss.IndexIDMap2(make_index(dim, n))
+
+
+def _save_locked() -> None:
+    from rag.vector_store import write_index
+
+    path = _index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    write_index(_index, tmp)
+    os.replace(tmp, path)
+    global _index_version
+    _index_version = _file_version(path)
+
+
+def _add_chunks_locked(min_id: int = 0, live_only: bool = False) -> int:
+    """
+    Add the stored embeddings of chunks with id > min_id to the in-memory index.
+
+    Catch-up includes tombstoned papers (search filters them), so a paper restored
+    before the next compaction is still searchable. The vectors go into a copy of
+    the index, which then replaces it, so searches running on the old one are safe.
+    """
+    import faiss
+
+    global _index, _max_chunk_id
+    chunks = Chunk.objects.filter(id__gt=min_id)
+    if live_only:
+        chunks = chunks.filter(paper__deleted=False)
+    rows = list(chunks.order_by("id").values_list("id", "embedding"))
+    if not rows:
+        return 0
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    vectors = _decode(row[1] for row in rows)
+    index = _new_index(vectors.shape[1], len(vectors)) if _index is None else faiss.clone_index(_index)
+    if not index.is_trained:
+        from rag.vector_store import train_index
+
+        train_index(index.index, vectors)
+    index.add_with_ids(vectors, ids)
+    _index = index
+    _max_chunk_id = max(_max_chunk_id, int(ids[-1]))
+    return len(rows)
+
+
+def _sync_locked() -> None:
+    """Load or reload the index file if it changed on disk, then catch up on newer chunks."""
+    global _index, _index_version, _max_chunk_id
+    from rag.vector_store import read_index
+
+    path = _index_path()
+    version = _file_version(path)
+    if version is not None and version != _index_version:
+        _index = read_index(path)
+        _index_version = version
+        # Vector ids are Chunk ids, so the largest one tells us where the file stops.
+        stored = _stored_ids(_index)
+        _max_chunk_id = int(stored.max()) if len(stored) else 0
+    _add_chunks_locked(_max_chunk_id)
+
+
+def _stored_ids(index) -> np.ndarray:
+    import faiss
+
+    return faiss.vector_to_array(index.id_map)
+
+
+def ingest(file_path, title: str = "", content_hash: str | None = None) -> Paper:
+    """Add a PDF (path or bytes) to the corpus (idempotent per content hash). Returns the Paper."""
+    from rag import paper_cache
+    from rag.summarize import paper_chunks
+
+    content_hash = content_hash or paper_cache.hash_file(file_path)
+    existing = Paper.objects.filter(content_hash=content_hash).first()
+    if existing is not None:
+        if existing.deleted:
+            # Not compacted yet, so its chunks and vectors are still in place.
+            Paper.objects.filter(pk=existing.pk).update(deleted=False)
+            existing.deleted = False
+        return existing
+
+    result = paper_chunks(file_path, content_hash)
+    chunks, vectors, metadata = result if result else ([], np.zeros((0, 0), dtype=np.float32), [])
+    with _write_lock():
+        # Another worker may have ingested the same PDF while this one was embedding it.
+        existing = Paper.objects.filter(content_hash=content_hash).first()
+        if existing is not None:
+            return existing
+        with transaction.atomic():
+            paper = Paper.objects.create(content_hash=content_hash, title=title[:512], chunk_count=len(chunks))
+            Chunk.objects.bulk_create(
+                [
+                    Chunk(paper=paper, position=i, page=entry["page"], text=text, embedding=_encode(vector))
+                    for i, (text, vector, entry) in enumerate(zip(chunks, vectors, metadata))
+                ],
+                batch_size=500,
+            )
+        if chunks:
+            _sync_locked()
+            _save_locked()
+    logger.info("Ingested paper %s (%d chunks)", paper.pk, len(chunks))
+    return paper
+
+
+def delete(paper_id: int) -> bool:
+    """Tombstone a paper. Returns False if there is no such live paper."""
+    return Paper.objects.filter(pk=paper_id, deleted=False).update(deleted=True) > 0
+
+
+def compact() -> dict:
+    """Rebuild the index from live chunks and purge tombstoned papers. Returns counts."""
+    global _index, _max_chunk_id
+    start = time.perf_counter()
+    with _write_lock():
+        purged, _ = Paper.objects.filter(deleted=True).delete()
+        _index = None
+        _max_chunk_id = 0
+        added = _add_chunks_locked(live_only=True)
+        if _index is not None:
+            _save_locked()
+        else:
+            _index_path().unlink(missing_ok=True)
+    elapsed = time.perf_counter() - start
+    logger.info("Compacted corpus index: %d vectors, %d rows purged in %.2fs", added, purged, elapsed)
+    return {"vectors": added, "purged_rows": purged, "seconds": round(elapsed, 3)}
+
+
+def search(query: str, k: int = 5) -> list[dict]:
+    """Top-k live chunks across all ingested papers, nearest first."""
+    from rag.embeddings import embed_texts
+
+    query_vector = embed_texts([query])
+    with _lock:
+        _sync_locked()
+        index = _index
+    if index is None or index.ntotal == 0:
+        return []
+    distances, ids = index.search(query_vector, k * _OVERFETCH)
+
+    hits = [(int(i), float(d)) for i, d in zip(ids[0], distances[0]) if i >= 0]
+    chunks = Chunk.objects.select_related("paper").filter(
+        id__in=[i for i, _ in hits], paper__deleted=False
+    ).defer("embedding")
+    by_id = {chunk.id: chunk for chunk in chunks}
+    results = []
+    for chunk_id, distance in hits:
+        chunk = by_id.get(chunk_id)
+        if chunk is None:
+            continue
+        results.append({
+            "paper_id": chunk.paper_id,
+            "title": chunk.paper.title,
+            "position": chunk.position,
+            "page": chunk.page,
+            "text": chunk.text,
+            "distance": distance,
+        })
+        if len(results) == k:
+            break
+    return results
@@ -0,0 +1,219 @@
+"""
+Background summarization jobs.
+
+Jobs are stored in the database (SummaryJob) and executed on a bounded thread pool
+inside the web worker, so a long LLM call no longer holds the request open. Admission
+is capped at JOB_MAX_PENDING queued + running jobs per worker; beyond that, submit()
+raises QueueFull and the API answers 503 immediately.
+
+Each job is leased by the worker process that runs it (SummaryJob.owner): a
+background thread refreshes heartbeat_at on the worker's unfinished jobs every third
+of JOB_LEASE_SECONDS. A queued or running job whose heartbeat is older than the lease
+belongs to a worker that died, and the first worker to notice takes it over, with a
+compare-and-set on the old owner and heartbeat, so exactly one worker reruns it. start()
+begins this at server startup (wsgi.py / asgi.py), so jobs left by a restart resume
+right away instead of waiting for the next submit.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SummaryJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+_owner = None
+_owner_lock = threading.Lock()
+_lease_thread = None
+_lease_lock = threading.Lock()
+
+_UNFINISHED = [SummaryJob.Status.QUEUED, SummaryJob.Status.RUNNING]
+
+
+class QueueFull(Exception):
+    """Raised when the worker already has JOB_MAX_PENDING jobs queued or running."""
+
+
+def _upload_dir() -> Path:
+    path = Path(settings.JOB_UPLOAD_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.JOB_WORKERS, thread_name_prefix="summary-job"
+            )
+    return _executor
+
+
+def owner() -> str:
+    """This worker process's lease owner id (a forked child gets a new one)."""
+    global _owner
+    if _owner is None:
+        # Locked so the lease thread and a request thread never each make their own id.
+        with _owner_lock:
+            if _owner is None:
+                _owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    return _owner
+
+
+def _reset_after_fork() -> None:
+    global _owner, _owner_lock, _lease_thread, _lease_lock
+    _owner, _owner_lock = None, threading.Lock()
+    _lease_thread, _lease_lock = None, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def start() -> None:
+    """Start this worker's lease thread: heartbeats its jobs and takes over expired ones."""
+    global _lease_thread
+    owner()
+    with _lease_lock:
+        if _lease_thread is not None and _lease_thread.is_alive():
+            return
+        _lease_thread = threading.Thread(target=_lease_loop, name="summary-job-lease", daemon=True)
+        _lease_thread.start()
+
+
+def _lease_loop() -> None:
+    interval = settings.JOB_LEASE_SECONDS / 3
+    while True:
+        try:
+            _heartbeat()
+            _claim_expired()
+        except DatabaseError as e:
+            # E.g. migrations not applied yet; try again on the next beat.
+            logger.warning("Summary job lease update failed: %s", e)
+        except Exception:
+            # Keep leasing: a dead lease thread would let every job here expire.
+            logger.exception("Summary job lease update failed")
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def _heartbeat() -> None:
+    SummaryJob.objects.filter(owner=owner(), status__in=_UNFINISHED).update(heartbeat_at=timezone.now())
+
+
+def _claim_expired() -> None:
+    """Take over jobs whose owner stopped heartbeating, and run them here."""
+    global _pending
+    now = timezone.now()
+    expired = SummaryJob.objects.filter(status__in=_UNFINISHED).filter(
+        Q(heartbeat_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS)) | Q(heartbeat_at=None)
+    )
+    for job in expired.only("id", "owner", "heartbeat_at", "file_path"):
+        claimed = SummaryJob.objects.filter(pk=job.pk, owner=job.owner, heartbeat_at=job.heartbeat_at).update(
+            owner=owner(), heartbeat_at=now, status=SummaryJob.Status.QUEUED, started_at=None
+        )
+        if not claimed:
+            # Another worker took it over first.
+            continue
+        if not os.path.exists(job.file_path):
+            _finish(job.id, error="Uploaded file was lost before the job could run.")
+            continue
+        with _pending_lock:
+            _pending += 1
+        _get_executor().submit(_run, job.id)
+        logger.info("Resumed summary job %s (lease of %s expired)", job.id, job.owner or "unknown owner")
+
+
+def _reserve_slot() -> None:
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.JOB_MAX_PENDING:
+            raise QueueFull(f"{_pending} summary jobs are already pending.")
+        _pending += 1
+
+
+def _release_slot() -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def submit(pdf, query: str, mode: str = "rag") -> SummaryJob:
+    """Persist the upload and a SummaryJob, and schedule it. Raises QueueFull when overloaded."""
+    start()
+    executor = _get_executor()
+    _reserve_slot()
+    try:
+        job_id = uuid.uuid4()
+        file_path = _upload_dir() / f"{job_id}.pdf"
+        with open(file_path, "wb") as f:
+            for chunk in pdf.chunks():
+                f.write(chunk)
+        job = SummaryJob.objects.create(
+            id=job_id, query=query, mode=mode, file_path=str(file_path), owner=owner(), heartbeat_at=timezone.now()
+        )
+        executor.submit(_run, job.id)
+    except BaseException:
+        _release_slot()
+        raise
+    return job
+
+
+def _finish(job_id, result: str = "", error: str = "") -> bool:
+    """Record the outcome, unless another worker has taken the job over. Returns whether it did."""
+    return bool(SummaryJob.objects.filter(pk=job_id, owner=owner()).update(
+        status=SummaryJob.Status.FAILED if error else SummaryJob.Status.DONE,
+        result=result,
+        error=error,
+        finished_at=timezone.now(),
+    ))
+
+
+def _run(job_id) -> None:
+    from rag.summarize import summarize_pdf
+
+    close_old_connections()
+    job = None
+    finished = False
+    try:
+        job = SummaryJob.objects.get(pk=job_id)
+        started = SummaryJob.objects.filter(pk=job_id, owner=owner()).update(
+            status=SummaryJob.Status.RUNNING, started_at=timezone.now()
+        )
+        if not started:
+            # The lease expired while the job was queued here and another worker took it over.
+            return
+        result = summarize_pdf(job.file_path, job.query, job.mode)
+        finished = _finish(job_id, result=result)
+    except Exception as e:
+        logger.exception("Summary job %s failed", job_id)
+        finished = _finish(job_id, error=str(e))
+    finally:
+        _release_slot()
+        # The new owner of a job taken over mid-run still needs the upload.
+        if finished:
+            try:
+                os.unlink(job.file_path)
+            except OSError:
+                pass
+        close_old_connections()
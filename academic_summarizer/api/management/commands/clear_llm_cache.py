@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from llm import response_cache
+
+
+class Command(BaseCommand):
+    help = "Drop cached LLM answers (all of them, or the semantic answers for one paper)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--paper", help="Content hash of the PDF whose semantic answers to forget.")
+
+    def handle(self, *args, **options):
+        if options["paper"]:
+            response_cache.invalidate(options["paper"])
+            self.stdout.write(self.style.SUCCESS(f"Forgot cached answers for paper {options['paper']}."))
+            return
+        response_cache.clear()
+        self.stdout.write(self.style.SUCCESS("Cleared the LLM response cache."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api import corpus
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search corpus index from live chunks and purge deleted papers."
+
+    def handle(self, *args, **options):
+        result = corpus.compact()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {result['vectors']} vectors, purged {result['purged_rows']} rows "
+                f"in {result['seconds']}s."
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_summaryjob_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunk',
+            name='page',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1 +1,70 @@
+import uuid
+
 from django.db import models
+
+
+class SummaryJob(models.Model):
+    """A summarization request processed in the background by api.jobs."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    query = models.TextField()
+    # rag.summarize.SUMMARY_MODES
+    mode = models.CharField(max_length=16, default="rag")
+    # Uploaded PDF kept on disk until the job finishes, so queued jobs survive a restart.
+    file_path = models.CharField(max_length=1024)
+    # Lease: the worker process running the job, and when it last said it still is (api.jobs).
+    owner = models.CharField(max_length=128, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+
+class Paper(models.Model):
+    """A PDF ingested into the cross-paper search corpus (api.corpus)."""
+
+    content_hash = models.CharField(max_length=32, unique=True)
+    title = models.CharField(max_length=512, blank=True)
+    chunk_count = models.PositiveIntegerField(default=0)
+    # Tombstone: deleted papers are filtered out of search until compaction removes them.
+    deleted = models.BooleanField(default=False, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return self.title or self.content_hash
+
+
+class Chunk(models.Model):
+    """One indexed chunk of a Paper. Its id is the vector id in the corpus FAISS index."""
+
+    paper = models.ForeignKey(Paper, on_delete=models.CASCADE, related_name="chunks")
+    position = models.PositiveIntegerField()
+    # 1-based page the chunk starts on; 0 if unknown.
+    page = models.PositiveIntegerField(default=0)
+    text = models.TextField()
+    # float16 embedding bytes, kept so compaction can rebuild the index without re-embedding.
+    embedding = models.BinaryField()
+
+    class Meta:
+        ordering = ["paper", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["paper", "position"], name="unique_chunk_position"),
+        ]
@@ -0,0 +1,86 @@
+"""
+The summarize pipeline behind a facade that imports it on first use.
+
+rag.summarize pulls in LangChain, FAISS and PyMuPDF when imported, and sentence-
+transformers and torch with the first embedding. Views reach it only through this
+module (pipeline.summarize_pdf(...), except pipeline.PDFTooLarge), so importing the
+URLconf - in every manage.py command, migration, health check and worker boot - does
+not load the ML stack. The first request that needs it does, or warm_up() when the
+server starts with EMBEDDINGS_WARMUP.
+
+Names are looked up on the real module at every access, so patching
+rag.summarize.summarize_pdf (e.g. in a benchmark) is seen here too.
+"""
+
+import importlib
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+_SUMMARIZE = "rag.summarize"
+_EXPORTS = {
+    "SUMMARY_MODES": _SUMMARIZE,
+    "acompress_pdf": _SUMMARIZE,
+    "answer_queries": _SUMMARIZE,
+    "asummarize_pdf": _SUMMARIZE,
+    "compress_pdf": _SUMMARIZE,
+    "run_cpu": _SUMMARIZE,
+    "summarize_pdf": _SUMMARIZE,
+    "summarize_pdf_stream": _SUMMARIZE,
+    "PDFTooLarge": "rag.pdf_loader",
+}
+
+_load_seconds = None
+
+
+def _module(name: str):
+    global _load_seconds
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if name == _SUMMARIZE and _load_seconds is None:
+        _load_seconds = time.perf_counter() - start
+        logger.info("Loaded the summarize pipeline in %.2fs", _load_seconds)
+    return module
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(_module(module_name), name)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
+
+
+def loaded() -> bool:
+    """Whether the pipeline has been imported in this process."""
+    return _SUMMARIZE in sys.modules
+
+
+def status() -> dict:
+    """Load state of the pipeline and embedding model; never triggers a load."""
+    embeddings = sys.modules.get("rag.embeddings")
+    model_seconds = embeddings.load_seconds() if embeddings is not None else None
+    return {
+        "pipeline_loaded": loaded(),
+        "pipeline_load_seconds": round(_load_seconds, 3) if _load_seconds is not None else None,
+        "embeddings_loaded": model_seconds is not None,
+        "embeddings_load_seconds": round(model_seconds, 3) if model_seconds is not None else None,
+    }
+
+
+def warm_up() -> float:
+    """Import the pipeline and load the embedding model now. Returns the seconds spent."""
+    start = time.perf_counter()
+    _module(_SUMMARIZE)
+    from rag.embeddings import warm_up as warm_up_embeddings
+
+    warm_up_embeddings()
+    return time.perf_counter() - start
@@ -1 +1,15 @@
 from rest_framework import serializers
+
+from .models import Paper, SummaryJob
+
+
+class SummaryJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SummaryJob
+        fields = ["id", "status", "query", "mode", "result", "error", "created_at", "started_at", "finished_at"]
+
+
+class PaperSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Paper
+        fields = ["id", "title", "content_hash", "chunk_count", "created_at"]
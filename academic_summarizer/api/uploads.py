@@ -0,0 +1,68 @@
+"""
+Uploaded PDFs handed to the pipeline without extra copies or temp files.
+
+Uploads up to UPLOAD_MAX_MEMORY_BYTES (settings.FILE_UPLOAD_MAX_MEMORY_SIZE, 16 MB) stay in
+Django's in-memory buffer and reach the pipeline as a memoryview over it, which
+PyMuPDF opens in place (fitz.open(stream=...)). Larger uploads are spooled by Django
+to a temporary file that Django deletes when the request finishes; the pipeline
+reads that file by path. HashingUploadHandler computes the xxh3-128 content hash (the
+paper cache key) while the body is received, so the PDF is never read twice.
+"""
+
+import io
+
+import xxhash
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    First in FILE_UPLOAD_HANDLERS: hashes each file as it streams in and passes the data
+    on unchanged. Hashes end up in request.upload_hashes by field name.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = xxhash.xxh3_128()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, "upload_hashes"):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.hasher.hexdigest()
+        # Let the memory or temporary-file handler build the file object.
+        return None
+
+
+class PdfUpload:
+    """
+    An uploaded PDF as a pipeline source: a memoryview for in-memory uploads, else
+    the path of Django's spooled temporary file. Use as a context manager (or call
+    close()) so the buffer is released before Django closes the upload.
+    """
+
+    def __init__(self, request, upload, field_name: str = "file"):
+        self.content_hash = getattr(request, "upload_hashes", {}).get(field_name)
+        self._view = None
+        if hasattr(upload, "temporary_file_path"):
+            self.source = upload.temporary_file_path()
+        elif isinstance(upload.file, io.BytesIO):
+            self._view = upload.file.getbuffer()
+            self.source = self._view
+        else:
+            upload.seek(0)
+            self.source = upload.read()
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,8 +1,28 @@
 from django.urls import path
-from .views import APIRootView, SummarizePaperView, CompressPaperView
+from .views import (
+    APIRootView,
+    AsyncCompressPaperView,
+    AsyncSummarizePaperView,
+    SummarizePaperView,
+    SummarizeBatchView,
+    SummarizeStreamView,
+    SummaryJobView,
+    CompressPaperView,
+    PaperListView,
+    PaperDetailView,
+    SearchView,
+)
 
 urlpatterns = [
     path('', APIRootView.as_view(), name='api_root'),
     path('summarize/', SummarizePaperView.as_view()),
+    path('summarize/batch/', SummarizeBatchView.as_view(), name='summarize_batch'),
+    path('summarize/stream/', SummarizeStreamView.as_view(), name='summarize_stream'),
+    path('jobs/<uuid:job_id>/', SummaryJobView.as_view(), name='summary_job'),
     path('compress/', CompressPaperView.as_view()),
+    path('async/summarize/', AsyncSummarizePaperView.as_view(), name='summarize_async'),
+    path('async/compress/', AsyncCompressPaperView.as_view(), name='compress_async'),
+    path('papers/', PaperListView.as_view(), name='papers'),
+    path('papers/<int:paper_id>/', PaperDetailView.as_view(), name='paper'),
+    path('search/', SearchView.as_view(), name='search'),
 ]
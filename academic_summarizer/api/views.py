@@ -1,13 +1,62 @@
-import tempfile
+import json
+import time
 
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 
 
-from rag.summarize import summarize_pdf, compress_pdf
+from llm import tracing
+
+from . import corpus, jobs, pipeline
+from .models import Paper, SummaryJob
+from .serializers import PaperSerializer, SummaryJobSerializer
+from .uploads import PdfUpload
+
+
+def _truthy(value) -> bool:
+    return str(value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _queries(request) -> list[str]:
+    """
+    Queries from repeated ``queries`` form fields or one JSON-encoded list. Raises
+    ValueError unless every query is a non-empty string.
+    """
+    values = request.data.getlist("queries") if hasattr(request.data, "getlist") else request.data.get("queries", [])
+    if len(values) == 1 and values[0].lstrip().startswith("["):
+        values = json.loads(values[0])
+    if not all(isinstance(value, str) and value.strip() for value in values):
+        raise ValueError("queries must be non-empty strings")
+    return [value.strip() for value in values]
+
+
+def _wants_stages(request) -> bool:
+    return _truthy(request.data.get("timings") or request.query_params.get("timings"))
+
+
+def _with_stages(request, data: dict, trace) -> dict:
+    """Add the per-stage timing breakdown when the client asked for it with timings=true."""
+    if _wants_stages(request):
+        data["stages"] = trace.breakdown()
+    return data
+
+
+def _parse_form(request):
+    """Parse a multipart body (blocking, so async views run it on the CPU pool)."""
+    return request.POST, request.FILES
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
 
 class APIRootView(View):
@@ -18,7 +67,18 @@ class APIRootView(View):
             "message": "Academic Paper Summarizer",
             "description": "Research paper summarization using RAG and compression for lengthy papers, preserving technical accuracy and reducing processing time.",
             "endpoints": {
-                "summarize": "/api/summarize/ (POST: file, query)",
+                "summarize": "/api/summarize/ (POST: file, query, mode=rag|map_reduce, async, timings)",
+                "summarize_async": "/api/async/summarize/ (POST: file, query, mode, timings; served without blocking a thread under ASGI)",
+                "compress_async": "/api/async/compress/ (POST: file, context, timings)",
+                "summarize_batch": "/api/summarize/batch/ (POST: file, queries; one answer per query)",
+                "summarize_stream": "/api/summarize/stream/ (POST: file, query; text/event-stream)",
+                "job": "/api/jobs/<id>/ (GET: status and result of an async summarize)",
+                "papers": "/api/papers/ (GET: list, POST: file, title to add a paper to the search corpus)",
+                "paper": "/api/papers/<id>/ (DELETE: remove a paper from the search corpus)",
+                "search": "/api/search/ (GET: q, k; search across all ingested papers)",
+                "metrics": "/metrics (GET: Prometheus histograms of pipeline stages)",
+                "healthz": "/healthz (GET: liveness; answers without touching the database or the ML stack)",
+                "readyz": "/readyz (GET: readiness; 503 while the database is unreachable)",
             },
         })
 
@@ -29,16 +89,110 @@ class SummarizePaperView(APIView):
     def post(self, request):
         pdf = request.FILES.get("file")
         query = request.data.get("query", "Summarize this paper")
+        mode = request.data.get("mode") or "rag"
         if not pdf:
             return Response({"error": "No file provided"}, status=400)
+        if mode not in pipeline.SUMMARY_MODES:
+            return Response({"error": f"mode must be one of: {', '.join(pipeline.SUMMARY_MODES)}"}, status=400)
+
+        if _truthy(request.data.get("async") or request.query_params.get("async")):
+            try:
+                job = jobs.submit(pdf, query, mode)
+            except jobs.QueueFull as e:
+                return Response({"error": str(e)}, status=503, headers={"Retry-After": "30"})
+            return Response(
+                {
+                    "job_id": str(job.id),
+                    "status": job.status,
+                    "status_url": request.build_absolute_uri(reverse("summary_job", args=[job.id])),
+                },
+                status=202,
+            )
+
+        try:
+            with PdfUpload(request, pdf) as upload, tracing.start_trace() as trace, tracing.stage("request_summarize"):
+                result = pipeline.summarize_pdf(upload.source, query, mode, upload.content_hash)
+        except pipeline.PDFTooLarge as e:
+            return Response({"error": str(e)}, status=413)
+        return Response(_with_stages(request, {"summary": result}, trace))
+
+
+class SummarizeBatchView(APIView):
+    """
+    Answer several queries about one PDF. The paper is processed and indexed once,
+    the queries are embedded together and the LLM calls run concurrently.
+    """
+
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        pdf = request.FILES.get("file")
+        if not pdf:
+            return Response({"error": "No file provided"}, status=400)
+        try:
+            queries = _queries(request)
+        except ValueError:
+            return Response({"error": "queries must be form fields or a JSON list of non-empty strings"}, status=400)
+        if not queries:
+            return Response({"error": "No queries provided"}, status=400)
+        if len(queries) > settings.BATCH_MAX_QUERIES:
+            return Response({"error": f"At most {settings.BATCH_MAX_QUERIES} queries per request"}, status=400)
+
+        try:
+            with PdfUpload(request, pdf) as upload, tracing.start_trace() as trace, tracing.stage(
+                "request_batch", chunks=len(queries)
+            ):
+                result = pipeline.answer_queries(upload.source, queries, upload.content_hash)
+        except pipeline.PDFTooLarge as e:
+            return Response({"error": str(e)}, status=413)
+        return Response(_with_stages(request, result, trace))
+
+
+class SummarizeStreamView(APIView):
+    """
+    Server-Sent-Events variant of SummarizePaperView: streams the summary as it is generated.
+
+    Emits ``data: {"token": "..."}`` events, then ``event: done``; failures after the
+    stream has started arrive as ``event: error`` with ``{"error": "..."}``.
+    """
+
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        pdf = request.FILES.get("file")
+        query = request.data.get("query", "Summarize this paper")
+        if not pdf:
+            return Response({"error": "No file provided"}, status=400)
+
+        upload = PdfUpload(request, pdf)
+
+        def events():
+            try:
+                for token in pipeline.summarize_pdf_stream(upload.source, query, upload.content_hash):
+                    yield _sse({"token": token})
+                yield _sse({}, event="done")
+            except Exception as e:
+                yield _sse({"error": str(e)}, event="error")
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        # Released when the response is closed, even if it is never iterated (client gone),
+        # and before Django closes the upload itself.
+        response._resource_closers.append(upload.close)
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx-style proxies from buffering the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            for chunk in pdf.chunks():
-                tmp.write(chunk)
-            file_path = tmp.name
 
-        result = summarize_pdf(file_path, query)
-        return Response({"summary": result})
+class SummaryJobView(APIView):
+    """Status and, once finished, result of a background summarize job."""
+
+    def get(self, request, job_id):
+        try:
+            job = SummaryJob.objects.get(pk=job_id)
+        except SummaryJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=404)
+        return Response(SummaryJobSerializer(job).data)
 
 
 class CompressPaperView(APIView):
@@ -52,15 +206,145 @@ class CompressPaperView(APIView):
 
     def post(self, request):
         pdf = request.FILES.get("file")
-        context = request.data.get("context", "Full academic paper text to compress.")
+        context = request.data.get("context")
+
+        if not pdf:
+            return Response({"error": "No file provided"}, status=400)
+
+        try:
+            with PdfUpload(request, pdf) as upload, tracing.start_trace() as trace, tracing.stage("request_compress"):
+                compressed = pipeline.compress_pdf(upload.source, context=context)
+        except pipeline.PDFTooLarge as e:
+            return Response({"error": str(e)}, status=413)
+        return Response(_with_stages(request, {"compressed": compressed}, trace))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncSummarizePaperView(View):
+    """
+    Async variant of SummarizePaperView for ASGI servers (uvicorn): waiting on the LLM
+    and compress APIs does not hold a thread, so one worker can serve many papers at once.
+    """
+
+    async def post(self, request):
+        form, files = await pipeline.run_cpu(_parse_form, request)
+        pdf = files.get("file")
+        query = form.get("query", "Summarize this paper")
+        mode = form.get("mode") or "rag"
+        if not pdf:
+            return JsonResponse({"error": "No file provided"}, status=400)
+        if mode not in pipeline.SUMMARY_MODES:
+            return JsonResponse({"error": f"mode must be one of: {', '.join(pipeline.SUMMARY_MODES)}"}, status=400)
+
+        try:
+            with PdfUpload(request, pdf) as upload, tracing.start_trace() as trace, tracing.stage(
+                "request_summarize_async"
+            ):
+                result = await pipeline.asummarize_pdf(upload.source, query, mode, upload.content_hash)
+        except pipeline.PDFTooLarge as e:
+            return JsonResponse({"error": str(e)}, status=413)
+        data = {"summary": result}
+        if _truthy(form.get("timings") or request.GET.get("timings")):
+            data["stages"] = trace.breakdown()
+        return JsonResponse(data)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncCompressPaperView(View):
+    """Async variant of CompressPaperView."""
+
+    async def post(self, request):
+        form, files = await pipeline.run_cpu(_parse_form, request)
+        pdf = files.get("file")
+        context = form.get("context")
+        if not pdf:
+            return JsonResponse({"error": "No file provided"}, status=400)
+
+        try:
+            with PdfUpload(request, pdf) as upload, tracing.start_trace() as trace, tracing.stage(
+                "request_compress_async"
+            ):
+                compressed = await pipeline.acompress_pdf(upload.source, context=context)
+        except pipeline.PDFTooLarge as e:
+            return JsonResponse({"error": str(e)}, status=413)
+        data = {"compressed": compressed}
+        if _truthy(form.get("timings") or request.GET.get("timings")):
+            data["stages"] = trace.breakdown()
+        return JsonResponse(data)
+
+
+class PaperListView(APIView):
+    """List the papers in the search corpus, or ingest a new one."""
+
+    parser_classes = [MultiPartParser]
+
+    def get(self, request):
+        papers = Paper.objects.filter(deleted=False)
+        return Response(PaperSerializer(papers, many=True).data)
 
+    def post(self, request):
+        pdf = request.FILES.get("file")
         if not pdf:
             return Response({"error": "No file provided"}, status=400)
+        title = request.data.get("title") or pdf.name
+
+        try:
+            with PdfUpload(request, pdf) as upload:
+                paper = corpus.ingest(upload.source, title=title, content_hash=upload.content_hash)
+        except pipeline.PDFTooLarge as e:
+            return Response({"error": str(e)}, status=413)
+        return Response(PaperSerializer(paper).data, status=201)
+
+
+class PaperDetailView(APIView):
+    def delete(self, request, paper_id):
+        if not corpus.delete(paper_id):
+            return Response({"error": "Paper not found"}, status=404)
+        return Response(status=204)
+
+
+class SearchView(APIView):
+    """Nearest chunks to a query across every ingested paper."""
+
+    def get(self, request):
+        query = (request.query_params.get("q") or "").strip()
+        if not query:
+            return Response({"error": "Missing query parameter q"}, status=400)
+        try:
+            k = max(1, min(int(request.query_params.get("k", 5)), 50))
+        except ValueError:
+            return Response({"error": "k must be an integer"}, status=400)
+        start = time.perf_counter()
+        results = corpus.search(query, k=k)
+        took_ms = (time.perf_counter() - start) * 1000
+        return Response({"query": query, "results": results, "took_ms": round(took_ms, 2)})
+
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            for chunk in pdf.chunks():
-                tmp.write(chunk)
-            file_path = tmp.name
+class MetricsView(View):
+    """Prometheus scrape endpoint: per-stage histograms from llm.tracing for this worker process."""
 
-        compressed = compress_pdf(file_path, context=context)
-        return Response({"compressed": compressed})
+    def get(self, request):
+        return HttpResponse(tracing.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class HealthView(View):
+    """Liveness probe: the worker is up. Loads nothing and touches nothing."""
+
+    def get(self, request):
+        return JsonResponse({"status": "ok"})
+
+
+class ReadinessView(View):
+    """
+    Readiness probe: 200 once the database answers, else 503. Also reports whether this
+    worker has loaded the summarize pipeline and embedding model, without loading them.
+    """
+
+    def get(self, request):
+        data = {"status": "ready", "database": "ok", **pipeline.status()}
+        try:
+            connection.ensure_connection()
+        except DatabaseError as e:
+            data.update(status="unavailable", database=str(e))
+            return JsonResponse(data, status=503)
+        return JsonResponse(data)
@@ -0,0 +1,98 @@
+"""
+ANN index benchmark: recall@k and queries/sec of each VECTOR_INDEX_TYPE against exact flat search.
+
+Uses synthetic clustered, L2-normalised vectors (like sentence embeddings) so it
+runs without the embedding model. Prints one JSON document:
+
+    python -m bench.ann_index --n 200000 --queries 1000 --k 10 --dim 384
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from rag import vector_store
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def _timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200_000, help="Vectors in the index.")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 produces 384 dimensions.")
+    parser.add_argument("--types", nargs="+", default=list(vector_store.INDEX_TYPES))
+    parser.add_argument("--threads", type=int, default=0, help="faiss OpenMP threads; 0 = default.")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    data = synthetic_vectors(args.n + args.queries, args.dim)
+    vectors, queries = data[: args.n], data[args.n:]
+
+    baseline = vector_store.build_index(vectors, "flat")
+    truth, _ = _timed_search(baseline, queries, args.k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type in args.types:
+            start = time.perf_counter()
+            index = vector_store.build_index(vectors, index_type)
+            build_seconds = time.perf_counter() - start
+
+            ids, elapsed = _timed_search(index, queries, args.k)
+            path = Path(tmp) / f"{index_type}.faiss"
+            vector_store.write_index(index, path)
+            mapped = vector_store.read_index(path, mmap=True)
+            mapped_ids, mapped_elapsed = _timed_search(mapped, queries, args.k)
+
+            results.append({
+                "index_type": index_type,
+                "faiss_class": type(index).__name__,
+                "build_seconds": round(build_seconds, 3),
+                "index_bytes": path.stat().st_size,
+                f"recall@{args.k}": round(recall_at_k(ids, truth), 4),
+                "qps": round(len(queries) / elapsed, 1),
+                "mmap_qps": round(len(queries) / mapped_elapsed, 1),
+                "mmap_matches": bool(np.array_equal(ids, mapped_ids)),
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+    print(json.dumps({
+        "benchmark": "ann_index",
+        "n": args.n,
+        "dim": args.dim,
+        "queries": args.queries,
+        "k": args.k,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Chunker benchmark: rag.chunker against the LangChain recursive splitter it replaced.
+
+Builds paper-shaped text for each page count (bench.pdfs.page_text, wrapped into
+~110-character lines with no blank lines between paragraphs, the way PyMuPDF
+extracts it, so no PDF is needed) and reports, per chunker, the best of --repeat runs in seconds and MB/s, chunk count
+and mean length, and peak Python memory during one run (tracemalloc). The structured
+chunker also skips the references section, so it returns somewhat fewer chunks.
+Prints one JSON document:
+
+    python -m bench.chunker --pages 20 100 500 2000 --repeat 3
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import textwrap
+import time
+import tracemalloc
+
+from bench.pdfs import page_text
+from rag import chunker
+
+_LINE_CHARS = 110
+
+
+def paper_text(pages: int, seed: int = 0) -> tuple[str, list[int]]:
+    """Text of a synthetic paper and the offset at which each page starts."""
+    rng = random.Random(seed)
+    texts, starts, offset = [], [], 0
+    for page_no in range(pages):
+        paragraphs = page_text(page_no, pages, rng).split("\n\n")
+        text = "".join(textwrap.fill(paragraph, _LINE_CHARS) + "\n" for paragraph in paragraphs)
+        starts.append(offset)
+        texts.append(text)
+        offset += len(text)
+    return "".join(texts), starts
+
+
+def _measure(split, text: str, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = split(text)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    split(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    return {
+        "seconds": round(best, 4),
+        "mb_per_sec": round(len(text) / best / 1e6, 2) if best else None,
+        "chunks": len(chunks),
+        "mean_chars": round(statistics.mean(len(chunk) for chunk in chunks), 1) if chunks else 0,
+        "peak_mem_mb": round(peak / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    splitters = {
+        "structured": lambda text: chunker.split_text(text, page_starts)[0],
+        "recursive": chunker.chunk_text_recursive,
+    }
+    results = []
+    for pages in args.pages:
+        text, page_starts = paper_text(pages)
+        result = {"pages": pages, "chars": len(text)}
+        for name, split in splitters.items():
+            result[name] = _measure(split, text, args.repeat)
+        result["speedup"] = round(result["recursive"]["seconds"] / result["structured"]["seconds"], 2)
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+    print(json.dumps({"benchmark": "chunker", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
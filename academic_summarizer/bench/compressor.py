@@ -0,0 +1,82 @@
+"""
+Chunk compression benchmark: tokens saved against time spent, for the local extractive
+compressor (rag.extractive) at several ratios and the compress API.
+
+Chunks come from bench.chunker.paper_text through rag.chunker, so no PDF is needed. The
+API runs against bench.fake_llm_server with --latency per call, through
+rag.compressor with its concurrency and rate limit (COMPRESS_CONCURRENCY,
+COMPRESS_RATE_PER_SEC; --rate overrides the latter) and with the compress cache
+off. The fake server keeps a fixed fraction of words (--api-ratio), so only the API
+timings are meaningful, not its savings. Tokens are counted with rag.tokens.
+Prints one JSON document:
+
+    python -m bench.compressor --pages 20 100 --ratios 0.3 0.5 0.7 --latency 0.2 [--no-api]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def _measure(compress, chunks: list[str]) -> dict:
+    from rag.tokens import count_tokens
+
+    start = time.perf_counter()
+    compressed = compress(chunks)
+    seconds = time.perf_counter() - start
+    tokens_in = sum(count_tokens(chunk) for chunk in chunks)
+    tokens_out = sum(count_tokens(chunk) for chunk in compressed)
+    saved = tokens_in - tokens_out
+    return {
+        "seconds": round(seconds, 4),
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "saved_pct": round(100 * saved / tokens_in, 1) if tokens_in else 0.0,
+        "tokens_saved_per_sec": round(saved / seconds) if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.3, 0.5, 0.7])
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake compress call")
+    parser.add_argument("--api-ratio", type=float, default=0.5, help="fraction of words the fake API keeps")
+    parser.add_argument("--rate", type=float, help="compress calls per second (default: COMPRESS_RATE_PER_SEC)")
+    parser.add_argument("--no-api", action="store_true", help="only benchmark the extractive compressor")
+    args = parser.parse_args()
+
+    # Must be set before rag.compressor / llm.scaledown_compress are imported.
+    os.environ["COMPRESS_CACHE_MAX_ENTRIES"] = "0"
+    os.environ.setdefault("SCALEDOWN_API_KEY", "bench")
+    if args.rate is not None:
+        os.environ["COMPRESS_RATE_PER_SEC"] = str(args.rate)
+    server = None
+    if not args.no_api:
+        from bench.fake_llm_server import compress_url, start_in_thread
+
+        server, base_url = start_in_thread(latency=args.latency, compress_ratio=args.api_ratio)
+        os.environ["SCALEDOWN_COMPRESS_URL"] = compress_url(base_url)
+
+    from bench.chunker import paper_text
+    from rag import chunker, compressor, extractive
+
+    results = []
+    for pages in args.pages:
+        text, _ = paper_text(pages)
+        chunks = chunker.chunk_text(text)
+        result = {"pages": pages, "chunks": len(chunks)}
+        for ratio in args.ratios:
+            result[f"extractive_{ratio}"] = _measure(lambda chunks: extractive.compress_chunks(chunks, ratio), chunks)
+        if server is not None:
+            compressor.COMPRESS_MODE = "api"
+            result["api"] = _measure(compressor.compress_chunks, chunks)
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+    print(json.dumps({"benchmark": "compressor", "latency": args.latency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Embedding throughput benchmark: chunks/sec and peak RSS per paper length and batch size.
+
+Each configuration runs in a fresh process, so peak RSS includes loading the model
+and is not inflated by earlier runs. Prints one JSON document:
+
+    python -m bench.embeddings --pages 5 20 100 500 --batch-sizes 16 32 64 128 --threads 0
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Roughly what rag.chunker produces from one page of an academic PDF.
+CHUNKS_PER_PAGE = 3
+
+_WORDS = (
+    "model training dataset attention transformer baseline accuracy gradient loss "
+    "evaluation benchmark results method proposed approach layer encoder decoder "
+    "token embedding retrieval corpus experiment ablation parameter optimisation "
+    "convergence theorem proof lemma equation variance distribution sample"
+).split()
+
+
+def synthetic_chunks(count: int, chunk_chars: int = 1200, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        words = []
+        length = 0
+        while length < chunk_chars:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word) + 1
+        chunks.append(" ".join(words))
+    return chunks
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_one(pages: int, batch_size: int, threads: int) -> dict:
+    from rag import embeddings
+
+    embeddings.EMBEDDING_THREADS = threads
+    start = time.perf_counter()
+    embeddings.get_embeddings()
+    load_seconds = time.perf_counter() - start
+
+    chunks = synthetic_chunks(pages * CHUNKS_PER_PAGE)
+    start = time.perf_counter()
+    vectors = embeddings.embed_texts(chunks, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": pages,
+        "chunks": len(chunks),
+        "batch_size": batch_size,
+        "threads": threads,
+        "load_seconds": round(load_seconds, 3),
+        "embed_seconds": round(elapsed, 3),
+        "chunks_per_sec": round(len(chunks) / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "store_bytes": {
+            dtype: int(embeddings.quantize(vectors, dtype).nbytes) for dtype in ("float32", "float16", "int8")
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 100, 500])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="torch threads; 0 = torch default")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for pages in args.pages:
+        for batch_size in args.batch_sizes:
+            for threads in args.threads:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    results.append(pool.submit(_run_one, pages, batch_size, threads).result())
+                print(json.dumps(results[-1]), file=sys.stderr)
+    print(json.dumps({"benchmark": "embeddings", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API and the ScaleDown compress API.
+
+Answers ``POST .../chat/completions`` with a canned completion, either as one JSON
+body or, when the request has ``"stream": true``, as Server-Sent Events of
+``chat.completion.chunk`` objects. ``POST .../compress/raw/`` returns the first
+part of the prompt as ``{"compressed": ...}``. With --rate-429 a random fraction
+of requests is answered ``429`` with a ``Retry-After`` header instead. To exercise
+stream parsing, --split-lines sends each event in two HTTP chunks cut mid-line, and
+--fail-after N drops the connection after N streamed tokens.
+Point the app at it with:
+
+    python -m bench.fake_llm_server --port 8765
+    LLM_PROVIDER=openai OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 \\
+    SCALEDOWN_API_KEY=fake SCALEDOWN_COMPRESS_URL=http://127.0.0.1:8765/compress/raw/ python manage.py runserver
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _completion_words(prompt: str) -> list[str]:
+    return f"Fake summary of a {len(prompt)}-character prompt: objective, methods, results and conclusions.".split(" ")
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Overridden per server by make_server().
+    latency = 0.0
+    token_delay = 0.0
+    rate_429 = 0.0
+    retry_after = 1
+    compress_ratio = 0.5
+    split_lines = False
+    fail_after = None
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, Nagle + delayed ACK adds ~40 ms per call.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b"{}"
+        return json.loads(body or b"{}")
+
+    def _send_json(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _count(self, key: str) -> None:
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _inject_429(self) -> bool:
+        with self.server.stats_lock:
+            limited = self.rate_429 > 0 and self.server.rng.random() < self.rate_429
+        if limited:
+            self._count("rate_limited")
+            body = b'{"error": {"message": "Rate limit exceeded (injected by the fake server)."}}'
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", str(self.retry_after))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        return limited
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if not path.endswith(("/chat/completions", "/compress/raw")):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        payload = self._read_json()
+        if self._inject_429():
+            return
+        if path.endswith("/compress/raw"):
+            self._count("compress")
+            time.sleep(self.latency)
+            words = str(payload.get("prompt", "")).split(" ")
+            self._send_json(200, {"compressed": " ".join(words[: max(1, int(len(words) * self.compress_ratio))])})
+            return
+
+        self._count("chat")
+        prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+        model = payload.get("model", "fake-model")
+        words = _completion_words(prompt)
+        time.sleep(self.latency)
+
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                # Rough usage (4 characters per prompt token) so token metrics have something to record.
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(words),
+                    "total_tokens": len(prompt) // 4 + len(words),
+                },
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if self.fail_after is not None and i >= self.fail_after:
+                # Mid-stream failure: no terminating chunk, the body is cut short.
+                self.close_connection = True
+                return
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            event = f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+            if self.split_lines:
+                self._write_chunk(event[: len(event) // 2])
+                self._write_chunk(event[len(event) // 2:])
+            else:
+                self._write_chunk(event)
+            time.sleep(self.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections when hundreds of requests arrive at once.
+    request_queue_size = 1024
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    token_delay: float = 0.0,
+    rate_429: float = 0.0,
+    retry_after: int = 1,
+    compress_ratio: float = 0.5,
+    seed: int = 0,
+    split_lines: bool = False,
+    fail_after: int | None = None,
+):
+    """
+    Create (but do not start) a fake server; port 0 picks a free port.
+
+    server.stats counts the chat, compress and rate_limited responses sent so far.
+    """
+    handler = type("Handler", (FakeLLMHandler,), {
+        "latency": latency,
+        "token_delay": token_delay,
+        "rate_429": rate_429,
+        "retry_after": retry_after,
+        "compress_ratio": compress_ratio,
+        "split_lines": split_lines,
+        "fail_after": fail_after,
+    })
+    server = _Server((host, port), handler)
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.rng = random.Random(seed)
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a fake server on a daemon thread. Returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def compress_url(base_url: str) -> str:
+    """The fake compress endpoint next to a chat base URL returned by start_in_thread()."""
+    return base_url.rsplit("/v1", 1)[0] + "/compress/raw/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s.")
+    parser.add_argument("--compress-ratio", type=float, default=0.5, help="Fraction of words the compress endpoint keeps.")
+    parser.add_argument("--split-lines", action="store_true", help="Cut each streamed event across two HTTP chunks.")
+    parser.add_argument("--fail-after", type=int, help="Drop streams after this many tokens.")
+    args = parser.parse_args()
+    server = make_server(
+        args.host, args.port, args.latency, args.token_delay, args.rate_429, args.retry_after, args.compress_ratio,
+        split_lines=args.split_lines, fail_after=args.fail_after,
+    )
+    print(f"Fake OpenAI-compatible server on http://{args.host}:{server.server_address[1]}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
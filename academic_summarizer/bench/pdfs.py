@@ -0,0 +1,82 @@
+"""
+Synthetic academic-looking PDFs for benchmarks, written with PyMuPDF.
+
+Each page gets a few paragraphs of filler prose with numbers and inline equations,
+a numbered section heading every few pages, and a references section at the end,
+so extraction, chunking and retrieval see text shaped roughly like a real paper.
+
+    python -m bench.pdfs out.pdf --pages 100
+"""
+
+import argparse
+import random
+
+import fitz
+
+_WORDS = (
+    "model training dataset attention transformer baseline accuracy gradient loss "
+    "evaluation benchmark results method proposed approach layer encoder decoder "
+    "token embedding retrieval corpus experiment ablation parameter optimisation "
+    "convergence theorem proof lemma equation variance distribution sample the of "
+    "and we in to is that for with on our this by as are from which show"
+).split()
+
+_SECTIONS = ("Introduction", "Related Work", "Method", "Experiments", "Results", "Discussion", "Conclusion")
+
+_PAGE_RECT = fitz.Rect(54, 54, 558, 738)
+_FONT_SIZE = 9
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(10, 24))]
+    roll = rng.random()
+    if roll < 0.2:
+        words.insert(rng.randrange(len(words)), f"{rng.uniform(0, 100):.1f}%")
+    elif roll < 0.3:
+        words.insert(rng.randrange(len(words)), f"x_{rng.randint(1, 9)} = {rng.randint(2, 9)}y + z")
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+
+
+def page_text(page_no: int, pages: int, rng: random.Random) -> str:
+    parts = []
+    if page_no == 0:
+        parts.append("A Synthetic Study of Benchmark Papers\n\nAbstract\n" + _paragraph(rng))
+    elif page_no == pages - 1 and pages > 1:
+        refs = [f"[{i}] A. Author and B. Author. {_sentence(rng)} Proc. Conf., {rng.randint(1990, 2025)}." for i in range(1, 16)]
+        return "References\n" + "\n".join(refs)
+    elif page_no % 3 == 1:
+        section = page_no // 3 + 1
+        parts.append(f"{section}. {_SECTIONS[section % len(_SECTIONS)]}")
+    while sum(len(part) for part in parts) < 3000:
+        parts.append(_paragraph(rng))
+    return "\n\n".join(parts)
+
+
+def make_pdf(path, pages: int, seed: int = 0) -> None:
+    """Write a pages-page synthetic paper to path."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    try:
+        for page_no in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(_PAGE_RECT, page_text(page_no, pages, rng), fontsize=_FONT_SIZE)
+        doc.save(str(path), garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_pdf(args.path, args.pages, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+End-to-end pipeline benchmark: summarize_pdf / compress_pdf on synthetic PDFs against
+the local fake chat + compress server (bench.fake_llm_server).
+
+For every page count and concurrency level, a fresh process runs `concurrency`
+papers at once on threads and reports wall time, papers/sec and pages/sec, per-paper
+latency, the per-stage breakdown from llm.tracing, peak RSS, and how many requests
+the fake server answered (and rate limited). The paper and compress caches are
+disabled so every run does the full work. Prints one JSON document (or writes it
+to --output, to keep it apart from anything libraries print):
+
+    python -m bench.pipeline --pages 5 20 100 500 --concurrency 1 4 --modes summarize compress \\
+        --latency 0.2 --rate-429 0.05 --retry-after 0 --embeddings hash
+
+--embeddings hash swaps the sentence-transformers model for a fast hashing embedder,
+to time the other stages on machines without torch or the model weights.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from bench.embeddings import peak_rss_mb
+from bench.fake_llm_server import compress_url, start_in_thread
+from bench.pdfs import make_pdf
+
+_HASH_DIM = 384
+
+
+def _use_hash_embeddings() -> None:
+    import hashlib
+
+    import numpy as np
+    from langchain_core.embeddings import Embeddings
+
+    from rag import embeddings
+
+    class _HashingEncoder:
+        def encode(self, texts, **kwargs):
+            vectors = np.zeros((len(texts), _HASH_DIM), dtype=np.float32)
+            for row, text in enumerate(texts):
+                for word in text.lower().split():
+                    digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest()
+                    vectors[row, int.from_bytes(digest, "little") % _HASH_DIM] += 1.0
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.where(norms == 0, 1.0, norms)
+
+    class _HashingEmbeddings(Embeddings):
+        client = _HashingEncoder()
+
+        def embed_documents(self, texts):
+            return self.client.encode(list(texts)).tolist()
+
+        def embed_query(self, text):
+            return self.client.encode([text])[0].tolist()
+
+    embeddings._embeddings = _HashingEmbeddings()
+
+
+def _run_one(mode: str, pdf_paths: list[str], pages: int, hash_embeddings: bool) -> dict:
+    from llm import tracing
+    from rag import embeddings
+    from rag.summarize import compress_pdf, summarize_pdf
+
+    if hash_embeddings:
+        _use_hash_embeddings()
+    else:
+        embeddings.get_embeddings()
+
+    def run(path):
+        start = time.perf_counter()
+        with tracing.start_trace() as trace:
+            if mode == "compress":
+                compress_pdf(path)
+            else:
+                summarize_pdf(path)
+        return time.perf_counter() - start, trace.breakdown()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(pdf_paths)) as executor:
+        runs = list(executor.map(run, pdf_paths))
+    wall = time.perf_counter() - start
+
+    stages = {}
+    for _, breakdown in runs:
+        for name, entry in breakdown.items():
+            total = stages.setdefault(name, {})
+            for key, value in entry.items():
+                total[key] = total.get(key, 0) + value
+    for entry in stages.values():
+        entry["seconds"] = round(entry["seconds"], 4)
+    latencies = [seconds for seconds, _ in runs]
+    return {
+        "mode": mode,
+        "pages": pages,
+        "concurrency": len(pdf_paths),
+        "wall_seconds": round(wall, 3),
+        "papers_per_sec": round(len(pdf_paths) / wall, 3),
+        "pages_per_sec": round(len(pdf_paths) * pages / wall, 1),
+        "latency_p50": round(statistics.median(latencies), 3),
+        "latency_max": round(max(latencies), 3),
+        # Summed over the concurrent papers.
+        "stages": stages,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 100, 500])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--modes", nargs="+", choices=("summarize", "compress"), default=["summarize", "compress"])
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake server seconds per request.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s.")
+    parser.add_argument("--embeddings", choices=("model", "hash"), default="model")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args()
+
+    server, base_url = start_in_thread(latency=args.latency, rate_429=args.rate_429, retry_after=args.retry_after)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "LLM_PROVIDER": "openai",
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_BASE_URL": base_url,
+            "SCALEDOWN_API_KEY": "fake",
+            "SCALEDOWN_COMPRESS_URL": compress_url(base_url),
+            # Measure the full pipeline every time.
+            "PAPER_CACHE_MAX_BYTES": "0",
+            "COMPRESS_CACHE_MAX_ENTRIES": "0",
+            "KV_CACHE_PATH": str(Path(tmp) / "kv.sqlite3"),
+        })
+        context = multiprocessing.get_context("spawn")
+        for pages in args.pages:
+            pdf_paths = []
+            for seed in range(max(args.concurrency)):
+                path = Path(tmp) / f"paper-{pages}-{seed}.pdf"
+                make_pdf(path, pages, seed)
+                pdf_paths.append(str(path))
+            for mode in args.modes:
+                for concurrency in args.concurrency:
+                    before = dict(server.stats)
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(
+                            _run_one, mode, pdf_paths[:concurrency], pages, args.embeddings == "hash"
+                        ).result()
+                    result["server_requests"] = {
+                        key: value - before.get(key, 0) for key, value in server.stats.items()
+                    }
+                    results.append(result)
+                    print(json.dumps(result), file=sys.stderr)
+    server.shutdown()
+
+    report = json.dumps({
+        "benchmark": "pipeline",
+        "config": {
+            "latency": args.latency,
+            "rate_429": args.rate_429,
+            "retry_after": args.retry_after,
+            "embeddings": args.embeddings,
+        },
+        "results": results,
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Cold-start benchmark: how long a fresh process takes, and how much memory it holds,
+to reach each point of a web worker's life.
+
+- django: settings and apps loaded (what every manage.py command pays)
+- healthz: WSGI application imported and the first GET /healthz answered, i.e. a new
+  worker ready to take traffic
+- pipeline: the same plus the summarize pipeline imported (LangChain, FAISS, PyMuPDF),
+  what the first summarize request adds, and what every worker paid at boot before the
+  pipeline was loaded lazily
+- warm_up (with --warm-up): the same plus the embedding model loaded (torch and
+  sentence-transformers; needs the model weights), i.e. EMBEDDINGS_WARMUP=True
+
+Each probe runs --repeat times in a new interpreter. Reported per probe: median wall
+time of the whole process (interpreter start included), median seconds inside the
+process after interpreter start, peak RSS and which heavy modules ended up imported.
+Prints one JSON document:
+
+    python -m bench.startup --repeat 5 [--warm-up]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROBES = ("django", "healthz", "pipeline", "warm_up")
+HEAVY_MODULES = (
+    "numpy", "fitz", "faiss", "langchain_core", "langchain_community",
+    "sentence_transformers", "transformers", "torch",
+)
+_RESULT_PREFIX = "STARTUP_RESULT "
+
+
+def _probe(name: str) -> dict:
+    from bench.embeddings import peak_rss_mb
+
+    start = time.perf_counter()
+    import django
+
+    django.setup()
+    if name != "django":
+        from wsgiref.util import setup_testing_defaults
+
+        from academic_summarizer.wsgi import application
+
+        environ = {"PATH_INFO": "/healthz", "HTTP_HOST": "127.0.0.1"}
+        setup_testing_defaults(environ)
+        statuses = []
+        body = application(environ, lambda status, headers: statuses.append(status))
+        b"".join(body)
+        if not statuses[0].startswith("200"):
+            raise RuntimeError(f"GET /healthz answered {statuses[0]}")
+    if name == "pipeline":
+        from api import pipeline
+
+        pipeline.SUMMARY_MODES  # the first lookup imports rag.summarize
+    elif name == "warm_up":
+        from api import pipeline
+
+        pipeline.warm_up()
+    return {
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": peak_rss_mb(),
+        "loaded": [module for module in HEAVY_MODULES if module in sys.modules],
+    }
+
+
+def _run_probe(name: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "academic_summarizer.settings")
+    env.setdefault("SECRET_KEY", "bench")
+    env["ALLOWED_HOSTS"] = "127.0.0.1"
+    # The warm_up probe loads the model itself; the others measure a lazy worker.
+    env["EMBEDDINGS_WARMUP"] = "False"
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "bench.startup", "--probe", name],
+        capture_output=True, text=True, env=env,
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode:
+        raise SystemExit(f"probe {name} failed:\n{completed.stderr[-2000:]}")
+    # Libraries print to stdout too (PyMuPDF warnings), so look for our line.
+    line = next(line for line in completed.stdout.splitlines() if line.startswith(_RESULT_PREFIX))
+    result = json.loads(line[len(_RESULT_PREFIX):])
+    result["wall_seconds"] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="also time loading the embedding model")
+    parser.add_argument("--probe", choices=PROBES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(_RESULT_PREFIX + json.dumps(_probe(args.probe)))
+        return
+
+    results = []
+    for name in PROBES if args.warm_up else PROBES[:-1]:
+        runs = [_run_probe(name) for _ in range(args.repeat)]
+        result = {
+            "probe": name,
+            "wall_seconds": round(statistics.median(run["wall_seconds"] for run in runs), 3),
+            "in_process_seconds": round(statistics.median(run["seconds"] for run in runs), 3),
+            "peak_rss_mb": round(max(run["peak_rss_mb"] for run in runs), 1),
+            "loaded": runs[-1]["loaded"],
+        }
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+    print(json.dumps({"benchmark": "startup", "repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Pooled httpx.AsyncClient per provider origin, for the async LLM and compress clients.
+
+The asyncio counterpart of llm.sessions: one keep-alive client per origin and event
+loop (uvicorn runs one loop per worker), so hundreds of concurrent requests share a
+bounded set of connections instead of opening one each. A short-lived loop, such as
+the one asyncio.run() or Django's async_to_sync (async views under WSGI) makes per
+call, closes its clients when it shuts down.
+
+Tuning (env), in addition to HTTP_KEEPALIVE / HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT:
+- HTTP_ASYNC_POOL_SIZE: connections per origin (default 100); calls beyond it wait for a free one
+"""
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+
+from llm.sessions import HTTP_CONNECT_TIMEOUT, HTTP_KEEPALIVE, HTTP_READ_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+HTTP_ASYNC_POOL_SIZE = int(os.getenv("HTTP_ASYNC_POOL_SIZE", "100"))
+
+# A wait for a free pooled connection counts against the connect timeout in httpx, so
+# give it the read timeout: under load, queueing for the pool is expected.
+DEFAULT_TIMEOUT = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_READ_TIMEOUT)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+# Strong references to the _close_at_shutdown tasks, which the loop only holds weakly.
+_closers: set[asyncio.Task] = set()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """Return the pooled client for url's origin on the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients[loop] = {}
+        closer = loop.create_task(_close_at_shutdown(loop, clients))
+        _closers.add(closer)
+        closer.add_done_callback(_closers.discard)
+    origin = _origin(url)
+    client = clients.get(origin)
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=HTTP_ASYNC_POOL_SIZE,
+            max_keepalive_connections=HTTP_ASYNC_POOL_SIZE if HTTP_KEEPALIVE else 0,
+        )
+        client = clients[origin] = httpx.AsyncClient(base_url=origin, limits=limits, timeout=DEFAULT_TIMEOUT)
+    return client
+
+
+async def _close_at_shutdown(loop: asyncio.AbstractEventLoop, clients: dict) -> None:
+    """Wait until cancelled, then close clients. asyncio.run() cancels leftover tasks before closing its loop."""
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if _clients.get(loop) is clients:
+            del _clients[loop]
+        for client in list(clients.values()):
+            await client.aclose()
+
+
+async def post(url: str, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    POST through the pooled client for url. With stream=True the body is not read;
+    the caller must ``await response.aclose()`` (or read it) to release the connection.
+    """
+    client = get_client(url)
+    start = time.perf_counter()
+    request = client.build_request("POST", url, **kwargs)
+    response = await client.send(request, stream=stream)
+    logger.debug("POST %s -> %s total=%.3fs (async)", url, response.status_code, time.perf_counter() - start)
+    return response
+
+
+async def close_all() -> None:
+    """Close the running loop's clients (e.g. on ASGI lifespan shutdown or at the end of a script)."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+    clients.clear()
@@ -0,0 +1,20 @@
+"""Parsing helpers for the boolean settings read from the environment."""
+
+import os
+
+_TRUE = ("1", "true", "yes", "y", "on")
+_FALSE = ("0", "false", "no", "n", "off")
+
+
+def truthy_env(name: str, default: bool = False) -> bool:
+    """
+    Boolean env setting: 1/true/yes/on or 0/false/no/off (any case); default when
+    unset, empty or unrecognised.
+    """
+    # Be forgiving of inline comments in .env files (e.g. "true  # comment").
+    raw = (os.getenv(name) or "").split("#", 1)[0].strip().lower()
+    if raw in _TRUE:
+        return True
+    if raw in _FALSE:
+        return False
+    return default
@@ -0,0 +1,233 @@
+"""
+Small persistent key/value cache in a SQLite file.
+
+Safe to share between threads and between gunicorn workers (WAL mode, one
+connection per thread). Entries expire after a TTL and the least recently read
+entries are evicted once a namespace holds more than max_entries.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "kv.sqlite3"
+
+KV_CACHE_PATH = Path(os.getenv("KV_CACHE_PATH") or _DEFAULT_PATH)
+
+# Check the namespace size once every this many writes instead of on every write.
+_EVICT_EVERY = 100
+
+
+def make_key(*parts) -> str:
+    """Stable hash of the given parts, separated so ("ab", "c") != ("a", "bc")."""
+    hasher = xxhash.xxh3_128()
+    for part in parts:
+        data = str(part).encode("utf-8")
+        hasher.update(len(data).to_bytes(8, "little"))
+        hasher.update(data)
+    return hasher.hexdigest()
+
+
+class SQLiteCache:
+    """A namespace of string values in the shared cache file. ttl/max_entries of 0 mean unlimited."""
+
+    def __init__(self, namespace: str, ttl_seconds: float = 0, max_entries: int = 0, path=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = Path(path or KV_CACHE_PATH)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_accessed ON kv (namespace, accessed)")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created FROM kv WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                # Only the expired row: another writer may have replaced it meanwhile.
+                conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ? AND created = ?", (self.namespace, key, row[1])
+                )
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE kv SET accessed = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+        except sqlite3.Error as e:
+            logger.warning("%s cache read failed: %s", self.namespace, e)
+            row = None
+        self._count(row is not None)
+        return row[0] if row is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, now, now),
+            )
+        except sqlite3.Error as e:
+            logger.warning("%s cache write failed: %s", self.namespace, e)
+            return
+        self._wrote()
+
+    def update(self, key: str, fn) -> None:
+        """
+        Replace key's value with fn(current value, or None) in one write transaction, so
+        concurrent read-modify-writes from other threads or processes are not lost. fn
+        returning None leaves the entry as it is.
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, created FROM kv WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                expired = row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds
+                value = fn(None if row is None or expired else row[0])
+                if value is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO kv (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                        (self.namespace, key, value, now, now),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("%s cache write failed: %s", self.namespace, e)
+            return
+        if value is not None:
+            self._wrote()
+
+    def _wrote(self) -> None:
+        with self._counter_lock:
+            self._writes += 1
+            evict = self._writes % _EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def add(self, key: str, value: str) -> bool:
+        """
+        Store value only if key has no live entry. Returns whether it was stored; atomic
+        across threads and processes, so it can serve as a lock (fails open on errors).
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            if self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ? AND created < ?",
+                    (self.namespace, key, now - self.ttl_seconds),
+                )
+            return conn.execute(
+                "INSERT OR IGNORE INTO kv (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, now, now),
+            ).rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning("%s cache write failed: %s", self.namespace, e)
+            return True
+
+    def touch(self, key: str, value: str) -> bool:
+        """
+        Restart key's TTL if it still holds value (e.g. to keep a lock taken with add()).
+        Returns False only if it does not; fails open on errors like add().
+        """
+        now = time.time()
+        try:
+            return self._connect().execute(
+                "UPDATE kv SET created = ?, accessed = ? WHERE namespace = ? AND key = ? AND value = ?",
+                (now, now, self.namespace, key, value),
+            ).rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning("%s cache write failed: %s", self.namespace, e)
+            return True
+
+    def delete(self, key: str, value: str | None = None) -> None:
+        """Remove key; with value, only if that is still what it holds."""
+        try:
+            if value is None:
+                self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+            else:
+                self._connect().execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ? AND value = ?", (self.namespace, key, value)
+                )
+        except sqlite3.Error as e:
+            logger.warning("%s cache delete failed: %s", self.namespace, e)
+
+    def clear(self) -> None:
+        try:
+            self._connect().execute("DELETE FROM kv WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            logger.warning("%s cache clear failed: %s", self.namespace, e)
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently read beyond max_entries. Returns rows removed."""
+        removed = 0
+        try:
+            conn = self._connect()
+            if self.ttl_seconds:
+                removed += conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND created < ?",
+                    (self.namespace, time.time() - self.ttl_seconds),
+                ).rowcount
+            if self.max_entries:
+                removed += conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM kv WHERE namespace = ? ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_entries),
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning("%s cache eviction failed: %s", self.namespace, e)
+        return removed
+
+    def stats(self) -> dict:
+        try:
+            entries = self._connect().execute(
+                "SELECT COUNT(*) FROM kv WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
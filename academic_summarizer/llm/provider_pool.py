@@ -0,0 +1,189 @@
+"""
+Weighted round-robin over several chat providers/keys, with per-provider health.
+
+Every (provider, API key) pair is one Provider. ProviderPool.choose() picks among
+the healthy ones with smooth weighted round-robin, so a provider of weight 3 gets
+three calls for every one to a provider of weight 1, evenly interleaved. Callers
+report each outcome back:
+
+- success(provider, seconds) closes its circuit and updates its latency average;
+- failure(provider, retry_after) after a 429, 5xx or connection error. A 429 opens
+  the circuit until Retry-After has passed; other errors open it for
+  LLM_BREAKER_COOLDOWN seconds once LLM_BREAKER_FAILURES happen in a row. After the
+  cooldown one trial call is let through (half-open): success closes the circuit,
+  failure opens it again.
+
+Pools are shared per process (get_pool), so every ScaleDownLLM instance sees the
+same health state.
+
+Tuning (env):
+- LLM_BREAKER_FAILURES: consecutive failures that open a circuit (default 3)
+- LLM_BREAKER_COOLDOWN: seconds a circuit stays open (default 30)
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Weight of the newest sample in the latency moving average.
+_LATENCY_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class Provider:
+    """One OpenAI-compatible endpoint and API key."""
+
+    name: str
+    base_url: str
+    api_key: str = field(repr=False)
+    model: str
+    weight: int = 1
+    use_x_api_key: bool = False
+
+    @property
+    def label(self) -> str:
+        """Name plus the last characters of the key, safe for logs."""
+        return f"{self.name}:…{self.api_key[-4:]}"
+
+
+@dataclass
+class _Health:
+    weight: int
+    current: int = 0
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    trial_started: float = 0.0
+    rate_limited: bool = False
+    latency: float | None = None
+    calls: int = 0
+    failures: int = 0
+
+
+class ProviderPool:
+    """Thread-safe; shared by sync and async clients (no call blocks while holding the lock)."""
+
+    def __init__(self, providers):
+        self.providers = list(providers)
+        self._health = {provider: _Health(weight=max(1, provider.weight)) for provider in self.providers}
+        self._lock = threading.Lock()
+
+    def _available(self, health: _Health, now: float) -> bool:
+        if health.open_until > now:
+            return False
+        # Past the cooldown after a breaker opened: one trial call at a time (a trial that
+        # never reported back, e.g. a cancelled task, expires after another cooldown).
+        tripped = health.consecutive_failures >= LLM_BREAKER_FAILURES
+        return not (tripped and now - health.trial_started < LLM_BREAKER_COOLDOWN)
+
+    def choose(self, exclude=()) -> Provider | None:
+        """Next provider by weighted round-robin among healthy ones not in exclude; None if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                (provider, health)
+                for provider, health in self._health.items()
+                if provider not in exclude and self._available(health, now)
+            ]
+            if not candidates:
+                return None
+            total = 0
+            best = None
+            for provider, health in candidates:
+                health.current += health.weight
+                total += health.weight
+                if best is None or health.current > best[1].current:
+                    best = (provider, health)
+            provider, health = best
+            health.current -= total
+            if health.consecutive_failures >= LLM_BREAKER_FAILURES:
+                health.trial_started = now
+            health.calls += 1
+            return provider
+
+    def wait_time(self) -> float | None:
+        """
+        0 if a provider is available now, else seconds until the first rate-limited one
+        may be called again. None if only providers with tripped breakers are left:
+        waiting for those is pointless, callers should fail fast.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if any(self._available(health, now) for health in self._health.values()):
+                return 0.0
+            waits = [health.open_until - now for health in self._health.values() if health.rate_limited]
+            return max(0.0, min(waits)) if waits else None
+
+    def success(self, provider: Provider, seconds: float) -> None:
+        with self._lock:
+            health = self._health[provider]
+            if health.consecutive_failures >= LLM_BREAKER_FAILURES:
+                logger.info("LLM provider %s recovered", provider.label)
+            health.consecutive_failures = 0
+            health.open_until = 0.0
+            health.trial_started = 0.0
+            health.rate_limited = False
+            if health.latency is None:
+                health.latency = seconds
+            else:
+                health.latency += _LATENCY_ALPHA * (seconds - health.latency)
+
+    def failure(self, provider: Provider, retry_after: float | None = None) -> None:
+        """Record a 429 (with retry_after, in seconds), 5xx or connection error."""
+        now = time.monotonic()
+        with self._lock:
+            health = self._health[provider]
+            health.failures += 1
+            health.trial_started = 0.0
+            health.rate_limited = retry_after is not None
+            if retry_after is not None:
+                # A rate limit is an explicit "come back later", not a sign the provider is down.
+                health.open_until = max(health.open_until, now + retry_after)
+                return
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= LLM_BREAKER_FAILURES:
+                if health.consecutive_failures == LLM_BREAKER_FAILURES:
+                    logger.warning(
+                        "LLM provider %s failed %d times in a row; pausing it for %.0fs",
+                        provider.label,
+                        health.consecutive_failures,
+                        LLM_BREAKER_COOLDOWN,
+                    )
+                health.open_until = max(health.open_until, now + LLM_BREAKER_COOLDOWN)
+
+    def stats(self) -> list[dict]:
+        """Per-provider state: calls, failures, latency average, whether its circuit is open."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "provider": provider.label,
+                    "model": provider.model,
+                    "weight": health.weight,
+                    "calls": health.calls,
+                    "failures": health.failures,
+                    "latency": round(health.latency, 4) if health.latency is not None else None,
+                    "open": health.open_until > now,
+                }
+                for provider, health in self._health.items()
+            ]
+
+
+_pools: dict[tuple, ProviderPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(providers) -> ProviderPool:
+    """The process-wide pool for this exact provider list."""
+    key = tuple(providers)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ProviderPool(key)
+        return pool
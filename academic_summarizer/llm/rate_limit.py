@@ -0,0 +1,93 @@
+"""Client-side rate limiting shared by concurrent calls to one upstream API."""
+
+import asyncio
+import email.utils
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """Upstream answered 429. retry_after is the server's Retry-After in seconds, if it sent one."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value) -> float | None:
+    """Retry-After as seconds; accepts delta-seconds or an HTTP date. None if missing or invalid."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: at most `rate` acquisitions per second on average, bursts up to `capacity`.
+
+    pause() stops every caller until the given time has passed, which is how a
+    Retry-After from one request is honoured by all requests in flight. A rate of 0
+    disables the per-second limit but still honours pauses.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        if now <= self._updated:
+            return
+        if self.rate > 0:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> float:
+        """Take a token if one is available (returns 0), else return the seconds to wait. Hold _cond."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = self._paused_until - now
+        if wait > 0:
+            return wait
+        if self.rate <= 0:
+            return 0.0
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self._try_take()
+                if wait <= 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self) -> None:
+        """acquire() for coroutines: sleeps on the event loop instead of blocking the thread."""
+        while True:
+            with self._cond:
+                wait = self._try_take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Start refilling from an empty bucket once the pause ends, so callers do not stampede.
+            self._tokens = 0.0
+            self._updated = self._paused_until
@@ -0,0 +1,142 @@
+"""
+Cache of LLM answers, so repeated questions do not pay for a completion again.
+
+Exact layer: ScaleDownLLM.generate / generate_stream look up hash(provider, model,
+temperature, max_tokens, prompt) before calling the provider, for each provider the
+pool might send the call to, and store the answer under the provider and model that
+actually gave it. Only temperature=0 calls are cached, since any other temperature
+asks for a fresh sample. Map-reduce partial summaries go through the same layer.
+
+Semantic layer (off unless LLM_SEMANTIC_THRESHOLD > 0): the summarize pipeline keeps,
+per paper (PDF content hash), the embeddings of the queries it answered. A new query
+whose cosine similarity to one of them reaches the threshold reuses that answer
+without retrieval or an LLM call ("Summarize this paper" vs "Summarize the paper").
+Like exact keys, answers are scoped by the provider and model that gave them, and a
+lookup accepts any provider the pool might send the call to.
+
+Both layers live in the shared SQLite cache file with a TTL and LRU eviction.
+invalidate(paper) forgets a paper's semantic answers; clear() empties both layers
+(e.g. after changing prompts). Also: python manage.py clear_llm_cache [--paper HASH].
+
+Tuning (env):
+- LLM_CACHE_TTL: seconds an answer is reused (default 7 days)
+- LLM_CACHE_MAX_ENTRIES: answers kept (default 10000; 0 disables both layers)
+- LLM_SEMANTIC_THRESHOLD: cosine similarity for a semantic hit, e.g. 0.95 (default 0 = off)
+- LLM_SEMANTIC_MAX_PER_PAPER: queries remembered per paper (default 64)
+"""
+
+import base64
+import json
+import os
+import time
+
+import numpy as np
+
+from llm.kv_cache import SQLiteCache, make_key
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_SEMANTIC_THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0"))
+LLM_SEMANTIC_MAX_PER_PAPER = int(os.getenv("LLM_SEMANTIC_MAX_PER_PAPER", "64"))
+
+exact_cache = SQLiteCache("llm_responses", ttl_seconds=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+# One row per paper: a JSON list of {scope, query, vector, answer, created}, most recently used last,
+# rewritten in one transaction (SQLiteCache.update) so concurrent workers keep each other's entries.
+semantic_cache = SQLiteCache("llm_semantic", ttl_seconds=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+
+
+def cacheable(temperature: float) -> bool:
+    return temperature == 0 and LLM_CACHE_MAX_ENTRIES > 0
+
+
+def response_key(provider: str, model: str, temperature: float, max_tokens: int | None, prompt: str) -> str:
+    return make_key("chat", provider, model, temperature, max_tokens or 0, prompt)
+
+
+def semantic_enabled() -> bool:
+    return LLM_SEMANTIC_THRESHOLD > 0 and LLM_CACHE_MAX_ENTRIES > 0
+
+
+def _encode(vector) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode("ascii")
+
+
+def _decode(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float16).astype(np.float32)
+
+
+def semantic_scope(mode: str, provider: str, model: str) -> str:
+    """Semantic answers are only shared between calls with the same mode, provider and model."""
+    return f"{mode}:{provider}:{model}"
+
+
+def _entries(raw: str | None) -> list[dict]:
+    if raw is None:
+        return []
+    cutoff = time.time() - LLM_CACHE_TTL if LLM_CACHE_TTL else 0
+    return [entry for entry in json.loads(raw) if entry["created"] >= cutoff]
+
+
+def semantic_get(paper: str, scopes, query_vector) -> str | None:
+    """
+    The answer cached for paper whose query is most similar to query_vector, if that
+    similarity reaches LLM_SEMANTIC_THRESHOLD. Its scope must be one of scopes (see
+    semantic_scope; one per provider that may answer the call).
+    """
+    entries = [entry for entry in _entries(semantic_cache.get(paper)) if entry["scope"] in scopes]
+    if not entries:
+        return None
+    query = np.asarray(query_vector, dtype=np.float32)
+    matrix = np.stack([_decode(entry["vector"]) for entry in entries])
+    # Embeddings are L2-normalised, but float16 storage and other embedders may drift.
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    scores = (matrix @ query) / np.where(norms == 0, 1.0, norms)
+    best = int(np.argmax(scores))
+    if scores[best] < LLM_SEMANTIC_THRESHOLD:
+        return None
+    hit = entries[best]
+
+    def move_last(raw):
+        # Re-read inside the write, so entries stored meanwhile by other workers are kept.
+        stored = _entries(raw)
+        same = [entry for entry in stored if (entry["scope"], entry["query"]) == (hit["scope"], hit["query"])]
+        if not same:
+            return None
+        return json.dumps([entry for entry in stored if entry not in same] + same)
+
+    # Move the hit to the end, so the per-paper LRU keeps it.
+    semantic_cache.update(paper, move_last)
+    return hit["answer"]
+
+
+def semantic_put(paper: str, scope: str, query: str, query_vector, answer: str) -> None:
+    """Remember answer for query under scope, the mode, provider and model that gave it."""
+    new = {
+        "scope": scope,
+        "query": query,
+        "vector": _encode(query_vector),
+        "answer": answer,
+        "created": time.time(),
+    }
+
+    def add(raw):
+        entries = [entry for entry in _entries(raw) if not (entry["scope"] == scope and entry["query"] == query)]
+        entries.append(new)
+        return json.dumps(entries[-LLM_SEMANTIC_MAX_PER_PAPER:])
+
+    semantic_cache.update(paper, add)
+
+
+def invalidate(paper: str) -> None:
+    """Forget the semantic answers for one paper (by PDF content hash)."""
+    semantic_cache.delete(paper)
+
+
+def clear() -> None:
+    """Drop every cached answer, exact and semantic."""
+    exact_cache.clear()
+    semantic_cache.clear()
+
+
+def stats() -> dict:
+    return {"exact": exact_cache.stats(), "semantic": semantic_cache.stats()}
@@ -1,114 +1,180 @@
-﻿import os
+﻿import asyncio
+import asyncio
+import json
+import logging
+import os
 import time
+from collections.abc import AsyncIterator, Iterator
+from functools import lru_cache
 
+import httpx
 import requests
 
+from llm import async_sessions, response_cache, sessions, tracing
+from llm.env import truthy_env
+from llm.provider_pool import Provider, get_pool
+
+logger = logging.getLogger(__name__)
+
 # Default endpoints
 _DEFAULT_SCALEDOWN_BASE_URL = "https://api.scaledown.xyz/v1"
 _DEFAULT_GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 _DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
 
+_PROVIDER_ORDER = ("scaledown", "groq", "openai")
+_KEY_ENV = {"scaledown": "SCALEDOWN_API_KEY", "groq": "GROQ_API_KEY", "openai": "OPENAI_API_KEY"}
+
 _MAX_RETRIES_429 = 4
 _INITIAL_BACKOFF = 2.0
 
 
-def _truthy_env(name: str) -> bool:
-    raw = (os.getenv(name) or "").strip().lower()
-    if not raw:
-        return False
-    # Be forgiving of inline comments in .env files (e.g. "true  # comment").
-    raw = raw.split("#", 1)[0].strip()
-    return raw in ("1", "true", "yes", "y", "on")
+def _retry_wait(response, attempt: int) -> float:
+    """Seconds to wait before retrying a 429: the server's Retry-After, else exponential backoff."""
+    try:
+        wait = int(response.headers.get("Retry-After", _INITIAL_BACKOFF * (2**attempt)))
+    except (TypeError, ValueError):
+        wait = _INITIAL_BACKOFF * (2**attempt)
+    return min(wait, 60)
+
+
+def _failure_kind(status: int) -> str | None:
+    """How a provider's status code counts for failover; None if the call went through (or was the caller's fault)."""
+    if status == 401:
+        return "unauthorized"
+    if status == 429:
+        return "rate_limited"
+    if status >= 500:
+        return "server_error"
+    return None
+
+
+def _env_keys(name: str) -> list[str]:
+    """API keys of a provider; *_API_KEY may hold several, comma-separated."""
+    return [key.strip() for key in (os.getenv(_KEY_ENV[name]) or "").split(",") if key.strip()]
+
+
+def _provider_weights() -> dict[str, int]:
+    """LLM_PROVIDER_WEIGHTS, e.g. "groq=3,openai=1" (weight per key; default 1)."""
+    return _parse_weights(os.getenv("LLM_PROVIDER_WEIGHTS") or "")
+
+
+@lru_cache(maxsize=8)
+def _parse_weights(raw: str) -> dict[str, int]:
+    # Cached per value, so a bad entry is reported once rather than on every client.
+    weights = {}
+    for item in raw.split(","):
+        name, _, weight = item.partition("=")
+        if not name.strip() or not weight.strip():
+            continue
+        try:
+            value = int(weight)
+            if value < 1:
+                raise ValueError
+        except ValueError:
+            logger.warning("Ignoring LLM_PROVIDER_WEIGHTS entry %r: weights are whole numbers >= 1; using 1", item.strip())
+            value = 1
+        weights[name.strip().lower()] = value
+    return weights
+
+
+def _headers(api_key: str, use_x_key: bool) -> dict:
+    headers = {"Content-Type": "application/json"}
+    if use_x_key:
+        headers["x-api-key"] = api_key
+    else:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
 
 
 class ScaleDownLLM:
-    """Small OpenAI-compatible chat client.
+    """Small OpenAI-compatible chat client over a pool of providers.
 
     Providers:
-    - scaledown: SCALEDOWN_API_KEY (+ optional SCALEDOWN_BASE_URL, SCALEDOWN_USE_X_API_KEY)
-    - groq: GROQ_API_KEY (+ optional GROQ_BASE_URL)
-    - openai: OPENAI_API_KEY (+ optional OPENAI_BASE_URL)
+    - scaledown: SCALEDOWN_API_KEY (+ optional SCALEDOWN_BASE_URL, SCALEDOWN_USE_X_API_KEY, SCALEDOWN_MODEL)
+    - groq: GROQ_API_KEY (+ optional GROQ_BASE_URL, GROQ_MODEL)
+    - openai: OPENAI_API_KEY (+ optional OPENAI_BASE_URL, OPENAI_MODEL)
+    Each *_API_KEY may hold several comma-separated keys; every key joins the pool.
 
     Selection:
-    - If LLM_PROVIDER is set, it forces the provider.
-    - Otherwise keeps the previous behavior: ScaleDown -> Groq -> OpenAI.
+    - If LLM_PROVIDERS is set (e.g. "groq,openai"), those providers are pooled.
+    - Else if LLM_PROVIDER is set, it forces the provider.
+    - Otherwise every provider with a key is pooled, in the order ScaleDown -> Groq -> OpenAI.
+    Calls are spread by weighted round-robin (LLM_PROVIDER_WEIGHTS, e.g. "groq=3,openai=1")
+    and move to the next provider at once on 429, 5xx, 401 or a connection error
+    (see llm.provider_pool for the circuit breakers).
 
     Model:
-    - If LLM_MODEL is set, it overrides the model.
-    - Otherwise uses a provider-appropriate default.
+    - The model argument, else <PROVIDER>_MODEL, else LLM_MODEL, else a provider-appropriate default.
+    - provider, api_key, base_url and model describe the first provider in the pool.
     """
 
     def __init__(self, model: str | None = None):
         self.provider = "unset"
         self.api_key = ""
         self.base_url = ""
+        self.pool = None
 
+        providers_override = [
+            name.strip().lower() for name in (os.getenv("LLM_PROVIDERS") or "").split(",") if name.strip()
+        ]
         provider_override = (os.getenv("LLM_PROVIDER") or "").strip().lower()
 
-        scaledown_key = (os.getenv("SCALEDOWN_API_KEY") or "").strip()
-        groq_key = (os.getenv("GROQ_API_KEY") or "").strip()
-        openai_key = (os.getenv("OPENAI_API_KEY") or "").strip()
-
-        if provider_override:
-            self._configure_provider(provider_override, scaledown_key, groq_key, openai_key)
+        if providers_override:
+            names = providers_override
+        elif provider_override:
+            names = [provider_override]
         else:
-            # Previous behavior (kept for backward compatibility)
-            if scaledown_key:
-                self._configure_provider("scaledown", scaledown_key, groq_key, openai_key)
-            elif groq_key:
-                self._configure_provider("groq", scaledown_key, groq_key, openai_key)
-            elif openai_key:
-                self._configure_provider("openai", scaledown_key, groq_key, openai_key)
-            else:
-                self.provider = "unset"
-                self.api_key = ""
-                self.base_url = ""
-
-        env_model = (os.getenv("LLM_MODEL") or "").strip()
-        self.model = (model or "").strip() or env_model or self._default_model_for_provider(self.provider)
-
-    def _configure_provider(
-        self,
-        provider: str,
-        scaledown_key: str,
-        groq_key: str,
-        openai_key: str,
-    ) -> None:
+            names = [name for name in _PROVIDER_ORDER if _env_keys(name)]
+
+        providers = []
+        for name in names:
+            providers.extend(self._configure_provider(name, model))
+
+        if providers:
+            first = providers[0]
+            self.provider = first.name
+            self.api_key = first.api_key
+            self.base_url = first.base_url
+            self.model = first.model
+            self.pool = get_pool(providers)
+        else:
+            env_model = (os.getenv("LLM_MODEL") or "").strip()
+            self.model = (model or "").strip() or env_model or self._default_model_for_provider(self.provider)
+
+    def _configure_provider(self, provider: str, model: str | None = None) -> list[Provider]:
+        """One Provider per configured key of the named provider."""
         provider = (provider or "").strip().lower()
+        if provider not in _KEY_ENV:
+            raise ValueError("Unknown LLM_PROVIDER. Use one of: scaledown, groq, openai.")
 
-        if provider == "scaledown":
-            if not scaledown_key:
-                raise ValueError("LLM_PROVIDER=scaledown but SCALEDOWN_API_KEY is not set.")
+        keys = _env_keys(provider)
+        if not keys:
+            raise ValueError(f"LLM_PROVIDER={provider} but {_KEY_ENV[provider]} is not set.")
 
+        if provider == "scaledown":
             raw_url = (os.getenv("SCALEDOWN_BASE_URL") or "").strip()
             # api.scaledown.ai does not resolve; use .xyz host instead.
             if raw_url and "api.scaledown.ai" not in raw_url:
                 base_url = raw_url
             else:
                 base_url = _DEFAULT_SCALEDOWN_BASE_URL
-
-            self.provider = "scaledown"
-            self.api_key = scaledown_key
-            self.base_url = base_url
-            return
-
-        if provider == "groq":
-            if not groq_key:
-                raise ValueError("LLM_PROVIDER=groq but GROQ_API_KEY is not set.")
-            self.provider = "groq"
-            self.api_key = groq_key
-            self.base_url = (os.getenv("GROQ_BASE_URL") or _DEFAULT_GROQ_BASE_URL).strip()
-            return
-
-        if provider == "openai":
-            if not openai_key:
-                raise ValueError("LLM_PROVIDER=openai but OPENAI_API_KEY is not set.")
-            self.provider = "openai"
-            self.api_key = openai_key
-            self.base_url = (os.getenv("OPENAI_BASE_URL") or _DEFAULT_OPENAI_BASE_URL).strip()
-            return
-
-        raise ValueError("Unknown LLM_PROVIDER. Use one of: scaledown, groq, openai.")
+        elif provider == "groq":
+            base_url = (os.getenv("GROQ_BASE_URL") or _DEFAULT_GROQ_BASE_URL).strip()
+        else:
+            base_url = (os.getenv("OPENAI_BASE_URL") or _DEFAULT_OPENAI_BASE_URL).strip()
+
+        provider_model = (
+            (model or "").strip()
+            or (os.getenv(f"{provider.upper()}_MODEL") or "").strip()
+            or (os.getenv("LLM_MODEL") or "").strip()
+            or self._default_model_for_provider(provider)
+        )
+        weight = _provider_weights().get(provider, 1)
+        use_x_api_key = provider == "scaledown" and truthy_env("SCALEDOWN_USE_X_API_KEY")
+        return [
+            Provider(provider, base_url, key, provider_model, weight=weight, use_x_api_key=use_x_api_key)
+            for key in keys
+        ]
 
     @staticmethod
     def _default_model_for_provider(provider: str) -> str:
@@ -118,7 +184,7 @@ class ScaleDownLLM:
         # Works for OpenAI, and many OpenAI-compatible proxies.
         return "gpt-4o-mini"
 
-    def generate(self, prompt: str, temperature: float = 0) -> str:
+    def _check_configured(self) -> None:
         if not self.base_url or not self.base_url.strip():
             raise ValueError(
                 "No LLM base URL configured. Set LLM_PROVIDER and provider base URL env vars."
@@ -128,59 +194,343 @@ class ScaleDownLLM:
                 "No API key configured. Set SCALEDOWN_API_KEY, GROQ_API_KEY, or OPENAI_API_KEY."
             )
 
-        url = f"{self.base_url.rstrip('/')}/chat/completions"
+    def _payload(self, prompt: str, temperature: float, max_tokens: int | None = None) -> dict:
         payload = {
             "model": self.model,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": temperature,
         }
-
-        use_x_api_key = self.provider == "scaledown" and _truthy_env("SCALEDOWN_USE_X_API_KEY")
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    def _post(self, payload: dict, stream: bool = False) -> requests.Response:
+        """
+        POST a chat completion through the provider pool. A 429, 5xx, 401 or connection
+        error moves on to the next provider at once; when every provider is rate limited,
+        waits for the first Retry-After (up to _MAX_RETRIES_429 times). The response's
+        ``provider`` attribute is the Provider that answered.
+        """
+        last_error = None
+        for attempt in range(_MAX_RETRIES_429 + 1):
+            tried = set()
+            rate_limited = False
+            while (provider := self.pool.choose(exclude=tried)) is not None:
+                if tried:
+                    tracing.add("failovers")
+                tried.add(provider)
+                start = time.perf_counter()
+                try:
+                    response = self._request(provider, payload, stream)
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    logger.warning("LLM provider %s unreachable (%s); trying the next one", provider.label, exc)
+                    self.pool.failure(provider)
+                    last_error = exc
+                    continue
+                kind = _failure_kind(response.status_code)
+                if kind is None:
+                    self.pool.success(provider, time.perf_counter() - start)
+                    response.raise_for_status()
+                    response.provider = provider
+                    return response
+                response.close()
+                last_error = self._failed(provider, response, kind, attempt)
+                rate_limited = rate_limited or kind == "rate_limited"
+            if tried and not rate_limited:
+                raise last_error
+            wait = self.pool.wait_time()
+            if wait is None or attempt == _MAX_RETRIES_429:
+                break
+            tracing.add("retries")
+            time.sleep(min(wait, 60))
+        raise last_error or self._unavailable()
+
+    def _request(self, provider: Provider, payload: dict, stream: bool) -> requests.Response:
+        url = f"{provider.base_url.rstrip('/')}/chat/completions"
+        payload = {**payload, "model": provider.model}
 
         def do_request(use_x_key: bool):
-            headers = {"Content-Type": "application/json"}
-            if use_x_key:
-                headers["x-api-key"] = self.api_key
-            else:
-                headers["Authorization"] = f"Bearer {self.api_key}"
-            return requests.post(url, headers=headers, json=payload, timeout=60)
+            return sessions.post(url, headers=_headers(provider.api_key, use_x_key), json=payload, stream=stream)
 
-        response = do_request(use_x_api_key)
+        response = do_request(provider.use_x_api_key)
 
         # ScaleDown 403 often means wrong auth style; retry once with the other.
-        if self.provider == "scaledown" and response.status_code == 403:
-            response = do_request(not use_x_api_key)
-
-        if response.status_code == 401:
-            if self.provider == "groq":
-                raise ValueError(
-                    "401 Unauthorized: invalid Groq API key. Set GROQ_API_KEY in your .env.local file."
-                ) from None
-            if self.provider == "openai":
-                raise ValueError(
-                    "401 Unauthorized: invalid OpenAI API key. Set OPENAI_API_KEY in your .env.local file."
-                ) from None
-            raise ValueError(
-                "401 Unauthorized: invalid ScaleDown API key. Set SCALEDOWN_API_KEY in your .env.local file."
-            ) from None
+        if provider.name == "scaledown" and response.status_code == 403:
+            response.close()
+            response = do_request(not provider.use_x_api_key)
+        return response
+
+    def _failed(self, provider: Provider, response, kind: str, attempt: int) -> Exception:
+        """Report a failed call to the pool; returns the error to raise if no provider succeeds."""
+        logger.warning("LLM provider %s answered %s; trying the next one", provider.label, response.status_code)
+        if kind == "rate_limited":
+            self.pool.failure(provider, retry_after=_retry_wait(response, attempt))
+            return self._rate_limited(provider.name)
+        self.pool.failure(provider)
+        if kind == "unauthorized":
+            return self._unauthorized(provider.name)
+        try:
+            response.raise_for_status()
+        except (requests.HTTPError, httpx.HTTPStatusError) as exc:
+            return exc
+        return ValueError(f"{provider.name} answered {response.status_code}.")
+
+    def _unauthorized(self, provider: str | None = None) -> ValueError:
+        provider = provider or self.provider
+        if provider == "groq":
+            return ValueError("401 Unauthorized: invalid Groq API key. Set GROQ_API_KEY in your .env.local file.")
+        if provider == "openai":
+            return ValueError("401 Unauthorized: invalid OpenAI API key. Set OPENAI_API_KEY in your .env.local file.")
+        return ValueError(
+            "401 Unauthorized: invalid ScaleDown API key. Set SCALEDOWN_API_KEY in your .env.local file."
+        )
+
+    def _rate_limited(self, provider: str | None = None) -> ValueError:
+        return ValueError(
+            f"429 Too Many Requests: {provider or self.provider} rate limit hit. Wait a minute and try again."
+        )
+
+    def _unavailable(self) -> ValueError:
+        return ValueError("All LLM providers are failing and paused; try again in a minute.")
+
+    def cache_targets(self) -> list[tuple[str, str]]:
+        """The distinct (provider, model) pairs the pool may send a call to, in pool order."""
+        if self.pool is None:
+            return []
+        return list(dict.fromkeys((provider.name, provider.model) for provider in self.pool.providers))
+
+    def _cache_lookup(
+        self, prompt: str, temperature: float, max_tokens: int | None, answered_by: dict | None = None
+    ) -> tuple[bool, str | None]:
+        """
+        (whether the call is cacheable, cached answer) from llm.response_cache. Any
+        provider in the pool may answer the call, so each one's (provider, model) key
+        is tried, in pool order.
+        """
+        if not response_cache.cacheable(temperature):
+            return False, None
+        cached = None
+        with tracing.stage("llm_cache") as span:
+            for name, model in self.cache_targets():
+                cached = response_cache.exact_cache.get(
+                    response_cache.response_key(name, model, temperature, max_tokens, prompt)
+                )
+                if cached is not None:
+                    _answered(answered_by, name, model)
+                    break
+            span["hit"] = int(cached is not None)
+        return True, cached
+
+    @staticmethod
+    def _cache_store(provider: Provider, prompt: str, temperature: float, max_tokens: int | None, answer: str) -> None:
+        """Cache answer under the provider and model that gave it."""
+        key = response_cache.response_key(provider.name, provider.model, temperature, max_tokens, prompt)
+        response_cache.exact_cache.set(key, answer)
+
+    def generate(
+        self, prompt: str, temperature: float = 0, max_tokens: int | None = None, answered_by: dict | None = None
+    ) -> str:
+        """
+        Complete prompt. temperature=0 answers are served from and saved to llm.response_cache.
+        answered_by, if given, receives the "provider" and "model" that gave the answer.
+        """
+        self._check_configured()
+        cacheable, cached = self._cache_lookup(prompt, temperature, max_tokens, answered_by)
+        if cached is not None:
+            return cached
+        with tracing.stage("llm", retries=0) as span:
+            response = self._post(self._payload(prompt, temperature, max_tokens))
+            _answered(answered_by, response.provider.name, response.provider.model)
+            data = response.json()
+            usage = data.get("usage") or {}
+            if "total_tokens" in usage:
+                span["tokens"] = usage["total_tokens"]
+        content = data["choices"][0]["message"]["content"]
+        if cacheable:
+            self._cache_store(response.provider, prompt, temperature, max_tokens, content)
+        return content
+
+    def generate_stream(
+        self, prompt: str, temperature: float = 0, max_tokens: int | None = None, answered_by: dict | None = None
+    ) -> Iterator[str]:
+        """
+        Yield the completion text as it is generated, using the OpenAI-compatible
+        ``stream: true`` mode (Server-Sent Events of ``chat.completion.chunk`` objects).
+        A cached answer is yielded in one piece; a completed stream is cached like generate().
+        answered_by is filled in as in generate(), before the first text is yielded.
+        """
+        self._check_configured()
+        cacheable, cached = self._cache_lookup(prompt, temperature, max_tokens, answered_by)
+        if cached is not None:
+            yield cached
+            return
+        payload = self._payload(prompt, temperature, max_tokens)
+        payload["stream"] = True
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        response = self._post(payload, stream=True)
+        _answered(answered_by, response.provider.name, response.provider.model)
+        # SSE is always UTF-8; requests would otherwise assume ISO-8859-1 for text/*.
+        response.encoding = "utf-8"
+        try:
+            for content in self._iter_stream(response):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(content)
+                yield content
+            if cacheable:
+                self._cache_store(response.provider, prompt, temperature, max_tokens, "".join(parts))
+        finally:
+            tracing.record("llm_stream", time.perf_counter() - start, first_token_seconds=first_token or 0.0)
+
+    @staticmethod
+    def _iter_stream(response: requests.Response) -> Iterator[str]:
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                yield from _sse_content(line)
+
+
+def _answered(answered_by: dict | None, provider: str, model: str) -> None:
+    if answered_by is not None:
+        answered_by.update(provider=provider, model=model)
+
+
+def _sse_content(line: str) -> list[str]:
+    """Text deltas in one Server-Sent-Events line of a chat completion stream."""
+    if not line or not line.startswith("data:"):
+        return []
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        # Callers keep reading to the end of the body so the connection goes back to the pool.
+        return []
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return []
+    contents = []
+    for choice in chunk.get("choices") or []:
+        content = (choice.get("delta") or {}).get("content")
+        if content:
+            contents.append(content)
+    return contents
+
+
+class AsyncScaleDownLLM(ScaleDownLLM):
+    """
+    asyncio variant of ScaleDownLLM on a pooled httpx.AsyncClient (llm.async_sessions).
 
-        # 429 Too Many Requests: retry with backoff (rate limit)
-        if response.status_code == 429:
-            for attempt in range(_MAX_RETRIES_429):
+    Same providers, models and error messages; 429 backoff uses asyncio.sleep, so a
+    waiting call does not hold a thread.
+    """
+
+    async def _acache_lookup(
+        self, prompt: str, temperature: float, max_tokens: int | None, answered_by: dict | None = None
+    ) -> tuple[bool, str | None]:
+        """_cache_lookup on a thread: the SQLite cache must not block the event loop."""
+        return await asyncio.to_thread(self._cache_lookup, prompt, temperature, max_tokens, answered_by)
+
+    async def _acache_store(
+        self, provider: Provider, prompt: str, temperature: float, max_tokens: int | None, answer: str
+    ) -> None:
+        await asyncio.to_thread(self._cache_store, provider, prompt, temperature, max_tokens, answer)
+
+    async def _apost(self, payload: dict, stream: bool = False) -> httpx.Response:
+        last_error = None
+        for attempt in range(_MAX_RETRIES_429 + 1):
+            tried = set()
+            rate_limited = False
+            while (provider := self.pool.choose(exclude=tried)) is not None:
+                if tried:
+                    tracing.add("failovers")
+                tried.add(provider)
+                start = time.perf_counter()
                 try:
-                    wait = int(response.headers.get("Retry-After", _INITIAL_BACKOFF * (2**attempt)))
-                except (TypeError, ValueError):
-                    wait = _INITIAL_BACKOFF * (2**attempt)
-                wait = min(wait, 60)
-                time.sleep(wait)
-                response = do_request(use_x_api_key)
-                if response.status_code != 429:
-                    break
-            if response.status_code == 429:
-                raise ValueError(
-                    f"429 Too Many Requests: {self.provider} rate limit hit. Wait a minute and try again."
-                ) from None
-
-        response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+                    response = await self._arequest(provider, payload, stream)
+                except httpx.TransportError as exc:
+                    logger.warning("LLM provider %s unreachable (%r); trying the next one", provider.label, exc)
+                    self.pool.failure(provider)
+                    last_error = exc
+                    continue
+                kind = _failure_kind(response.status_code)
+                if kind is None:
+                    self.pool.success(provider, time.perf_counter() - start)
+                    if response.is_error:
+                        await response.aread()
+                        await response.aclose()
+                    response.raise_for_status()
+                    response.provider = provider
+                    return response
+                await response.aclose()
+                last_error = self._failed(provider, response, kind, attempt)
+                rate_limited = rate_limited or kind == "rate_limited"
+            if tried and not rate_limited:
+                raise last_error
+            wait = self.pool.wait_time()
+            if wait is None or attempt == _MAX_RETRIES_429:
+                break
+            tracing.add("retries")
+            await asyncio.sleep(min(wait, 60))
+        raise last_error or self._unavailable()
+
+    async def _arequest(self, provider: Provider, payload: dict, stream: bool) -> httpx.Response:
+        url = f"{provider.base_url.rstrip('/')}/chat/completions"
+        payload = {**payload, "model": provider.model}
+
+        def do_request(use_x_key: bool):
+            return async_sessions.post(url, stream=stream, headers=_headers(provider.api_key, use_x_key), json=payload)
+
+        response = await do_request(provider.use_x_api_key)
+
+        # ScaleDown 403 often means wrong auth style; retry once with the other.
+        if provider.name == "scaledown" and response.status_code == 403:
+            await response.aclose()
+            response = await do_request(not provider.use_x_api_key)
+        return response
+
+    async def generate(
+        self, prompt: str, temperature: float = 0, max_tokens: int | None = None, answered_by: dict | None = None
+    ) -> str:
+        self._check_configured()
+        cacheable, cached = await self._acache_lookup(prompt, temperature, max_tokens, answered_by)
+        if cached is not None:
+            return cached
+        with tracing.stage("llm", retries=0) as span:
+            response = await self._apost(self._payload(prompt, temperature, max_tokens))
+            _answered(answered_by, response.provider.name, response.provider.model)
+            data = response.json()
+            usage = data.get("usage") or {}
+            if "total_tokens" in usage:
+                span["tokens"] = usage["total_tokens"]
+        content = data["choices"][0]["message"]["content"]
+        if cacheable:
+            await self._acache_store(response.provider, prompt, temperature, max_tokens, content)
+        return content
+
+    async def generate_stream(
+        self, prompt: str, temperature: float = 0, max_tokens: int | None = None, answered_by: dict | None = None
+    ) -> AsyncIterator[str]:
+        self._check_configured()
+        cacheable, cached = await self._acache_lookup(prompt, temperature, max_tokens, answered_by)
+        if cached is not None:
+            yield cached
+            return
+        payload = self._payload(prompt, temperature, max_tokens)
+        payload["stream"] = True
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        response = await self._apost(payload, stream=True)
+        _answered(answered_by, response.provider.name, response.provider.model)
+        try:
+            async for line in response.aiter_lines():
+                for content in _sse_content(line):
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    parts.append(content)
+                    yield content
+            if cacheable:
+                await self._acache_store(response.provider, prompt, temperature, max_tokens, "".join(parts))
+        finally:
+            await response.aclose()
+            tracing.record("llm_stream", time.perf_counter() - start, first_token_seconds=first_token or 0.0)
@@ -1,14 +1,51 @@
 """ScaleDown Compress API client: https://api.scaledown.xyz/compress/raw/ with x-api-key."""
 
+import asyncio
 import os
-import requests
 
+from llm import async_sessions, sessions
+from llm.kv_cache import SQLiteCache, make_key
+from llm.rate_limit import RateLimited, parse_retry_after
 
-def compress_text(text: str, context: str = "") -> str:
-    """
-    Compress text via ScaleDown API. Uses SCALEDOWN_COMPRESS_URL and SCALEDOWN_API_KEY from env.
-    Payload format: context, prompt, scaledown.rate (see ScaleDown docs).
-    """
+_COMPRESS_RATE = "auto"
+
+# Per-chunk result cache: repeated text (boilerplate, references, re-uploads) costs no API call.
+COMPRESS_CACHE_TTL = float(os.getenv("COMPRESS_CACHE_TTL", str(30 * 24 * 3600)))
+# 0 disables the cache.
+COMPRESS_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESS_CACHE_MAX_ENTRIES", "100000"))
+
+compress_cache = SQLiteCache(
+    "compress", ttl_seconds=COMPRESS_CACHE_TTL, max_entries=COMPRESS_CACHE_MAX_ENTRIES
+)
+
+
+class BadResponse(ValueError):
+    """The compress API answered without an error status but its body holds no compressed text."""
+
+
+def _parse_response(response) -> str:
+    content_type = (response.headers.get("Content-Type") or "").lower()
+    if "application/json" not in content_type:
+        return response.text
+    try:
+        data = response.json()
+    except ValueError as e:
+        raise BadResponse(f"Compress API returned invalid JSON: {e}") from e
+    if isinstance(data, dict):
+        data = (
+            data.get("compressed")
+            or data.get("prompt")
+            or data.get("result")
+            or data.get("text")
+            or str(data)
+        )
+    if not isinstance(data, str):
+        raise BadResponse(f"Compress API returned a JSON {type(data).__name__}, not text.")
+    return data
+
+
+def _prepare(text: str, context: str):
+    """Return (url, headers, payload, cache_key, cached_result) for a compress call."""
     url = (os.getenv("SCALEDOWN_COMPRESS_URL") or "https://api.scaledown.xyz/compress/raw/").strip().rstrip("/") + "/"
     api_key = (os.getenv("SCALEDOWN_API_KEY") or "").strip()
 
@@ -21,29 +58,68 @@ def compress_text(text: str, context: str = "") -> str:
     payload = {
         "context": context or "Academic paper excerpt.",
         "prompt": text,
-        "scaledown": {"rate": "auto"},
+        "scaledown": {"rate": _COMPRESS_RATE},
     }
+    headers = {
+        "x-api-key": api_key,
+        "Content-Type": "application/json",
+    }
+
+    cache_key = cached = None
+    if COMPRESS_CACHE_MAX_ENTRIES > 0:
+        cache_key = make_key(url, payload["context"], _COMPRESS_RATE, text)
+        cached = compress_cache.get(cache_key)
+    return url, headers, payload, cache_key, cached
 
-    response = requests.post(
-        url,
-        headers={
-            "x-api-key": api_key,
-            "Content-Type": "application/json",
-        },
-        json=payload,
-        timeout=60,
+
+def _rate_limited(response) -> RateLimited:
+    return RateLimited(
+        "429 Too Many Requests from the ScaleDown compress API.",
+        retry_after=parse_retry_after(response.headers.get("Retry-After")),
     )
+
+
+def compress_text(text: str, context: str = "", limiter=None) -> str:
+    """
+    Compress text via ScaleDown API. Uses SCALEDOWN_COMPRESS_URL and SCALEDOWN_API_KEY from env.
+    Payload format: context, prompt, scaledown.rate (see ScaleDown docs).
+    Raises RateLimited on 429 so callers can back off together, and BadResponse when the
+    body holds no compressed text.
+    Results are cached by (url, context, rate, text); see compress_cache.stats() for hit/miss counts.
+    limiter (a TokenBucket) is only acquired when the API is actually called, not on cache hits.
+    """
+    url, headers, payload, cache_key, cached = _prepare(text, context)
+    if cached is not None:
+        return cached
+
+    if limiter is not None:
+        limiter.acquire()
+    response = sessions.post(url, headers=headers, json=payload)
+    if response.status_code == 429:
+        raise _rate_limited(response)
     response.raise_for_status()
-    content_type = (response.headers.get("Content-Type") or "").lower()
-    if "application/json" in content_type:
-        data = response.json()
-        if isinstance(data, str):
-            return data
-        return (
-            data.get("compressed")
-            or data.get("prompt")
-            or data.get("result")
-            or data.get("text")
-            or str(data)
-        )
-    return response.text
+    compressed = _parse_response(response)
+    if cache_key is not None:
+        compress_cache.set(cache_key, compressed)
+    return compressed
+
+
+async def acompress_text(text: str, context: str = "", limiter=None) -> str:
+    """
+    asyncio variant of compress_text on llm.async_sessions; waits for limiter, and
+    reads and writes the SQLite cache on a thread, without blocking the loop.
+    """
+    url, headers, payload, cache_key, cached = await asyncio.to_thread(_prepare, text, context)
+    if cached is not None:
+        return cached
+
+    if limiter is not None:
+        await limiter.acquire_async()
+    response = await async_sessions.post(url, headers=headers, json=payload)
+    if response.status_code == 429:
+        raise _rate_limited(response)
+    response.raise_for_status()
+    compressed = _parse_response(response)
+    if cache_key is not None:
+        await asyncio.to_thread(compress_cache.set, cache_key, compressed)
+    return compressed
@@ -0,0 +1,178 @@
+"""
+Shared, pooled HTTP sessions for the LLM and compress clients.
+
+One requests.Session per provider origin (scheme://host:port) keeps TCP+TLS
+connections alive between calls, so chunk-level compression does not pay a
+handshake per chunk. Every call made through post() gets a RequestTiming
+(DNS, connect, time to first byte, total) attached as ``response.timing``.
+
+Tuning (env):
+- HTTP_POOL_SIZE: connections kept per origin (default 10)
+- HTTP_KEEPALIVE: set to false to close connections after each call (default true)
+- HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT: seconds (default 10 / 60)
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from llm.env import truthy_env
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_KEEPALIVE = truthy_env("HTTP_KEEPALIVE", default=True)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+@dataclass
+class RequestTiming:
+    """Seconds spent in each phase of one HTTP call. dns/connect are 0 on a reused connection."""
+
+    url: str
+    status: int = 0
+    dns: float = 0.0
+    connect: float = 0.0
+    ttfb: float = 0.0
+    total: float = 0.0
+    reused: bool = True
+
+
+_active = threading.local()
+
+
+class _TimedConnectionMixin:
+    """
+    Time DNS and connect (TCP + TLS) separately.
+
+    _new_conn resolves the host itself and opens the socket to the resolved address,
+    but the hostname is restored before connect() wraps the socket in TLS, so SNI and
+    certificate verification still see the hostname, never the IP.
+    """
+
+    _resolve_seconds = 0.0
+
+    def connect(self):
+        timing = getattr(_active, "timing", None)
+        self._resolve_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            if timing is not None:
+                timing.dns = self._resolve_seconds
+                timing.connect = time.perf_counter() - start - self._resolve_seconds
+                timing.reused = False
+
+    def _new_conn(self):
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, self.port, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        except OSError:
+            # Let urllib3 raise its usual resolution error.
+            addresses = [host]
+        self._resolve_seconds = time.perf_counter() - start
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError):
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # Replace (never mutate) the manager's scheme map; the default dict is shared module state.
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the pooled session for url's origin, creating it on first use."""
+    origin = _origin(url)
+    session = _sessions.get(origin)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            adapter = _TimedAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount(origin + "/", adapter)
+            if not HTTP_KEEPALIVE:
+                session.headers["Connection"] = "close"
+            _sessions[origin] = session
+    return session
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """
+    requests.post through the pooled session for url, with DEFAULT_TIMEOUT unless given.
+
+    The returned response carries ``response.timing``. With stream=True, total is the
+    time until headers arrived, since the body has not been read yet.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    timing = RequestTiming(url=url)
+    _active.timing = timing
+    start = time.perf_counter()
+    try:
+        response = get_session(url).post(url, **kwargs)
+    finally:
+        _active.timing = None
+    timing.total = time.perf_counter() - start
+    timing.ttfb = response.elapsed.total_seconds()
+    timing.status = response.status_code
+    response.timing = timing
+    logger.debug(
+        "POST %s -> %s dns=%.3fs connect=%.3fs ttfb=%.3fs total=%.3fs reused=%s",
+        url, timing.status, timing.dns, timing.connect, timing.ttfb, timing.total, timing.reused,
+    )
+    return response
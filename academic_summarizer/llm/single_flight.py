@@ -0,0 +1,227 @@
+"""
+Single-flight: concurrent calls with the same key share one computation.
+
+The first caller for a key (the leader) runs it, and callers that arrive while it
+is running (followers) get its result instead of computing it again. Within a
+process, followers wait on a threading.Event (do) or an asyncio future (ado), and
+share the leader's exception if it fails. Across gunicorn workers, the leader holds a
+claim row in the shared SQLite cache file (llm.kv_cache) and publishes its result
+there; followers in other workers poll for it every SINGLE_FLIGHT_POLL seconds.
+
+While a leader runs, a background thread renews its claim every third of
+SINGLE_FLIGHT_TIMEOUT, so a long call (LLM 429 backoff, map-reduce) keeps it however
+long it takes. A claim not renewed for SINGLE_FLIGHT_TIMEOUT is treated as abandoned
+(the leader's worker died): the next follower takes it over and runs the call
+itself. In-process followers wait for their leader to finish. A leader that fails
+releases its claim without a result, so workers waiting elsewhere compute it
+themselves. Results must be strings. The async path runs its SQLite calls on a thread,
+off the event loop.
+
+Tuning (env):
+- SINGLE_FLIGHT: "false" turns coalescing off (default on)
+- SINGLE_FLIGHT_TIMEOUT: seconds without renewal before a claim may be taken over (default 120)
+- SINGLE_FLIGHT_POLL: seconds between checks for another worker's result (default 0.25)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+
+from llm import tracing
+from llm.env import truthy_env
+from llm.kv_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT = truthy_env("SINGLE_FLIGHT", default=True)
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "120"))
+SINGLE_FLIGHT_POLL = float(os.getenv("SINGLE_FLIGHT_POLL", "0.25"))
+
+# A claim expires unless renewed within the timeout, after which add() can take it over.
+_claims = SQLiteCache("single_flight_claims", ttl_seconds=SINGLE_FLIGHT_TIMEOUT)
+# Only kept long enough for waiting workers to pick the result up.
+_results = SQLiteCache("single_flight_results", ttl_seconds=SINGLE_FLIGHT_TIMEOUT, max_entries=1000)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls: dict[str, _Call] = {}
+_calls_lock = threading.Lock()
+# Per event loop, since a future can only be awaited on its own loop.
+_async_calls: dict[tuple[int, str], asyncio.Future] = {}
+# Set on an async leader's future when it was cancelled: followers run the call themselves.
+_RETRY = object()
+
+# Claims this process's leaders hold, key -> owner, renewed by _renew_loop.
+_held: dict[str, str] = {}
+_held_lock = threading.Lock()
+_renewer = None
+
+
+def enabled() -> bool:
+    return SINGLE_FLIGHT
+
+
+def _owner() -> str:
+    return f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+def _renew_loop() -> None:
+    while True:
+        time.sleep(SINGLE_FLIGHT_TIMEOUT / 3)
+        with _held_lock:
+            held = list(_held.items())
+        for key, owner in held:
+            if not _claims.touch(key, owner):
+                logger.warning("Single-flight claim for %s was taken over while its leader ran", key)
+                _forget(key, owner)
+
+
+def _hold(key: str, owner: str) -> None:
+    """Keep renewing the claim until _forget()."""
+    global _renewer
+    with _held_lock:
+        _held[key] = owner
+        # Also restarts the thread in a forked worker, where it does not exist.
+        if _renewer is None or not _renewer.is_alive():
+            _renewer = threading.Thread(target=_renew_loop, name="single-flight-renew", daemon=True)
+            _renewer.start()
+
+
+def _forget(key: str, owner: str) -> None:
+    with _held_lock:
+        if _held.get(key) == owner:
+            del _held[key]
+
+
+def _try_lead(key: str, owner: str, waited: bool) -> tuple[bool, str | None]:
+    """(True, None) if this caller now holds the claim, else (False, another worker's result or None)."""
+    if waited:
+        # Checked before claiming: a finished leader publishes, then releases its claim.
+        result = _results.get(key)
+        if result is not None:
+            return False, result
+    return _claims.add(key, owner), None
+
+
+def _publish(key: str, owner: str, result: str | None) -> None:
+    _forget(key, owner)
+    if result is not None:
+        _results.set(key, result)
+    _claims.delete(key, owner)
+
+
+def _lead_across_workers(key: str, fn):
+    owner = _owner()
+    waited = False
+    with tracing.stage("single_flight") as span:
+        while True:
+            lead, result = _try_lead(key, owner, waited)
+            if result is not None:
+                span["shared"] = 1
+                return result
+            if lead:
+                break
+            waited = True
+            time.sleep(SINGLE_FLIGHT_POLL)
+    _hold(key, owner)
+    try:
+        result = fn()
+    except BaseException:
+        _publish(key, owner, None)
+        raise
+    _publish(key, owner, result)
+    return result
+
+
+async def _alead_across_workers(key: str, factory):
+    owner = _owner()
+    waited = False
+    with tracing.stage("single_flight") as span:
+        while True:
+            lead, result = await asyncio.to_thread(_try_lead, key, owner, waited)
+            if result is not None:
+                span["shared"] = 1
+                return result
+            if lead:
+                break
+            waited = True
+            await asyncio.sleep(SINGLE_FLIGHT_POLL)
+    _hold(key, owner)
+    try:
+        result = await factory()
+    except BaseException:
+        # shield: a cancelled leader still releases its claim.
+        await asyncio.shield(asyncio.to_thread(_publish, key, owner, None))
+        raise
+    await asyncio.to_thread(_publish, key, owner, result)
+    return result
+
+
+def do(key: str, fn):
+    """fn(), or the result of the identical call already in flight under key."""
+    if not SINGLE_FLIGHT:
+        return fn()
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        with tracing.stage("single_flight") as span:
+            call.done.wait()
+            span["shared"] = 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = _lead_across_workers(key, fn)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            if _calls.get(key) is call:
+                del _calls[key]
+        call.done.set()
+
+
+async def ado(key: str, factory):
+    """await factory(), or the result of the identical call already in flight under key."""
+    if not SINGLE_FLIGHT:
+        return await factory()
+    loop = asyncio.get_running_loop()
+    slot = (id(loop), key)
+    future = _async_calls.get(slot)
+    if future is not None:
+        with tracing.stage("single_flight") as span:
+            result = await asyncio.shield(future)
+            span["shared"] = int(result is not _RETRY)
+        return await factory() if result is _RETRY else result
+
+    future = _async_calls[slot] = loop.create_future()
+    try:
+        result = await _alead_across_workers(key, factory)
+    except asyncio.CancelledError:
+        future.set_result(_RETRY)
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        # Mark it retrieved, so asyncio does not log it when there were no followers.
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if _async_calls.get(slot) is future:
+            del _async_calls[slot]
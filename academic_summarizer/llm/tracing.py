@@ -0,0 +1,171 @@
+"""
+Lightweight stage tracing and Prometheus metrics.
+
+Wrap a pipeline stage in ``with tracing.stage("embed", chunks=n) as span:`` to
+record its duration plus any numeric attributes (bytes, chunks, tokens, retries).
+Every stage feeds process-wide histograms, exposed in Prometheus text format by
+render() (served on /metrics). Inside ``with tracing.start_trace() as trace:``
+stages are also collected per request, and trace.breakdown() summarizes them by
+stage name.
+
+Metrics are per process; with several gunicorn workers each scrape sees the
+worker that answered it.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+_TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 128000)
+
+# Span attribute -> (metric name, help text, buckets). Other attributes are kept on the
+# per-request trace only.
+_METRICS = {
+    "seconds": ("summarizer_stage_duration_seconds", "Time spent in a pipeline stage.", _DURATION_BUCKETS),
+    "bytes": ("summarizer_stage_bytes", "Bytes processed by a pipeline stage.", _SIZE_BUCKETS),
+    "chunks": ("summarizer_stage_chunks", "Chunks processed by a pipeline stage.", _COUNT_BUCKETS),
+    "tokens": ("summarizer_stage_tokens", "Tokens used by a pipeline stage.", _TOKEN_BUCKETS),
+    "retries": ("summarizer_stage_retries", "Retries (e.g. after 429) within a pipeline stage.", _COUNT_BUCKETS),
+}
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one series per stage label."""
+
+    def __init__(self, name: str, help_text: str, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = self._series[stage] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for stage, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{stage="{stage}"}} {series["sum"]:g}')
+                lines.append(f'{self.name}_count{{stage="{stage}"}} {series["count"]}')
+        return lines
+
+
+histograms = {attr: Histogram(*spec) for attr, spec in _METRICS.items()}
+
+
+class Trace:
+    """Stages recorded during one request (thread-safe, so worker threads can add to it)."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: dict) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> dict:
+        """{stage: {"calls", "seconds", and summed numeric attributes}} in first-seen order."""
+        result = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            entry = result.setdefault(span["stage"], {"calls": 0})
+            entry["calls"] += 1
+            for key, value in span.items():
+                if key != "stage" and isinstance(value, (int, float)):
+                    entry[key] = entry.get(key, 0) + value
+        for entry in result.values():
+            entry["seconds"] = round(entry.get("seconds", 0.0), 4)
+        return result
+
+
+@contextmanager
+def start_trace():
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name: str, **attrs):
+    """Time a stage; yields the span dict so the caller can add attributes before it closes."""
+    span = {"stage": name, **attrs}
+    token = _current_span.set(span)
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span["seconds"] = time.perf_counter() - start
+        _current_span.reset(token)
+        _record(span)
+
+
+def record(name: str, seconds: float, **attrs) -> None:
+    """Record a stage timed by the caller (e.g. across the yields of a generator)."""
+    _record({"stage": name, "seconds": seconds, **attrs})
+
+
+def _record(span: dict) -> None:
+    for attr, histogram in histograms.items():
+        value = span.get(attr)
+        if isinstance(value, (int, float)):
+            histogram.observe(span["stage"], value)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(span)
+
+
+def add(attr: str, value: float = 1) -> None:
+    """Add to a numeric attribute of the innermost open stage (no-op outside a stage)."""
+    span = _current_span.get()
+    if span is not None:
+        span[attr] = span.get(attr, 0) + value
+
+
+def bind(fn):
+    """Wrap fn so it records into the caller's trace when run on another thread."""
+    trace = _current_trace.get()
+    if trace is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+
+    return run
+
+
+def render() -> str:
+    lines = []
+    for histogram in histograms.values():
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -1,13 +1,202 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+"""
+Single-pass, structure-aware chunker for academic text.
+
+One regex pass finds section headings ("3. Method", "Related Work", "REFERENCES", ...),
+then each section is cut into windows of at most CHUNK_SIZE characters, ending at the
+best break (paragraph > line > sentence > word) in the second half of the window. Each
+chunk overlaps the previous one in the same section by up to CHUNK_OVERLAP characters,
+starting on a word boundary. A heading always starts a new chunk, and the references
+section (up to an "Appendix" or "Supplementary" heading, if any) is skipped when
+CHUNK_SKIP_REFERENCES is on.
+
+Breaks are found with str.rfind on the original string, so no per-separator re-scan
+and no intermediate lists. iter_chunks() yields chunks lazily; pass a ChunkSpans to
+also collect each chunk's character offsets, page and section in compact arrays, e.g.
+to cite page numbers:
+
+    spans = ChunkSpans()
+    for chunk in iter_chunks(text, page_starts, spans): ...
+    spans.pages[i], spans.titles[spans.sections[i]]
+
+python -m bench.chunker compares it with the LangChain recursive splitter.
+"""
+
+import bisect
+import re
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from llm.env import truthy_env
 
 # Tuned for academic papers: preserve paragraphs, enough overlap to avoid cutting mid-sentence
 CHUNK_SIZE = 1200
 CHUNK_OVERLAP = 240
 SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+CHUNK_SKIP_REFERENCES = truthy_env("CHUNK_SKIP_REFERENCES", default=True)
+
+# A break must leave at least this much of the window in the chunk.
+_MIN_CUT = CHUNK_SIZE // 2
+_MAX_HEADING_WORDS = 10
+# Enough of the text to hold a heading on its first line.
+_FIRST_LINE_CHARS = 200
+
+_NAMED_SECTIONS = (
+    "abstract|introduction|related work|background|preliminaries|methods?|methodology|approach|"
+    "experiments?|experimental setup|experimental results|evaluation|results|discussion|"
+    "conclusions?|limitations|future work|acknowledge?ments?|references|bibliography|"
+    "works cited|appendix|appendices|supplementary material"
+)
+# Anchored on a literal "\n" rather than ^ with re.MULTILINE, so re skips to line starts
+# at C speed instead of trying the pattern at every character; headings start with a
+# capital letter or a digit.
+_HEADING = re.compile(
+    r"\n[ \t]*(?=[A-Z0-9])("
+    # "3 Method", "3.2. Training Details", "IV. Results", "A. Proofs"
+    r"(?:\d{1,2}(?:\.\d{1,2})*\.?|[IVX]{1,5}\.|[A-H]\.)[ \t]+[A-Z][^\n]{0,80}"
+    # "Related Work", "REFERENCES", "Conclusions and Future Work", "Appendix B: Proofs"
+    rf"|(?i:(?:{_NAMED_SECTIONS}))"
+    r"(?:[ \t]+(?:and|&)[ \t]+[A-Za-z][A-Za-z ]{0,40}|[ \t]+[A-Z0-9][^\n]{0,60})?:?"
+    r")[ \t]*(?=\n|\Z)"
+)
+_REFERENCES = re.compile(r"(?i)^(?:\d{1,2}\.?[ \t]+)?(?:references|bibliography|works cited)$")
+_APPENDIX = re.compile(r"(?i)^(?:[A-Z0-9]{1,2}\.?[ \t]+)?(?:appendi|supplementary)")
+# A "References" heading this early (e.g. in a table of contents) is not the bibliography.
+_REFERENCES_MIN_POSITION = 0.3
+
+
+@dataclass
+class ChunkSpans:
+    """
+    Where each chunk came from, one entry per chunk: character offsets in the text,
+    page (1-based; 0 when no page offsets were given) and index into titles (-1 before
+    the first heading).
+    """
+
+    starts: array = field(default_factory=lambda: array("q"))
+    ends: array = field(default_factory=lambda: array("q"))
+    pages: array = field(default_factory=lambda: array("i"))
+    sections: array = field(default_factory=lambda: array("i"))
+    titles: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def metadata(self) -> list[dict]:
+        """One dict per chunk (page, start, end, section title or None), e.g. for Document.metadata."""
+        return [
+            {
+                "page": page,
+                "start": start,
+                "end": end,
+                "section": self.titles[section] if section >= 0 else None,
+            }
+            for start, end, page, section in zip(self.starts, self.ends, self.pages, self.sections)
+        ]
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    return bool(line) and line[-1] not in ".,;" and len(line.split()) <= _MAX_HEADING_WORDS
+
+
+def sections(text: str) -> list[tuple[int, int, str | None]]:
+    """(start, end, title) of each section, in order; text before the first heading has title None."""
+    bounds = []
+    first = _HEADING.match("\n" + text[:_FIRST_LINE_CHARS])
+    if first and _is_heading(first.group(1)):
+        bounds.append((first.start(1) - 1, first.group(1).strip().rstrip(":")))
+    for match in _HEADING.finditer(text):
+        if _is_heading(match.group(1)):
+            bounds.append((match.start(1), match.group(1).strip().rstrip(":")))
+    result = []
+    previous, title = 0, None
+    for start, heading in bounds:
+        if start > previous or title is not None:
+            result.append((previous, start, title))
+        previous, title = start, heading
+    result.append((previous, len(text), title))
+    return result
+
+
+def _break(text: str, start: int, limit: int) -> int:
+    """Offset to end a chunk at: the last, strongest separator in text[start + _MIN_CUT:limit]."""
+    low = start + _MIN_CUT
+    for separator in SEPARATORS[:-1]:
+        found = text.rfind(separator, low, limit)
+        if found != -1:
+            return found + len(separator)
+    return limit
+
+
+def _overlap_start(text: str, cut: int, start: int) -> int:
+    """Start of the next chunk: up to CHUNK_OVERLAP before cut, moved forward to a word boundary."""
+    begin = max(start + 1, cut - CHUNK_OVERLAP)
+    if begin >= cut:
+        return cut
+    if text[begin - 1].isspace():
+        return begin
+    space = text.find(" ", begin, cut)
+    newline = text.find("\n", begin, space if space != -1 else cut)
+    found = newline if newline != -1 else space
+    return found + 1 if found != -1 else cut
+
+
+def iter_chunks(text: str, page_starts=None, spans: ChunkSpans | None = None) -> Iterator[str]:
+    """
+    Yield chunks of text in order. page_starts: sorted character offsets at which each
+    page begins (see rag.pdf_loader.load_pdf_pages), used to fill spans.pages.
+    """
+    skipping = False
+    for section_start, section_end, title in sections(text):
+        if title is not None:
+            if _REFERENCES.match(title) and section_start >= _REFERENCES_MIN_POSITION * len(text):
+                skipping = CHUNK_SKIP_REFERENCES
+            elif _APPENDIX.match(title):
+                skipping = False
+        if skipping:
+            continue
+        if spans is not None and title is not None:
+            spans.titles.append(title)
+        section_id = len(spans.titles) - 1 if spans is not None else -1
+
+        start = section_start
+        while start < section_end:
+            limit = start + CHUNK_SIZE
+            cut = section_end if limit >= section_end else _break(text, start, limit)
+            # Strip surrounding whitespace without copying the window twice.
+            left, right = start, cut
+            while left < right and text[left].isspace():
+                left += 1
+            while right > left and text[right - 1].isspace():
+                right -= 1
+            if right > left:
+                if spans is not None:
+                    spans.starts.append(left)
+                    spans.ends.append(right)
+                    spans.pages.append(bisect.bisect_right(page_starts, left) if page_starts is not None else 0)
+                    spans.sections.append(section_id)
+                yield text[left:right]
+            if cut >= section_end:
+                break
+            start = _overlap_start(text, cut, start)
+
+
+def split_text(text: str, page_starts=None) -> tuple[list[str], ChunkSpans]:
+    """All chunks of text plus their ChunkSpans."""
+    spans = ChunkSpans()
+    return list(iter_chunks(text, page_starts, spans)), spans
 
 
 def chunk_text(text: str) -> list[str]:
     """Split text into overlapping chunks suitable for RAG. Prefers paragraph boundaries."""
+    return list(iter_chunks(text))
+
+
+def chunk_text_recursive(text: str) -> list[str]:
+    """The previous LangChain RecursiveCharacterTextSplitter chunking, kept for comparison."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
@@ -1,19 +1,125 @@
+"""
+Chunk compression before embedding.
+
+COMPRESS_MODE picks how:
+- api: the ScaleDown compress API, one call per chunk (concurrent, rate limited)
+- extractive: local sentence extraction on the CPU (rag.extractive), no network
+- none: chunks are used as they are
+- auto (default): api when SCALEDOWN_COMPRESS_URL is set, else none
+"""
+
+import asyncio
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
 
+from llm import tracing
+from rag import extractive
+from llm.rate_limit import RateLimited, TokenBucket
+from llm.scaledown_compress import BadResponse
+from llm.scaledown_compress import acompress_text as scaledown_acompress_text
 from llm.scaledown_compress import compress_text as scaledown_compress_text
 
+logger = logging.getLogger(__name__)
+
+# Compress API calls in flight at once for one paper.
+COMPRESS_CONCURRENCY = int(os.getenv("COMPRESS_CONCURRENCY", "8"))
+# Average compress calls per second across the whole process (0 = no limit). A 429's
+# Retry-After pauses all calls either way.
+COMPRESS_RATE_PER_SEC = float(os.getenv("COMPRESS_RATE_PER_SEC", "0"))
+COMPRESS_MAX_RETRIES = int(os.getenv("COMPRESS_MAX_RETRIES", "3"))
+
+COMPRESS_MODES = ("auto", "api", "extractive", "none")
+COMPRESS_MODE = (os.getenv("COMPRESS_MODE") or "auto").strip().lower()
+
+_INITIAL_BACKOFF = 2.0
+_MAX_BACKOFF = 60.0
+
+# Shared by every request in the process so a 429 pauses all in-flight compression.
+_limiter = TokenBucket(COMPRESS_RATE_PER_SEC, capacity=COMPRESS_CONCURRENCY)
+
+
+def compress_mode() -> str:
+    """The compression in effect: api, extractive or none."""
+    if COMPRESS_MODE not in COMPRESS_MODES:
+        raise ValueError(f"Unknown COMPRESS_MODE {COMPRESS_MODE!r}. Use one of: {', '.join(COMPRESS_MODES)}.")
+    if COMPRESS_MODE == "auto":
+        return "api" if (os.getenv("SCALEDOWN_COMPRESS_URL") or "").strip() else "none"
+    return COMPRESS_MODE
+
+
+def _compress_one(chunk: str) -> str:
+    """Compress one chunk, retrying 429s; on any other failure keep the original text."""
+    with tracing.stage("compress_chunk", bytes=len(chunk.encode("utf-8")), retries=0):
+        return _compress_with_retries(chunk)
+
+
+def _compress_with_retries(chunk: str) -> str:
+    for attempt in range(COMPRESS_MAX_RETRIES + 1):
+        try:
+            return scaledown_compress_text(chunk, limiter=_limiter)
+        except RateLimited as e:
+            wait = e.retry_after if e.retry_after is not None else _INITIAL_BACKOFF * (2**attempt)
+            tracing.add("retries")
+            _limiter.pause(min(wait, _MAX_BACKOFF))
+        except (requests.RequestException, BadResponse) as e:
+            logger.warning("Compress failed for a %d-char chunk, using it uncompressed: %s", len(chunk), e)
+            return chunk
+    logger.warning("Compress still rate limited after %d retries, using chunk uncompressed", COMPRESS_MAX_RETRIES)
+    return chunk
+
+
+async def _acompress_one(chunk: str, semaphore: asyncio.Semaphore) -> str:
+    with tracing.stage("compress_chunk", bytes=len(chunk.encode("utf-8")), retries=0):
+        async with semaphore:
+            for attempt in range(COMPRESS_MAX_RETRIES + 1):
+                try:
+                    return await scaledown_acompress_text(chunk, limiter=_limiter)
+                except RateLimited as e:
+                    wait = e.retry_after if e.retry_after is not None else _INITIAL_BACKOFF * (2**attempt)
+                    tracing.add("retries")
+                    _limiter.pause(min(wait, _MAX_BACKOFF))
+                except (httpx.HTTPError, BadResponse) as e:
+                    logger.warning("Compress failed for a %d-char chunk, using it uncompressed: %s", len(chunk), e)
+                    return chunk
+        logger.warning("Compress still rate limited after %d retries, using chunk uncompressed", COMPRESS_MAX_RETRIES)
+        return chunk
+
+
+async def acompress_chunks(chunks):
+    """asyncio variant of compress_chunks: same concurrency limit, rate limiter, retries and order."""
+    mode = compress_mode()
+    if mode == "extractive":
+        # CPU-bound; keep the event loop free.
+        return await asyncio.to_thread(extractive.compress_chunks, chunks)
+    if mode != "api":
+        return chunks
+    semaphore = asyncio.Semaphore(max(1, COMPRESS_CONCURRENCY))
+    return list(await asyncio.gather(*(_acompress_one(chunk, semaphore) for chunk in chunks)))
+
 
 def compress_chunks(chunks):
     """
-    Optionally compress chunks before embedding.
+    Optionally compress chunks before embedding, as set by COMPRESS_MODE.
 
-    - If SCALEDOWN_COMPRESS_URL is set, use the ScaleDown compress API.
-    - Otherwise, return the original chunks without extra LLM calls to avoid
+    - api: the ScaleDown compress API, with up to COMPRESS_CONCURRENCY calls in flight.
+      Results keep the original chunk order, and a chunk that fails to compress is
+      passed through unchanged.
+    - extractive: keep each chunk's most central sentences (rag.extractive), locally.
+    - none: return the original chunks without extra LLM calls to avoid
       hammering the chat API (which can easily hit 429 rate limits).
     """
-    use_compress_api = (os.getenv("SCALEDOWN_COMPRESS_URL") or "").strip()
-    if use_compress_api:
-        return [scaledown_compress_text(chunk) for chunk in chunks]
+    mode = compress_mode()
+    if mode == "extractive":
+        return extractive.compress_chunks(chunks)
+    if mode == "api":
+        if COMPRESS_CONCURRENCY <= 1 or len(chunks) <= 1:
+            return [_compress_one(chunk) for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=min(COMPRESS_CONCURRENCY, len(chunks))) as executor:
+            return list(executor.map(tracing.bind(_compress_one), chunks))
     # No external compress API configured: skip compression to reduce
     # the number of OpenAI chat calls and avoid rate limiting.
     return chunks
@@ -1,6 +1,117 @@
+"""Process-wide embedding model shared by every request in a worker."""
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Chunks per forward pass; larger batches trade memory for throughput.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# torch intra-op threads for this process; 0 keeps torch's default (all cores).
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# dtype of embedding matrices kept on disk: float32, float16 or int8.
+EMBEDDING_STORE_DTYPE = (os.getenv("EMBEDDING_STORE_DTYPE") or "float16").strip().lower()
+# Vectors are L2-normalised, so FAISS L2 distance ranks exactly like cosine similarity.
+NORMALIZE_EMBEDDINGS = True
+
+_embeddings = None
+_lock = threading.Lock()
+_load_seconds = None
+
+
 def get_embeddings():
-    return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    """
+    Return the shared embedding model, loading it on first use.
+
+    Loading sentence-transformers (and torch weights) takes seconds and a lot of
+    memory, so it happens once per worker process instead of once per request.
+    """
+    global _embeddings, _load_seconds
+    if _embeddings is not None:
+        return _embeddings
+    with _lock:
+        if _embeddings is None:
+            start = time.perf_counter()
+            if EMBEDDING_THREADS > 0:
+                import torch
+
+                torch.set_num_threads(EMBEDDING_THREADS)
+            embeddings = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
+                encode_kwargs={
+                    "normalize_embeddings": NORMALIZE_EMBEDDINGS,
+                    "batch_size": EMBEDDING_BATCH_SIZE,
+                },
+            )
+            _load_seconds = time.perf_counter() - start
+            _embeddings = embeddings
+            logger.info("Loaded embedding model %s in %.2fs", EMBEDDING_MODEL_NAME, _load_seconds)
+    return _embeddings
+
+
+def embed_texts(texts, batch_size: int | None = None) -> np.ndarray:
+    """
+    Embed texts in batches straight through sentence-transformers.
+
+    Returns an (n, dim) float32 matrix of L2-normalised rows, skipping LangChain's
+    per-text list-of-floats conversion.
+    """
+    model = get_embeddings().client
+    vectors = model.encode(
+        list(texts),
+        batch_size=batch_size or EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=NORMALIZE_EMBEDDINGS,
+        show_progress_bar=False,
     )
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def quantize(vectors, dtype: str | None = None) -> np.ndarray:
+    """
+    Shrink an embedding matrix for storage: float16 halves it, int8 quarters it.
+
+    int8 maps the [-1, 1] range of normalised components onto [-127, 127].
+    """
+    dtype = dtype or EMBEDDING_STORE_DTYPE
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors
+    if dtype == "float16":
+        return vectors.astype(np.float16)
+    if dtype == "int8":
+        return np.clip(np.rint(vectors * 127.0), -127, 127).astype(np.int8)
+    raise ValueError("Unknown EMBEDDING_STORE_DTYPE. Use one of: float32, float16, int8.")
+
+
+def dequantize(vectors) -> np.ndarray:
+    """Inverse of quantize(): float32 rows, re-normalised when they were stored as int8."""
+    vectors = np.asarray(vectors)
+    if vectors.dtype == np.int8:
+        restored = vectors.astype(np.float32) / 127.0
+        norms = np.linalg.norm(restored, axis=1, keepdims=True)
+        return restored / np.where(norms == 0, 1.0, norms)
+    return vectors.astype(np.float32)
+
+
+def warm_up() -> float:
+    """
+    Load the embedding model and run one tiny embedding so the first real request
+    does not pay for model load or lazy torch initialisation. Returns the seconds spent.
+    """
+    start = time.perf_counter()
+    get_embeddings().embed_query("warm-up")
+    elapsed = time.perf_counter() - start
+    logger.info("Embedding warm-up finished in %.2fs", elapsed)
+    return elapsed
+
+
+def load_seconds() -> float | None:
+    """Seconds it took to load the model in this process, or None if not loaded yet."""
+    return _load_seconds
@@ -0,0 +1,142 @@
+"""
+Local extractive compression: keep each chunk's most central sentences, drop the rest.
+
+A CPU-only alternative to the ScaleDown compress API (COMPRESS_MODE=extractive in
+rag.compressor), with no quota, latency or 429s. Sentences of the whole paper are
+scored at once: TF-IDF rows (rag.sparse_index tokens, sublinear tf, L2-normalised) in
+one sparse matrix, and a sentence's score is its cosine similarity to the paper's
+centroid, i.e. how much it shares the paper's vocabulary. With a query (e.g. a
+context given to /api/compress/) the score also includes the sentence's similarity to it.
+
+Each chunk then keeps its best sentences, in their original order, until
+EXTRACTIVE_RATIO of its characters are used. Sentences with numeric claims (values
+with units, percentages), equations or key terms (acronyms, CamelCase names, IDs such
+as "ResNet-50") are always kept, so a chunk can stay above the ratio. Citation markers
+("[12]", "(Smith et al., 2019)") and other bare numbers do not protect a sentence.
+Chunks shorter than EXTRACTIVE_MIN_CHARS, or with a single sentence, are left alone.
+
+python -m bench.compressor compares tokens saved and time spent with the API.
+"""
+
+import os
+import re
+
+import numpy as np
+
+from rag.sparse_index import term_counts, tokenize
+
+# Fraction of each chunk's characters to keep.
+EXTRACTIVE_RATIO = float(os.getenv("EXTRACTIVE_RATIO", "0.5"))
+EXTRACTIVE_MIN_CHARS = int(os.getenv("EXTRACTIVE_MIN_CHARS", "300"))
+# Weight of query similarity against centrality when a query is given.
+EXTRACTIVE_QUERY_WEIGHT = float(os.getenv("EXTRACTIVE_QUERY_WEIGHT", "0.5"))
+
+# A sentence ends at . ! or ? followed by whitespace and a capital, digit or bracket,
+# but not after common abbreviations; a blank line ends one too.
+_SENTENCE_END = re.compile(
+    r"(?<=[.!?])(?<!\bal\.)(?<!\bEq\.)(?<!\bFig\.)(?<!\bvs\.)(?<!\bcf\.)(?<!e\.g\.)(?<!i\.e\.)"
+    r"\s+(?=[A-Z0-9(\[])|\n[ \t]*\n\s*"
+)
+# Citation markers and years carry no claim: "[12]", "[3, 5-7]", "(Smith et al., 2019)",
+# "et al. 2020a", "the 1990s". They are removed before _PROTECTED is matched.
+_CITATION = re.compile(
+    r"\[\s*\d+(?:\s*[-–,]\s*\d+)*\s*\]"
+    r"|\([^()]*\b(?:19|20)\d\d[a-z]?\)"
+    r"|\bet al\.?,?\s*(?:19|20)\d\d[a-z]?\b"
+    r"|\b(?:19|20)\d0s\b"
+)
+_PROTECTED = re.compile(
+    # Numeric claims: a value with a unit or a percentage (92.4%, 3.2 ms, 16 GB, 7B, 2.5x).
+    r"\d(?:[.,]\d+)*(?:"
+    r"\s?(?:%|percent\b|pp\b|[x×](?![A-Za-z0-9])|-?fold\b"
+    r"|(?:[nµμm]?s|sec|seconds?|min|minutes?|h|hours?|days?|[kKMGT]?(?:B|bits?|bytes|Hz)"
+    r"|FLOPs?|tokens?|params|parameters|epochs?|GPUs?|dB)\b)"
+    r"|[kKMBT]\b)"
+    r"|[=<>≤≥≈±×∑∏∫√∈∀∃→∞αβγδεθλμπσφω]"
+    r"|\b(?:Eq|Equation|Theorem|Lemma|Proposition|Corollary|Definition)\b"
+    # Acronyms and CamelCase names: BERT, LoRA, ImageNet, GPT-4
+    r"|\b[A-Z][a-z]*[A-Z][A-Za-z0-9]*\b"
+)
+
+
+def _protected(text: str) -> bool:
+    """Whether a sentence states a numeric claim, an equation or a key term."""
+    return bool(_PROTECTED.search(_CITATION.sub(" ", text)))
+
+
+def sentences(text: str) -> list[tuple[int, int]]:
+    """(start, end) offsets of the sentences of text, without surrounding whitespace."""
+    spans, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text.rstrip())))
+    return [(start, end) for start, end in spans if end > start]
+
+
+def _tfidf(texts) -> tuple:
+    counts, vocabulary = term_counts(texts)
+    n = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=len(vocabulary)).astype(np.float32)
+    idf = np.log((1 + n) / (1 + df)) + 1
+    counts.data = np.log1p(counts.data) * idf[counts.indices]
+    norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1), dtype=np.float32).ravel())
+    counts.data /= np.repeat(np.where(norms == 0, 1.0, norms), np.diff(counts.indptr))
+    return counts, vocabulary, idf
+
+
+def _scale(scores: np.ndarray) -> np.ndarray:
+    top = scores.max() if len(scores) else 0.0
+    return scores / top if top > 0 else scores
+
+
+def sentence_scores(texts: list[str], query: str | None = None) -> np.ndarray:
+    """Centrality of each sentence in texts (0..1), blended with similarity to query if given."""
+    matrix, vocabulary, idf = _tfidf(texts)
+    centroid = np.asarray(matrix.mean(axis=0), dtype=np.float32).ravel()
+    scores = _scale(matrix @ centroid)
+    if query:
+        ids = sorted({vocabulary[token] for token in tokenize(query) if token in vocabulary})
+        if ids:
+            vector = np.zeros(len(vocabulary), dtype=np.float32)
+            vector[ids] = idf[ids]
+            similarity = _scale(matrix @ (vector / np.linalg.norm(vector)))
+            scores = (1 - EXTRACTIVE_QUERY_WEIGHT) * scores + EXTRACTIVE_QUERY_WEIGHT * similarity
+    return np.asarray(scores, dtype=np.float32)
+
+
+def compress_chunks(chunks, ratio: float | None = None, query: str | None = None) -> list[str]:
+    """Each chunk reduced to its best sentences (see the module docstring), in order."""
+    ratio = EXTRACTIVE_RATIO if ratio is None else ratio
+    chunks = list(chunks)
+    spans = [sentences(chunk) for chunk in chunks]
+    texts = [chunk[start:end] for chunk, chunk_spans in zip(chunks, spans) for start, end in chunk_spans]
+    if not texts or ratio >= 1:
+        return chunks
+    scores = sentence_scores(texts, query)
+
+    result, offset = [], 0
+    for chunk, chunk_spans in zip(chunks, spans):
+        count = len(chunk_spans)
+        chunk_texts = texts[offset:offset + count]
+        chunk_scores = scores[offset:offset + count]
+        offset += count
+        if count <= 1 or len(chunk) < EXTRACTIVE_MIN_CHARS:
+            result.append(chunk)
+            continue
+        budget = ratio * len(chunk)
+        keep = [_protected(text) for text in chunk_texts]
+        used = sum(len(text) for text, kept in zip(chunk_texts, keep) if kept)
+        for i in np.argsort(-chunk_scores, kind="stable"):
+            if used >= budget:
+                break
+            if not keep[i] and (used + len(chunk_texts[i]) <= budget or not any(keep)):
+                keep[i] = True
+                used += len(chunk_texts[i])
+        result.append(" ".join(text for text, kept in zip(chunk_texts, keep) if kept))
+    return result
+
+
+def compress_text(text: str, ratio: float | None = None, query: str | None = None) -> str:
+    """text reduced to about ratio of its characters, keeping the best sentences in order."""
+    return compress_chunks([text], ratio, query)[0]
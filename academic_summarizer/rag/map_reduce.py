@@ -0,0 +1,130 @@
+"""
+Hierarchical map-reduce summarization for papers too long for one prompt.
+
+Map: consecutive chunks are grouped up to MAP_INPUT_TOKENS and each group is
+summarized, MAP_REDUCE_CONCURRENCY calls at a time. Reduce: while the partial
+summaries exceed REDUCE_INPUT_TOKENS they are grouped and summarized again; a
+final call turns them into the answer to the user's query.
+
+Every call is made at temperature 0, so partial summaries are cached by the LLM
+client's answer cache (llm.response_cache, keyed by the prompt, which holds the
+query and input text): a re-run only calls the LLM for groups whose text changed.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from llm import tracing
+from llm.scaledown_client import ScaleDownLLM
+from rag.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+# Input tokens per map call and per reduce call.
+MAP_INPUT_TOKENS = int(os.getenv("MAP_INPUT_TOKENS", "3000"))
+REDUCE_INPUT_TOKENS = int(os.getenv("REDUCE_INPUT_TOKENS", "6000"))
+# Output tokens per partial summary and for the final answer.
+MAP_OUTPUT_TOKENS = int(os.getenv("MAP_OUTPUT_TOKENS", "300"))
+FINAL_OUTPUT_TOKENS = int(os.getenv("FINAL_OUTPUT_TOKENS", "800"))
+
+_MAX_REDUCE_ROUNDS = 5
+_SEPARATOR = "\n\n---\n\n"
+
+MAP_INSTRUCTION = """You are summarizing one part of a longer academic research paper. Preserve technical accuracy: keep key terms, methods, datasets, numbers and findings exact. Do not invent information. Focus on what is relevant to the user's request."""
+
+REDUCE_INSTRUCTION = """You are combining summaries of consecutive parts of an academic research paper into one shorter summary. Keep key terms, methods, datasets, numbers and findings exact, drop repetition, and do not invent information."""
+
+FINAL_INSTRUCTION = """You are summarizing an academic research paper from summaries of its consecutive parts. Preserve technical accuracy: keep key terms, methods, and findings exact. Structure your response clearly (e.g. objective, methods, results, conclusions). Do not invent or add information not present in the summaries."""
+
+def group_by_tokens(texts, budget: int, model: str | None = None) -> list[list[str]]:
+    """Split texts into consecutive groups of at most budget tokens (a single oversized text gets its own group)."""
+    groups, current, used = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text, model)
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _map_prompt(text: str, query: str) -> str:
+    return f"""{MAP_INSTRUCTION}
+
+User request: {query}
+
+Part of the paper:
+
+{text}
+
+Summarize this part in at most {MAP_OUTPUT_TOKENS} tokens."""
+
+
+def _reduce_prompt(text: str, query: str) -> str:
+    return f"""{REDUCE_INSTRUCTION}
+
+User request: {query}
+
+Summaries of consecutive parts:
+
+{text}
+
+Combine them into one summary of at most {MAP_OUTPUT_TOKENS} tokens."""
+
+
+def _final_prompt(text: str, query: str) -> str:
+    return f"""{FINAL_INSTRUCTION}
+
+Summaries of consecutive parts of the paper:
+
+{text}
+
+User request: {query}
+
+Provide a concise, accurate answer based only on the summaries above."""
+
+
+def _summarize_groups(llm, groups, query: str, make_prompt) -> list[str]:
+    def run(group):
+        text = _SEPARATOR.join(group)
+        return llm.generate(make_prompt(text, query), temperature=0, max_tokens=MAP_OUTPUT_TOKENS)
+
+    if len(groups) == 1 or MAP_REDUCE_CONCURRENCY <= 1:
+        return [run(group) for group in groups]
+    with ThreadPoolExecutor(max_workers=min(MAP_REDUCE_CONCURRENCY, len(groups))) as executor:
+        return list(executor.map(tracing.bind(run), groups))
+
+
+def summarize_map_reduce(
+    chunks, query: str, llm: ScaleDownLLM | None = None, answered_by: dict | None = None
+) -> str:
+    """
+    Summarize all chunks (in document order) for query with bounded-parallel map and reduce
+    rounds. answered_by receives the provider and model of the final call (see ScaleDownLLM.generate).
+    """
+    llm = llm or ScaleDownLLM()
+    groups = group_by_tokens(chunks, MAP_INPUT_TOKENS, llm.model)
+    with tracing.stage("map", chunks=len(chunks)):
+        partials = _summarize_groups(llm, groups, query, _map_prompt)
+    logger.info("Map stage: %d chunks -> %d partial summaries", len(chunks), len(partials))
+
+    for round_number in range(_MAX_REDUCE_ROUNDS):
+        if count_tokens(_SEPARATOR.join(partials), llm.model) <= REDUCE_INPUT_TOKENS:
+            break
+        groups = group_by_tokens(partials, REDUCE_INPUT_TOKENS, llm.model)
+        if len(groups) == len(partials):
+            # Every partial is already as large as a reduce call allows; go to the final call.
+            break
+        with tracing.stage("reduce", chunks=len(partials)):
+            partials = _summarize_groups(llm, groups, query, _reduce_prompt)
+        logger.info("Reduce round %d: %d partial summaries", round_number + 1, len(partials))
+
+    text = _SEPARATOR.join(partials)
+    return llm.generate(
+        _final_prompt(text, query), temperature=0, max_tokens=FINAL_OUTPUT_TOKENS, answered_by=answered_by
+    )
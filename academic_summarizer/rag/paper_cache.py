@@ -0,0 +1,184 @@
+"""
+Content-addressed disk cache of processed papers.
+
+An entry is keyed by the PDF's xxhash plus the pipeline config that shaped it
+(chunker, compressor, embedding model, index type, BM25 parameters), so changing
+any of those never serves a stale index. Each entry directory holds the extracted
+text, the raw and compressed chunks with each chunk's page, offsets and section,
+the embedding matrix (quantized, see EMBEDDING_STORE_DTYPE) and the serialized BM25
+index. The FAISS index is not stored: it is rebuilt from the matrix on load
+(rag.vector_store.restore_vectorstore), so no float32 copy lands on disk. Entries
+are evicted least-recently-used first once the cache exceeds its size budget.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "papers"
+
+PAPER_CACHE_DIR = Path(os.getenv("PAPER_CACHE_DIR") or _DEFAULT_CACHE_DIR)
+# Total bytes kept on disk; 0 disables the cache.
+PAPER_CACHE_MAX_BYTES = int(os.getenv("PAPER_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+_INDEX_DIR = "index"
+
+_evict_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return PAPER_CACHE_MAX_BYTES > 0
+
+
+def hash_file(file_path) -> str:
+    """xxh3-128 of the file contents, read in 1 MiB blocks (or of the PDF itself, if given bytes)."""
+    if isinstance(file_path, (bytes, bytearray, memoryview)):
+        return xxhash.xxh3_128(file_path).hexdigest()
+    hasher = xxhash.xxh3_128()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def pipeline_config() -> dict:
+    """Everything besides the PDF bytes that changes what gets cached."""
+    # Imported here so the config always reflects the live module constants.
+    from rag import chunker, extractive
+    from rag.compressor import compress_mode
+    from rag.embeddings import EMBEDDING_MODEL_NAME, NORMALIZE_EMBEDDINGS
+    from rag.sparse_index import BM25_B, BM25_K1
+    from rag.vector_store import VECTOR_INDEX_TYPE
+
+    return {
+        "chunk_size": chunker.CHUNK_SIZE,
+        "chunk_overlap": chunker.CHUNK_OVERLAP,
+        "separators": chunker.SEPARATORS,
+        "chunker": "structured",
+        # Entries from before chunk metadata (pages, offsets) was cached.
+        "chunk_metadata": 1,
+        "skip_references": chunker.CHUNK_SKIP_REFERENCES,
+        "compress_url": (os.getenv("SCALEDOWN_COMPRESS_URL") or "").strip(),
+        "compress_mode": compress_mode(),
+        "extractive": [extractive.EXTRACTIVE_RATIO, extractive.EXTRACTIVE_MIN_CHARS]
+        if compress_mode() == "extractive" else None,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "normalize_embeddings": NORMALIZE_EMBEDDINGS,
+        "index_type": VECTOR_INDEX_TYPE,
+        "bm25": [BM25_K1, BM25_B],
+    }
+
+
+def cache_key(content_hash: str) -> str:
+    config = json.dumps(pipeline_config(), sort_keys=True)
+    return xxhash.xxh3_128(f"{content_hash}:{config}".encode("utf-8")).hexdigest()
+
+
+def load(key: str) -> dict | None:
+    """
+    Return the cached entry for key, or None on a miss.
+
+    The returned dict has text, chunks, compressed, metadata (one dict per chunk, see
+    rag.chunker.ChunkSpans.metadata), vectors and index_path (a folder for
+    rag.vector_store.restore_vectorstore).
+    """
+    if not enabled():
+        return None
+    from rag.embeddings import dequantize
+
+    entry = PAPER_CACHE_DIR / key
+    if not entry.is_dir():
+        return None
+    try:
+        text = (entry / "text.txt").read_text(encoding="utf-8")
+        with open(entry / "chunks.json", encoding="utf-8") as f:
+            chunks = json.load(f)
+        vectors = dequantize(np.load(entry / "embeddings.npy"))
+        # Touch the entry so LRU eviction sees it as recently used.
+        os.utime(entry)
+    except (OSError, ValueError) as e:
+        logger.warning("Discarding unreadable paper cache entry %s: %s", key, e)
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    return {
+        "text": text,
+        "chunks": chunks["chunks"],
+        "compressed": chunks["compressed"],
+        "metadata": chunks.get("metadata"),
+        "vectors": vectors,
+        "index_path": entry / _INDEX_DIR,
+    }
+
+
+def save(key: str, text: str, chunks, compressed, vectors, vectorstore, metadata=None) -> None:
+    """Store a processed paper. Failures are logged, never raised to the request."""
+    if not enabled():
+        return
+    from rag.embeddings import quantize
+    from rag.vector_store import save_vectorstore
+
+    entry = PAPER_CACHE_DIR / key
+    if entry.is_dir():
+        return
+    try:
+        PAPER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write into a private directory, then rename, so readers never see a partial entry.
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=PAPER_CACHE_DIR))
+        try:
+            (tmp / "text.txt").write_text(text, encoding="utf-8")
+            with open(tmp / "chunks.json", "w", encoding="utf-8") as f:
+                json.dump({"chunks": list(chunks), "compressed": list(compressed), "metadata": metadata}, f)
+            np.save(tmp / "embeddings.npy", quantize(vectors))
+            save_vectorstore(vectorstore, tmp / _INDEX_DIR, with_index=False)
+            os.rename(tmp, entry)
+        except BaseException as e:
+            # Any failure, even an interrupt, must not leave the partial entry behind.
+            shutil.rmtree(tmp, ignore_errors=True)
+            # A rename fails if another worker stored the same paper first; that is fine.
+            if not (isinstance(e, OSError) and entry.is_dir()):
+                raise
+    except OSError as e:
+        logger.warning("Could not write paper cache entry %s: %s", key, e)
+        return
+    evict()
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(p.stat().st_size for p in entry.rglob("*") if p.is_file())
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Delete least-recently-used entries until the cache fits max_bytes. Returns entries removed."""
+    limit = PAPER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not PAPER_CACHE_DIR.is_dir():
+        return 0
+    with _evict_lock:
+        entries = []
+        for entry in PAPER_CACHE_DIR.iterdir():
+            if not entry.is_dir() or entry.name.startswith(".tmp-"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, _entry_size(entry), entry))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries):
+            if total <= limit:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+    if removed:
+        logger.info("Evicted %d paper cache entries", removed)
+    return removed
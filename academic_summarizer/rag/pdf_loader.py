@@ -1,8 +1,134 @@
+"""
+PDF text extraction with PyMuPDF: page iterator, optional multi-process mode and size guards.
+
+Every function takes a path or the PDF itself as bytes / a memoryview (e.g. an
+in-memory upload), which PyMuPDF opens in place without writing it to disk.
+"""
+
+import multiprocessing
+import os
+import threading
+from array import array
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
 import fitz
 
-def load_pdf(path):
-    doc = fitz.open(path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
+# Refuse PDFs beyond these limits so one huge scan cannot exhaust worker memory (0 = no limit).
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "2000"))
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(100 * 1024 * 1024)))
+# Extract page ranges in this many worker processes; 0 or 1 extracts in-process.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+# Below this page count, process start-up and IPC cost more than they save.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+
+# One pool per worker count, so a call with a different count does not reuse a smaller pool.
+_pools: dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+class PDFTooLarge(ValueError):
+    """The PDF exceeds PDF_MAX_PAGES or PDF_MAX_BYTES."""
+
+
+# A path, or the PDF itself in memory.
+PdfSource = str | os.PathLike | bytes | bytearray | memoryview
+
+
+def _in_memory(source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def source_size(source) -> int:
+    """Size in bytes of a PDF path or in-memory PDF."""
+    return memoryview(source).nbytes if _in_memory(source) else os.path.getsize(source)
+
+
+def open_pdf(source) -> fitz.Document:
+    if _in_memory(source):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _check_size(path) -> None:
+    size = source_size(path)
+    if PDF_MAX_BYTES and size > PDF_MAX_BYTES:
+        raise PDFTooLarge(f"PDF is {size} bytes; the limit is {PDF_MAX_BYTES}.")
+
+
+def _check_pages(page_count: int) -> None:
+    if PDF_MAX_PAGES and page_count > PDF_MAX_PAGES:
+        raise PDFTooLarge(f"PDF has {page_count} pages; the limit is {PDF_MAX_PAGES}.")
+
+
+def iter_pages(path) -> Iterator[tuple[int, str]]:
+    """Yield (page_number, text) for each page, numbered from 1, one page in memory at a time."""
+    _check_size(path)
+    with open_pdf(path) as doc:
+        _check_pages(doc.page_count)
+        for page in doc:
+            yield page.number + 1, page.get_text()
+
+
+def _extract_range(path, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop). Runs in a worker process, so it opens its own document."""
+    with open_pdf(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn, not fork: forking a worker that already runs torch threads can deadlock.
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+    return pool
+
+
+def _page_texts(path, workers: int | None = None) -> Iterator[str]:
+    workers = PDF_WORKERS if workers is None else workers
+    if workers <= 1:
+        yield from (text for _, text in iter_pages(path))
+        return
+
+    _check_size(path)
+    with open_pdf(path) as doc:
+        page_count = doc.page_count
+    _check_pages(page_count)
+    if page_count < PDF_PARALLEL_MIN_PAGES:
+        yield from (text for _, text in iter_pages(path))
+        return
+
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    # Worker processes open a file by path. An in-memory PDF (at most
+    # UPLOAD_MAX_MEMORY_BYTES) is pickled to each of them instead, one copy per range.
+    source = bytes(path) if _in_memory(path) else str(path)
+    pool = _get_pool(workers)
+    futures = [pool.submit(_extract_range, source, start, stop) for start, stop in ranges]
+    for future in futures:
+        yield from future.result()
+
+
+def load_pdf(path, workers: int | None = None) -> str:
+    """
+    Return the text of every page, concatenated in order.
+
+    With workers > 1 (default PDF_WORKERS) and a long enough document, page ranges
+    are extracted in parallel worker processes.
+    """
+    return "".join(_page_texts(path, workers))
+
+
+def load_pdf_pages(path, workers: int | None = None) -> tuple[str, array]:
+    """load_pdf plus the character offset at which each page starts (for rag.chunker page numbers)."""
+    texts = []
+    starts = array("q")
+    offset = 0
+    for text in _page_texts(path, workers):
+        starts.append(offset)
+        texts.append(text)
+        offset += len(text)
+    return "".join(texts), starts
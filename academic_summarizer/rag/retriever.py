@@ -1,6 +1,189 @@
+"""
+Retrieval and token-budgeted context packing.
+
+pack_context() replaces a fixed top-k: it fetches RETRIEVE_CANDIDATES nearest
+chunks, trims the text each chunk shares with an already-picked neighbour (the
+chunker's CHUNK_OVERLAP), and adds chunks in maximal-marginal-relevance order
+until the model's context token budget is full. Picked chunks are returned in
+document order.
+
+With RETRIEVE_MODE=hybrid (the default) the candidates come from two rankings, FAISS
+nearest neighbours and BM25 keyword matches (rag.sparse_index), merged by reciprocal
+rank fusion: each chunk scores sum(1 / (RETRIEVE_RRF_K + rank)) over the rankings it
+appears in. Exact terms (dataset IDs, acronyms, equation names) that the embedding
+misses still reach the context. RETRIEVE_MODE=dense uses the FAISS ranking alone.
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from rag.chunker import CHUNK_OVERLAP
+from rag.sparse_index import BM25Index
+from rag.tokens import count_tokens
+from rag.vector_store import reconstruct
+
+logger = logging.getLogger(__name__)
+
 # Number of retrieved chunks for summary context (more = broader coverage, higher token use)
 RETRIEVE_K = 6
 
+# Candidates considered by pack_context.
+RETRIEVE_CANDIDATES = int(os.getenv("RETRIEVE_CANDIDATES", "24"))
+# 1.0 = pure relevance, 0.0 = pure diversity.
+RETRIEVE_MMR_LAMBDA = float(os.getenv("RETRIEVE_MMR_LAMBDA", "0.7"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+RETRIEVE_MODES = ("hybrid", "dense")
+RETRIEVE_MODE = (os.getenv("RETRIEVE_MODE") or "hybrid").strip().lower()
+# Damps the head of each ranking; 60 is the value from the original RRF paper.
+RETRIEVE_RRF_K = int(os.getenv("RETRIEVE_RRF_K", "60"))
+
+# Overlaps shorter than this are left alone (likely a coincidental match).
+_MIN_OVERLAP = 20
+
+
+def _parse_budgets(raw: str) -> dict[str, int]:
+    budgets = {}
+    for item in raw.split(","):
+        model, sep, value = item.partition("=")
+        if sep and model.strip() and value.strip():
+            budgets[model.strip()] = int(value)
+    return budgets
+
+
+# Per-model overrides, e.g. "gpt-4o-mini=8000,llama-3.3-70b-versatile=4000".
+CONTEXT_TOKEN_BUDGETS = _parse_budgets(os.getenv("CONTEXT_TOKEN_BUDGETS", ""))
+
+
+@dataclass
+class PackedContext:
+    texts: list[str] = field(default_factory=list)
+    # Document metadata of each text (page, start, end, section; see rag.chunker.ChunkSpans).
+    metadata: list[dict] = field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    candidates: int = 0
+    overlap_chars_removed: int = 0
+
 
 def get_retriever(vectorstore):
     return vectorstore.as_retriever(search_kwargs={"k": RETRIEVE_K})
+
+
+def context_budget(model: str | None = None) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model or "", CONTEXT_TOKEN_BUDGET)
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right (up to CHUNK_OVERLAP)."""
+    for size in range(min(CHUNK_OVERLAP, len(left), len(right)), _MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def strip_overlap(text: str, neighbours) -> str:
+    """Drop the start/end of text that repeats the end/start of any neighbour."""
+    start, end = 0, len(text)
+    for other in neighbours:
+        start = max(start, _overlap(other, text))
+        end = min(end, len(text) - _overlap(text, other))
+    return text[start:end].strip() if start < end else ""
+
+
+def _keyword_index(vectorstore) -> BM25Index:
+    """The store's BM25 index, built from its chunk texts if it was created without one."""
+    keywords = getattr(vectorstore, "sparse_index", None)
+    if keywords is None:
+        ids = vectorstore.index_to_docstore_id
+        keywords = BM25Index.build(vectorstore.docstore.search(ids[i]).page_content for i in range(len(ids)))
+        vectorstore.sparse_index = keywords
+    return keywords
+
+
+def fuse_rankings(rankings, k: int) -> tuple[list[int], np.ndarray]:
+    """
+    Reciprocal rank fusion of several best-first lists of chunk positions: the (at most)
+    k best positions, best first, and their fused scores.
+    """
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            fused[int(position)] = fused.get(int(position), 0.0) + 1.0 / (RETRIEVE_RRF_K + rank + 1)
+    best = sorted(fused, key=fused.__getitem__, reverse=True)[:k]
+    return best, np.array([fused[position] for position in best], dtype=np.float32)
+
+
+def _query_vector(vectorstore, query: str) -> np.ndarray:
+    embeddings = vectorstore.embeddings
+    vector = embeddings.embed_query(query) if embeddings is not None else vectorstore.embedding_function(query)
+    return np.asarray([vector], dtype=np.float32)
+
+
+def pack_context(
+    vectorstore, query: str, model: str | None = None, budget: int | None = None, query_vector=None
+) -> PackedContext:
+    """
+    Pick chunks relevant to query, diverse and de-duplicated, within budget tokens.
+
+    Pass query_vector to reuse an embedding computed elsewhere (e.g. in a batch).
+    """
+    if RETRIEVE_MODE not in RETRIEVE_MODES:
+        raise ValueError(f"Unknown RETRIEVE_MODE {RETRIEVE_MODE!r}. Use one of: {', '.join(RETRIEVE_MODES)}.")
+    budget = budget or context_budget(model)
+    index = vectorstore.index
+    if query_vector is None:
+        query_vector = _query_vector(vectorstore, query)
+    query_vector = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    _, ids = index.search(query_vector, min(RETRIEVE_CANDIDATES, index.ntotal))
+    ids = [int(i) for i in ids[0] if i >= 0]
+    fused = None
+    if RETRIEVE_MODE == "hybrid":
+        keyword_ids = _keyword_index(vectorstore).top(query, RETRIEVE_CANDIDATES)
+        ids, fused = fuse_rankings([ids, keyword_ids], RETRIEVE_CANDIDATES)
+    packed = PackedContext(budget=budget, candidates=len(ids))
+    if not ids:
+        return packed
+
+    # Embeddings are L2-normalised, so dot products are cosine similarities.
+    vectors = reconstruct(index, ids)
+    # Fused scores are scaled to 1 for the best candidate, like a cosine similarity.
+    relevance = vectors @ query_vector[0] if fused is None else fused / fused[0]
+    similarity = vectors @ vectors.T
+    documents = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in ids]
+    texts = [document.page_content for document in documents]
+
+    remaining = list(range(len(ids)))
+    redundancy = np.zeros(len(ids), dtype=np.float32)
+    picked = {}
+    while remaining:
+        scores = RETRIEVE_MMR_LAMBDA * relevance[remaining] - (1 - RETRIEVE_MMR_LAMBDA) * redundancy[remaining]
+        best = remaining.pop(int(np.argmax(scores)))
+
+        text = strip_overlap(texts[best], (texts[j] for j in picked))
+        if not text:
+            packed.overlap_chars_removed += len(texts[best])
+            continue
+        tokens = count_tokens(text, model)
+        if packed.tokens + tokens > budget and picked:
+            # Too big for what is left; a smaller, less relevant chunk may still fit.
+            continue
+        packed.overlap_chars_removed += len(texts[best]) - len(text)
+        packed.tokens += tokens
+        picked[best] = text
+        redundancy = np.maximum(redundancy, similarity[best])
+        if packed.tokens >= budget:
+            break
+
+    # Chunks were indexed in document order, so sorting by position keeps the paper's flow.
+    order = sorted(picked, key=lambda j: ids[j])
+    packed.texts = [picked[j] for j in order]
+    packed.metadata = [documents[j].metadata for j in order]
+    logger.info(
+        "Packed %d of %d candidate chunks into %d/%d context tokens (%d overlapping chars removed)",
+        len(packed.texts), packed.candidates, packed.tokens, budget, packed.overlap_chars_removed,
+    )
+    return packed
@@ -0,0 +1,122 @@
+"""
+BM25 keyword index over a paper's chunks, for hybrid retrieval next to FAISS.
+
+Dense MiniLM embeddings blur exact technical terms: equation names, dataset IDs
+("ImageNet-1k", "SQuAD2.0"), acronyms and model names. BM25 matches them literally.
+The index is a scipy sparse matrix of precomputed per-chunk BM25 term weights, so
+scoring a query is one column slice and a sum, with no Python loop over chunks.
+
+Tokens are lowercased runs of letters and digits; compounds joined by "-", ".", "_"
+or "/" are kept whole and also split into their parts, so "ImageNet-1k" matches
+queries for both "imagenet-1k" and "imagenet".
+
+Tuning (env):
+- BM25_K1: term-frequency saturation (default 1.5)
+- BM25_B: document-length normalisation (default 0.75)
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy import sparse
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_WEIGHTS_FILE = "bm25.npz"
+_VOCABULARY_FILE = "bm25_vocabulary.json"
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-._/][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this "
+    "to was were which with we our these those than then there also can may not".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOP_WORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in _PART.findall(token) if part not in _STOP_WORDS)
+    return tokens
+
+
+def term_counts(texts) -> tuple[sparse.csr_matrix, dict[str, int]]:
+    """Term-frequency matrix (one row per text, one column per token) and its vocabulary."""
+    texts = list(texts)
+    vocabulary: dict[str, int] = {}
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text)]
+        rows.extend([row] * len(ids))
+        columns.extend(ids)
+    # Duplicate (row, column) pairs are summed, giving term frequencies.
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(texts), len(vocabulary))
+    )
+    counts.sum_duplicates()
+    return counts, vocabulary
+
+
+@dataclass
+class BM25Index:
+    """BM25 weights, one row per chunk (in index order) and one column per term."""
+
+    weights: sparse.csc_matrix
+    vocabulary: dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return self.weights.shape[0]
+
+    @classmethod
+    def build(cls, texts) -> "BM25Index":
+        counts, vocabulary = term_counts(texts)
+        n = counts.shape[0]
+        lengths = np.asarray(counts.sum(axis=1), dtype=np.float32).ravel()
+        mean_length = float(lengths.mean()) if n else 0.0
+        df = np.bincount(counts.indices, minlength=len(vocabulary)).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+        tf = counts.data
+        row_of = np.repeat(np.arange(n), np.diff(counts.indptr))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[row_of] / (mean_length or 1.0))
+        counts.data = (idf[counts.indices] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(counts.tocsc(), vocabulary)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for query (zeros when no query term occurs)."""
+        ids = sorted({self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary})
+        if not ids:
+            return np.zeros(len(self), dtype=np.float32)
+        return np.asarray(self.weights[:, ids].sum(axis=1), dtype=np.float32).ravel()
+
+    def top(self, query: str, k: int) -> np.ndarray:
+        """Positions of the (at most) k best-scoring chunks with a non-zero score, best first."""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return matched[np.argsort(-scores[matched], kind="stable")]
+
+    def save(self, folder) -> None:
+        sparse.save_npz(os.path.join(folder, _WEIGHTS_FILE), self.weights)
+        terms = sorted(self.vocabulary, key=self.vocabulary.__getitem__)
+        with open(os.path.join(folder, _VOCABULARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(terms, f)
+
+
+def load(folder) -> BM25Index | None:
+    """The index saved in folder, or None if there is none."""
+    path = os.path.join(folder, _WEIGHTS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(os.path.join(folder, _VOCABULARY_FILE), encoding="utf-8") as f:
+        terms = json.load(f)
+    return BM25Index(sparse.load_npz(path).tocsc(), {term: i for i, term in enumerate(terms)})
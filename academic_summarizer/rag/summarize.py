@@ -1,57 +1,277 @@
-"""Shared RAG + LLM pipeline for summarizing a PDF."""
-
-from rag.pdf_loader import load_pdf
-from rag.chunker import chunk_text
-from rag.compressor import compress_chunks
-from rag.embeddings import get_embeddings
-from rag.vector_store import build_vectorstore
-from rag.retriever import get_retriever
-from llm.scaledown_client import ScaleDownLLM
+"""
+Shared RAG + LLM pipeline for summarizing a PDF.
+
+The a-prefixed coroutines (asummarize_pdf, acompress_pdf) run the same pipeline for
+async views: network calls go through the asyncio clients and CPU-bound stages
+(extraction, chunking, embedding, indexing, retrieval) run on a bounded thread pool
+(CPU_WORKERS), so the event loop stays free while papers wait on upstream APIs.
+
+With LLM_SEMANTIC_THRESHOLD set, answers are also remembered per paper and query
+embedding (llm.response_cache), so a near-identical question about the same PDF is
+answered without retrieval or an LLM call.
+
+Identical summarize_pdf / asummarize_pdf calls (same PDF content, query, mode and
+model) that overlap in time run once: the others wait for that result, within a
+worker and across workers (llm.single_flight).
+
+Every entry point takes the PDF as a path or as bytes / a memoryview (e.g. an
+in-memory upload), plus its content hash when the caller already has it.
+
+Each chunk carries its page, character offsets and section as Document metadata
+(rag.chunker.ChunkSpans), cached with the paper; retrieved excerpts are labelled
+with their page in the prompt, so summaries can cite pages.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.pdf_loader import PdfSource, load_pdf_pages, source_size
+from rag.chunker import split_text
+from rag import extractive
+from rag.compressor import acompress_chunks, compress_chunks, compress_mode
+from rag.embeddings import embed_texts, get_embeddings
+from rag.vector_store import build_vectorstore, restore_vectorstore
+from rag import paper_cache
+from rag.retriever import pack_context
+from rag.map_reduce import summarize_map_reduce
+from llm import response_cache, single_flight, tracing
+from llm.kv_cache import make_key
+from llm.scaledown_client import AsyncScaleDownLLM, ScaleDownLLM
+from llm.scaledown_compress import acompress_text as scaledown_acompress_text
 from llm.scaledown_compress import compress_text as scaledown_compress_text
 
 
 ACADEMIC_SUMMARY_INSTRUCTION = """You are summarizing an academic research paper. Preserve technical accuracy: keep key terms, methods, and findings exact. Structure your response clearly (e.g. objective, methods, results, conclusions). Do not invent or add information not present in the excerpts."""
 
+CITE_PAGES_INSTRUCTION = """Each excerpt starts with the page it comes from. Cite the page of each key claim, e.g. (p. 4)."""
+
+NO_TEXT_MESSAGE = "No text could be extracted from the PDF."
+NO_DOCS_MESSAGE = "No relevant sections were retrieved. The paper may be too short or the query may not match the content."
+# What the compress API is told to keep when the caller gives no context.
+DEFAULT_COMPRESS_CONTEXT = "Full academic paper text to compress."
+
+# Concurrent LLM calls per answer_queries() batch.
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "4"))
+
+# Threads for CPU-bound stages of the async pipeline; 0 = one per CPU.
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0"))
+
+# "rag" answers from the retrieved chunks; "map_reduce" reads the whole paper.
+SUMMARY_MODES = ("rag", "map_reduce")
+
+
+def _size(texts) -> int:
+    return sum(len(text.encode("utf-8")) for text in texts)
 
-def compress_pdf(file_path: str, context: str | None = None) -> str:
+
+_cpu_executor = None
+_cpu_executor_lock = threading.Lock()
+
+
+def _get_cpu_executor() -> ThreadPoolExecutor:
+    global _cpu_executor
+    if _cpu_executor is None:
+        with _cpu_executor_lock:
+            if _cpu_executor is None:
+                _cpu_executor = ThreadPoolExecutor(
+                    max_workers=CPU_WORKERS or os.cpu_count() or 4, thread_name_prefix="rag-cpu"
+                )
+    return _cpu_executor
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run a blocking function on the CPU pool, keeping the caller's tracing context."""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_cpu_executor(), call)
+
+
+def compress_pdf(file_path: PdfSource, context: str | None = None) -> str:
     """
-    Compress the full text of a PDF using the ScaleDown compress API.
+    Compress the full text of a PDF using the ScaleDown compress API, or locally
+    with COMPRESS_MODE=extractive. context is the caller's description of what to keep
+    (the API gets DEFAULT_COMPRESS_CONTEXT without one); extractive mode scores sentences
+    against it, and without one by centrality alone.
 
     This is useful when you want a size-reduced representation of the paper
     (for storage or for sending to other LLMs) instead of a natural-language
     summary.
     """
-    text = load_pdf(file_path)
-    if not text or not text.strip():
-        return "No text could be extracted from the PDF."
+    extracted = _extract(file_path)
+    if extracted is None:
+        return NO_TEXT_MESSAGE
+    text = extracted[0]
+
+    with tracing.stage("compress", bytes=_size([text]), chunks=1):
+        if compress_mode() == "extractive":
+            return extractive.compress_text(text, query=context or None)
+        return scaledown_compress_text(text, context=context or DEFAULT_COMPRESS_CONTEXT)
+
+
+async def acompress_pdf(file_path: PdfSource, context: str | None = None) -> str:
+    """compress_pdf for async callers."""
+    extracted = await run_cpu(_extract, file_path)
+    if extracted is None:
+        return NO_TEXT_MESSAGE
+    text = extracted[0]
+
+    with tracing.stage("compress", bytes=_size([text]), chunks=1):
+        if compress_mode() == "extractive":
+            return await run_cpu(extractive.compress_text, text, query=context or None)
+        return await scaledown_acompress_text(text, context=context or DEFAULT_COMPRESS_CONTEXT)
+
 
-    context_value = context or "Full academic paper text to compress."
-    return scaledown_compress_text(text, context=context_value)
+def _extract(file_path: PdfSource):
+    """(text, character offset at which each page starts), or None if the PDF has no text."""
+    with tracing.stage("extract", bytes=source_size(file_path)):
+        text, page_starts = load_pdf_pages(file_path)
+    return (text, page_starts) if text and text.strip() else None
 
 
-def summarize_pdf(file_path: str, query: str = "Summarize this paper") -> str:
+def _chunk(text: str, page_starts) -> tuple[list[str], list[dict]]:
+    """Chunks of text and their metadata (page, start, end, section)."""
+    with tracing.stage("chunk", bytes=_size([text])) as span:
+        chunks, spans = split_text(text, page_starts)
+        span["chunks"] = len(chunks)
+    return chunks, spans.metadata()
+
+
+def _index(text: str, chunks: list[str], compressed: list[str], metadata: list[dict], key: str | None) -> dict:
+    """Embed and index the compressed chunks, and cache the result under key."""
+    with tracing.stage("embed", chunks=len(compressed)):
+        vectors = embed_texts(compressed)
+    with tracing.stage("index", chunks=len(compressed)):
+        # BM25 over the uncompressed chunks, which keep every exact term.
+        vectorstore = build_vectorstore(
+            compressed, get_embeddings(), vectors, keyword_texts=chunks, metadatas=metadata
+        )
+    if key:
+        with tracing.stage("cache_save", chunks=len(compressed)):
+            paper_cache.save(key, text, chunks, compressed, vectors, vectorstore, metadata)
+    return {"compressed": compressed, "vectors": vectors, "metadata": metadata, "vectorstore": vectorstore}
+
+
+def _process_paper(file_path: PdfSource, key: str | None) -> dict | None:
+    """Run extraction → chunk → compress → embed → index, and cache the result under key."""
+    extracted = _extract(file_path)
+    if extracted is None:
+        return None
+    text, page_starts = extracted
+    chunks, metadata = _chunk(text, page_starts)
+    with tracing.stage("compress", bytes=_size(chunks), chunks=len(chunks)) as span:
+        compressed = compress_chunks(chunks)
+        span["bytes_out"] = _size(compressed)
+    return _index(text, chunks, compressed, metadata, key)
+
+
+async def _aprocess_paper(file_path: PdfSource, key: str | None) -> dict | None:
+    extracted = await run_cpu(_extract, file_path)
+    if extracted is None:
+        return None
+    text, page_starts = extracted
+    chunks, metadata = await run_cpu(_chunk, text, page_starts)
+    with tracing.stage("compress", bytes=_size(chunks), chunks=len(chunks)) as span:
+        compressed = await acompress_chunks(chunks)
+        span["bytes_out"] = _size(compressed)
+    return await run_cpu(_index, text, chunks, compressed, metadata, key)
+
+
+def _cache_key(file_path: PdfSource, content_hash: str | None = None) -> str | None:
+    if not paper_cache.enabled():
+        return None
+    return paper_cache.cache_key(content_hash or paper_cache.hash_file(file_path))
+
+
+def _load_cached_vectorstore(key: str):
+    with tracing.stage("cache_load") as span:
+        cached = paper_cache.load(key)
+        span["hit"] = int(cached is not None)
+        if cached is not None:
+            return restore_vectorstore(
+                cached["compressed"], get_embeddings(), cached["vectors"], cached["index_path"],
+                metadatas=cached["metadata"],
+            )
+    return None
+
+
+def prepare_paper(file_path: PdfSource, content_hash: str | None = None):
     """
-    Extract text from PDF, run RAG (chunk → compress → embed → retrieve), then generate summary.
-    Uses compression to handle lengthy papers while preserving technical accuracy.
+    Return a vector store over the paper's (compressed) chunks, or None if the PDF has no text.
+
+    Results are cached by PDF content hash, so a repeat upload of the same paper skips
+    extraction, chunking, compression and embedding and goes straight to retrieval.
     """
-    text = load_pdf(file_path)
-    if not text or not text.strip():
-        return "No text could be extracted from the PDF."
-    chunks = chunk_text(text)
-    compressed = compress_chunks(chunks)
-    embeddings = get_embeddings()
-    vectorstore = build_vectorstore(compressed, embeddings)
-    retriever = get_retriever(vectorstore)
-    # LangChain retrievers in newer versions are Runnables (use .invoke);
-    # older versions exposed .get_relevant_documents. Support both.
-    if hasattr(retriever, "get_relevant_documents"):
-        docs = retriever.get_relevant_documents(query)
-    else:
-        docs = retriever.invoke(query)
-    if not docs:
-        return "No relevant sections were retrieved. The paper may be too short or the query may not match the content."
-    context = "\n\n---\n\n".join(d.page_content for d in docs)
-    prompt = f"""{ACADEMIC_SUMMARY_INSTRUCTION}
+    key = _cache_key(file_path, content_hash)
+    if key:
+        vectorstore = _load_cached_vectorstore(key)
+        if vectorstore is not None:
+            return vectorstore
+    processed = _process_paper(file_path, key)
+    return processed["vectorstore"] if processed else None
+
+
+async def aprepare_paper(file_path: PdfSource, content_hash: str | None = None):
+    """prepare_paper for async callers."""
+    key = await run_cpu(_cache_key, file_path, content_hash)
+    if key:
+        vectorstore = await run_cpu(_load_cached_vectorstore, key)
+        if vectorstore is not None:
+            return vectorstore
+    processed = await _aprocess_paper(file_path, key)
+    return processed["vectorstore"] if processed else None
+
+
+def paper_chunks(file_path: PdfSource, content_hash: str | None = None):
+    """
+    Return (compressed chunks, embedding matrix, chunk metadata) for a PDF, or None if
+    it has no text. The metadata has one dict per chunk (page, start, end, section).
+
+    Shares the paper cache with prepare_paper, so ingesting a paper that was already
+    summarized (or vice versa) does not embed it twice.
+    """
+    key = _cache_key(file_path, content_hash)
+    if key:
+        with tracing.stage("cache_load") as span:
+            cached = paper_cache.load(key)
+            span["hit"] = int(cached is not None)
+        if cached is not None:
+            return cached["compressed"], cached["vectors"], cached["metadata"]
+    processed = _process_paper(file_path, key)
+    return (processed["compressed"], processed["vectors"], processed["metadata"]) if processed else None
+
+
+def build_prompt(vectorstore, query: str, model: str | None = None, query_vector=None) -> str | None:
+    """
+    Pack the chunks relevant to query into model's context token budget and build the
+    LLM prompt, or None if nothing matched.
+    """
+    packed = _retrieve(vectorstore, query, model, query_vector)
+    if not packed.texts:
+        return None
+    return _prompt_for(packed.texts, query, packed.metadata)
+
+
+def _retrieve(vectorstore, query: str, model: str | None, query_vector=None):
+    with tracing.stage("retrieve") as span:
+        packed = pack_context(vectorstore, query, model, query_vector=query_vector)
+        span["chunks"] = len(packed.texts)
+        span["tokens"] = packed.tokens
+    return packed
+
+
+def _prompt_for(texts, query: str, metadata=None) -> str:
+    pages = [(entry or {}).get("page", 0) for entry in metadata] if metadata else [0] * len(texts)
+    context = "\n\n---\n\n".join(
+        f"[page {page}]\n{text}" if page else text for text, page in zip(texts, pages)
+    )
+    cite = f"\n\n{CITE_PAGES_INSTRUCTION}" if any(pages) else ""
+    return f"""{ACADEMIC_SUMMARY_INSTRUCTION}{cite}
 
 Relevant excerpts from the paper (may be compressed for length):
 
@@ -60,5 +280,214 @@ Relevant excerpts from the paper (may be compressed for length):
 User request: {query}
 
 Provide a concise, accurate summary based only on the excerpts above."""
+
+
+def _semantic_scopes(mode: str, llm: ScaleDownLLM) -> list[str]:
+    return [response_cache.semantic_scope(mode, name, model) for name, model in llm.cache_targets()]
+
+
+def _semantic_put(content_hash: str, mode: str, answered_by: dict, query: str, query_vector, answer: str) -> None:
+    """Store answer under the provider and model that gave it (from generate's answered_by)."""
+    if answered_by:
+        scope = response_cache.semantic_scope(mode, answered_by["provider"], answered_by["model"])
+        response_cache.semantic_put(content_hash, scope, query, query_vector, answer)
+
+
+def _semantic_lookup(file_path: PdfSource, query: str, scopes: list[str], content_hash: str | None = None):
+    """
+    (content hash, query vector, cached answer) for the semantic response cache, or
+    (content_hash, None, None) when it is off. The query vector is reused for retrieval.
+    """
+    if not response_cache.semantic_enabled():
+        return content_hash, None, None
+    content_hash = content_hash or paper_cache.hash_file(file_path)
+    with tracing.stage("embed_queries", chunks=1):
+        query_vector = embed_texts([query])[0]
+    with tracing.stage("semantic_cache") as span:
+        cached = response_cache.semantic_get(content_hash, scopes, query_vector)
+        span["hit"] = int(cached is not None)
+    return content_hash, query_vector, cached
+
+
+def summarize_pdf(
+    file_path: PdfSource, query: str = "Summarize this paper", mode: str = "rag", content_hash: str | None = None
+) -> str:
+    """
+    Extract text from PDF, run RAG (chunk → compress → embed → retrieve), then generate summary.
+    Uses compression to handle lengthy papers while preserving technical accuracy.
+
+    mode="map_reduce" summarizes every chunk instead of only the retrieved ones
+    (see rag.map_reduce), for papers where the answer needs the whole text.
+    """
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode!r}. Use one of: {', '.join(SUMMARY_MODES)}.")
+    llm = ScaleDownLLM()
+    if not single_flight.enabled():
+        return _summarize_pdf(file_path, query, mode, content_hash, llm)
+    content_hash = content_hash or paper_cache.hash_file(file_path)
+    key = _flight_key(content_hash, query, mode, llm.model)
+    return single_flight.do(key, lambda: _summarize_pdf(file_path, query, mode, content_hash, llm))
+
+
+def _flight_key(content_hash: str, query: str, mode: str, model: str) -> str:
+    return make_key("summarize", content_hash, query, mode, model)
+
+
+def _summarize_pdf(
+    file_path: PdfSource, query: str, mode: str, content_hash: str | None, llm: ScaleDownLLM | None = None
+) -> str:
+    llm = llm or ScaleDownLLM()
+    scopes = _semantic_scopes(mode, llm)
+    content_hash, query_vector, cached = _semantic_lookup(file_path, query, scopes, content_hash)
+    if cached is not None:
+        return cached
+    answered_by = {}
+
+    if mode == "map_reduce":
+        result = paper_chunks(file_path, content_hash)
+        if result is None:
+            return NO_TEXT_MESSAGE
+        answer = summarize_map_reduce(result[0], query, llm, answered_by)
+    else:
+        vectorstore = prepare_paper(file_path, content_hash)
+        if vectorstore is None:
+            return NO_TEXT_MESSAGE
+        prompt = build_prompt(vectorstore, query, llm.model, query_vector)
+        if prompt is None:
+            return NO_DOCS_MESSAGE
+        answer = llm.generate(prompt, answered_by=answered_by)
+    if query_vector is not None:
+        _semantic_put(content_hash, mode, answered_by, query, query_vector, answer)
+    return answer
+
+
+def summarize_pdf_stream(
+    file_path: PdfSource, query: str = "Summarize this paper", content_hash: str | None = None
+) -> Iterator[str]:
+    """Same pipeline as summarize_pdf, but yields the summary text as the LLM generates it."""
+    llm = ScaleDownLLM()
+    scopes = _semantic_scopes("rag", llm)
+    content_hash, query_vector, cached = _semantic_lookup(file_path, query, scopes, content_hash)
+    if cached is not None:
+        yield cached
+        return
+    vectorstore = prepare_paper(file_path, content_hash)
+    if vectorstore is None:
+        yield NO_TEXT_MESSAGE
+        return
+    prompt = build_prompt(vectorstore, query, llm.model, query_vector)
+    if prompt is None:
+        yield NO_DOCS_MESSAGE
+        return
+    parts = []
+    answered_by = {}
+    for content in llm.generate_stream(prompt, answered_by=answered_by):
+        parts.append(content)
+        yield content
+    if query_vector is not None:
+        _semantic_put(content_hash, "rag", answered_by, query, query_vector, "".join(parts))
+
+
+async def asummarize_pdf(
+    file_path: PdfSource, query: str = "Summarize this paper", mode: str = "rag", content_hash: str | None = None
+) -> str:
+    """
+    summarize_pdf for async callers.
+
+    mode="map_reduce" runs the synchronous map-reduce pipeline on the CPU pool, since
+    its LLM calls are already spread over its own bounded thread pool.
+    """
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode!r}. Use one of: {', '.join(SUMMARY_MODES)}.")
+    llm = AsyncScaleDownLLM()
+    if not single_flight.enabled():
+        return await _asummarize_pdf(file_path, query, mode, content_hash, llm)
+    content_hash = content_hash or await run_cpu(paper_cache.hash_file, file_path)
+    key = _flight_key(content_hash, query, mode, llm.model)
+    return await single_flight.ado(key, lambda: _asummarize_pdf(file_path, query, mode, content_hash, llm))
+
+
+async def _asummarize_pdf(
+    file_path: PdfSource, query: str, mode: str, content_hash: str | None, llm: AsyncScaleDownLLM
+) -> str:
+    if mode == "map_reduce":
+        return await run_cpu(_summarize_pdf, file_path, query, mode, content_hash)
+
+    scopes = _semantic_scopes("rag", llm)
+    content_hash, query_vector, cached = await run_cpu(_semantic_lookup, file_path, query, scopes, content_hash)
+    if cached is not None:
+        return cached
+    vectorstore = await aprepare_paper(file_path, content_hash)
+    if vectorstore is None:
+        return NO_TEXT_MESSAGE
+    prompt = await run_cpu(build_prompt, vectorstore, query, llm.model, query_vector)
+    if prompt is None:
+        return NO_DOCS_MESSAGE
+    answered_by = {}
+    answer = await llm.generate(prompt, answered_by=answered_by)
+    if query_vector is not None:
+        await run_cpu(_semantic_put, content_hash, "rag", answered_by, query, query_vector, answer)
+    return answer
+
+
+def answer_queries(file_path: PdfSource, queries: list[str], content_hash: str | None = None) -> dict:
+    """
+    Answer several queries about one PDF: the paper is processed once, the queries are
+    embedded in one batch, and up to BATCH_QUERY_CONCURRENCY LLM calls run at a time.
+
+    Returns {"results": [...], "timings": {...}}, one result per query in order with
+    its answer (or error), context tokens and seconds.
+    """
+    start = time.perf_counter()
+    semantic = response_cache.semantic_enabled()
+    if semantic:
+        content_hash = content_hash or paper_cache.hash_file(file_path)
+    vectorstore = prepare_paper(file_path, content_hash)
+    prepared = time.perf_counter()
+    if vectorstore is None:
+        results = [{"query": query, "answer": NO_TEXT_MESSAGE} for query in queries]
+        return {"results": results, "timings": {"prepare": round(prepared - start, 3)}}
+
+    with tracing.stage("embed_queries", chunks=len(queries)):
+        query_vectors = embed_texts(queries)
+    embedded = time.perf_counter()
     llm = ScaleDownLLM()
-    return llm.generate(prompt)
+    scopes = _semantic_scopes("rag", llm)
+
+    def answer(item):
+        query, query_vector = item
+        query_start = time.perf_counter()
+        result = {"query": query}
+        cached = response_cache.semantic_get(content_hash, scopes, query_vector) if semantic else None
+        if cached is not None:
+            result.update(answer=cached, context_tokens=0, seconds=round(time.perf_counter() - query_start, 3))
+            return result
+        packed = _retrieve(vectorstore, query, llm.model, query_vector)
+        result["context_tokens"] = packed.tokens
+        try:
+            if packed.texts:
+                answered_by = {}
+                prompt = _prompt_for(packed.texts, query, packed.metadata)
+                result["answer"] = llm.generate(prompt, answered_by=answered_by)
+                if semantic:
+                    _semantic_put(content_hash, "rag", answered_by, query, query_vector, result["answer"])
+            else:
+                result["answer"] = NO_DOCS_MESSAGE
+        except Exception as e:
+            # One failed query should not lose the answers to the others.
+            result["error"] = str(e)
+        result["seconds"] = round(time.perf_counter() - query_start, 3)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_QUERY_CONCURRENCY, len(queries)))) as executor:
+        results = list(executor.map(tracing.bind(answer), zip(queries, query_vectors)))
+    finished = time.perf_counter()
+    return {
+        "results": results,
+        "timings": {
+            "prepare": round(prepared - start, 3),
+            "embed_queries": round(embedded - prepared, 3),
+            "answer": round(finished - embedded, 3),
+            "total": round(finished - start, 3),
+        },
+    }
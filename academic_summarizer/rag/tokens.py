@@ -0,0 +1,36 @@
+"""
+Token counting for prompt budgets.
+
+Uses tiktoken when it is installed (exact for OpenAI models, a close estimate for
+Llama-family models on Groq); otherwise falls back to ~4 characters per token.
+"""
+
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str | None):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except OSError:
+        # tiktoken downloads its BPE files on first use; offline hosts use the estimate.
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
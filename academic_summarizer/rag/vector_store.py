@@ -1,4 +1,206 @@
+"""
+FAISS vector stores with a configurable index type.
+
+Flat (exact) search is right for one paper. For archive-scale collections the
+approximate index types trade a little recall for much faster search and, with
+IVF-PQ, far less memory:
+
+- flat: exact L2 search, no training
+- ivf_flat: inverted lists over k-means cells; searches VECTOR_IVF_NPROBE cells
+- hnsw: graph index, no training; VECTOR_HNSW_EF_SEARCH controls recall/speed
+- ivf_pq: IVF with product-quantised vectors (VECTOR_PQ_M bytes per vector)
+
+Indexes that need training are trained on a random sample of at most
+VECTOR_TRAIN_SAMPLE vectors. Collections too small to train fall back to a
+simpler type (ivf_pq -> ivf_flat -> flat).
+
+A store may carry a BM25 keyword index over the same chunks (vectorstore.sparse_index,
+see rag.sparse_index) for hybrid retrieval; it is saved and loaded in the same folder.
+Callers that keep the (quantized) embedding matrix themselves, like the paper cache,
+save only the BM25 index (save_vectorstore(..., with_index=False)) and rebuild the
+FAISS index from the matrix with restore_vectorstore, instead of storing a float32 copy.
+"""
+
+import logging
+import math
+import os
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
-def build_vectorstore(texts, embeddings):
-    return FAISS.from_texts(texts, embeddings)
+from rag import sparse_index
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+VECTOR_INDEX_TYPE = (os.getenv("VECTOR_INDEX_TYPE") or "flat").strip().lower()
+# 0 picks about 4 * sqrt(n) cells.
+VECTOR_IVF_NLIST = int(os.getenv("VECTOR_IVF_NLIST", "0"))
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "16"))
+VECTOR_HNSW_M = int(os.getenv("VECTOR_HNSW_M", "32"))
+VECTOR_HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF_SEARCH", "64"))
+VECTOR_PQ_M = int(os.getenv("VECTOR_PQ_M", "16"))
+VECTOR_TRAIN_SAMPLE = int(os.getenv("VECTOR_TRAIN_SAMPLE", "50000"))
+
+# faiss wants ~39 training points per centroid: per IVF cell, and per entry of each
+# 256-entry (8-bit) PQ codebook.
+_MIN_TRAIN_POINTS = 256
+_POINTS_PER_CELL = 39
+_MIN_PQ_TRAIN_POINTS = 256 * _POINTS_PER_CELL
+
+
+def _nlist_for(n: int) -> int:
+    nlist = VECTOR_IVF_NLIST or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // _POINTS_PER_CELL))
+
+
+def make_index(dim: int, n: int, index_type: str | None = None) -> faiss.Index:
+    """Create an empty (untrained) index for about n vectors of size dim."""
+    index_type = (index_type or VECTOR_INDEX_TYPE).strip().lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown VECTOR_INDEX_TYPE {index_type!r}. Use one of: {', '.join(INDEX_TYPES)}.")
+    if index_type == "ivf_pq" and n < _MIN_PQ_TRAIN_POINTS:
+        logger.debug("%d vectors are too few to train PQ codebooks; using ivf_flat", n)
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and n < _MIN_TRAIN_POINTS:
+        logger.debug("%d vectors are too few to train an IVF index; using flat", n)
+        index_type = "flat"
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, VECTOR_HNSW_M)
+        index.hnsw.efSearch = VECTOR_HNSW_EF_SEARCH
+        return index
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, _nlist_for(n))
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, _nlist_for(n), VECTOR_PQ_M, 8)
+    index.nprobe = VECTOR_IVF_NPROBE
+    return index
+
+
+def tune_index(index: faiss.Index) -> faiss.Index:
+    """Apply the configured search-time parameters (nprobe, efSearch) to a built or loaded index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = VECTOR_IVF_NPROBE
+    # Look through id-mapping wrappers (IndexIDMap/IndexIDMap2) to the real index.
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    hnsw = getattr(inner, "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = VECTOR_HNSW_EF_SEARCH
+    return index
+
+
+def enable_reconstruct(index: faiss.Index) -> faiss.Index:
+    """
+    Build an IVF index's direct map (id -> inverted-list entry), which reconstruct()
+    needs. Done once when a store is built or loaded: retrieval runs on several threads
+    at once and must only read the index.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index
+
+
+def train_index(index: faiss.Index, vectors: np.ndarray, seed: int = 0) -> None:
+    """Train index on a random sample of at most VECTOR_TRAIN_SAMPLE rows, if it needs training."""
+    if index.is_trained:
+        return
+    if len(vectors) > VECTOR_TRAIN_SAMPLE:
+        rows = np.random.default_rng(seed).choice(len(vectors), VECTOR_TRAIN_SAMPLE, replace=False)
+        vectors = vectors[np.sort(rows)]
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def build_index(vectors, index_type: str | None = None) -> faiss.Index:
+    """Create, train and fill an index over an (n, dim) matrix."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = make_index(vectors.shape[1], len(vectors), index_type)
+    train_index(index, vectors)
+    index.add(vectors)
+    return index
+
+
+def build_vectorstore(
+    texts, embeddings, vectors=None, index_type: str | None = None, keyword_texts=None, metadatas=None
+):
+    """
+    Build a FAISS store over texts. Pass precomputed vectors to skip re-embedding,
+    keyword_texts (one per text, e.g. the uncompressed chunks) to attach a BM25 index,
+    and metadatas (one dict per text, e.g. its page) for the documents' metadata.
+    """
+    if vectors is None:
+        vectors = embeddings.embed_documents(list(texts))
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = make_index(vectors.shape[1], len(vectors), index_type)
+    train_index(index, vectors)
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas)
+    enable_reconstruct(index)
+    vectorstore.sparse_index = sparse_index.BM25Index.build(keyword_texts) if keyword_texts is not None else None
+    return vectorstore
+
+
+def save_vectorstore(vectorstore, folder_path, with_index: bool = True) -> None:
+    """Write the store to folder_path; with_index=False writes only its BM25 index."""
+    if with_index:
+        vectorstore.save_local(str(folder_path))
+    else:
+        os.makedirs(folder_path, exist_ok=True)
+    keywords = getattr(vectorstore, "sparse_index", None)
+    if keywords is not None:
+        keywords.save(folder_path)
+
+
+def load_vectorstore(folder_path, embeddings, mmap: bool = False):
+    """
+    Load a store written by save_vectorstore. With mmap=True the index is memory-mapped
+    read-only instead of read into RAM, so several workers share one copy via the page cache.
+    """
+    io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    # Only ever called on indexes this app wrote itself (the paper cache).
+    vectorstore = FAISS.load_local(
+        str(folder_path), embeddings, allow_dangerous_deserialization=True, io_flags=io_flags
+    )
+    enable_reconstruct(tune_index(vectorstore.index))
+    vectorstore.sparse_index = sparse_index.load(folder_path)
+    return vectorstore
+
+
+def restore_vectorstore(texts, embeddings, vectors, folder_path, index_type: str | None = None, metadatas=None):
+    """
+    Rebuild a store saved with with_index=False: the FAISS index from vectors (e.g. a
+    dequantized matrix), and the BM25 index from folder_path.
+    """
+    vectorstore = build_vectorstore(texts, embeddings, vectors, index_type, metadatas=metadatas)
+    vectorstore.sparse_index = sparse_index.load(folder_path)
+    return vectorstore
+
+
+def write_index(index: faiss.Index, path) -> None:
+    faiss.write_index(index, str(path))
+
+
+def read_index(path, mmap: bool = False) -> faiss.Index:
+    io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    return tune_index(faiss.read_index(str(path), io_flags))
+
+
+def reconstruct(index: faiss.Index, ids) -> np.ndarray:
+    """
+    Stored vectors for the given positions (approximate for PQ indexes). IVF indexes
+    need enable_reconstruct() first; build_vectorstore and load_vectorstore call it.
+    """
+    return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
@@ -0,0 +1,82 @@
+import bisect
+import random
+import unittest
+
+from rag.chunker import CHUNK_OVERLAP, CHUNK_SIZE, ChunkSpans, iter_chunks, sections, split_text
+
+
+def _paragraphs(rng: random.Random, count: int) -> str:
+    words = "model data training results attention layer retrieval baseline accuracy method".split()
+    return "\n\n".join(
+        " ".join(" ".join(rng.choice(words) for _ in range(12)).capitalize() + "." for _ in range(5))
+        for _ in range(count)
+    )
+
+
+class ChunkSpansTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(0)
+        cls.text = (
+            "A Study of Chunking\n\n"
+            f"1 Introduction\n{_paragraphs(rng, 6)}\n"
+            f"2 Method\n{_paragraphs(rng, 8)}\n"
+            f"3 Results\n{_paragraphs(rng, 4)}\n"
+            "References\n[1] A. Author. A paper. 2020.\n[2] B. Author. Another paper. 2021.\n"
+        )
+        cls.page_starts = list(range(0, len(cls.text), 1500))
+        cls.chunks, cls.spans = split_text(cls.text, cls.page_starts)
+
+    def test_offsets_slice_the_chunks_out_of_the_text(self):
+        self.assertEqual(len(self.spans), len(self.chunks))
+        for chunk, start, end in zip(self.chunks, self.spans.starts, self.spans.ends):
+            self.assertEqual(self.text[start:end], chunk)
+            self.assertLessEqual(len(chunk), CHUNK_SIZE)
+
+    def test_pages(self):
+        for start, page in zip(self.spans.starts, self.spans.pages):
+            self.assertEqual(page, bisect.bisect_right(self.page_starts, start))
+        self.assertEqual(self.spans.pages[0], 1)
+        self.assertGreater(self.spans.pages[-1], 1)
+
+    def test_sections_and_headings(self):
+        titles = [self.spans.titles[i] if i >= 0 else None for i in self.spans.sections]
+        # The paper title is not a section heading.
+        self.assertEqual(list(dict.fromkeys(titles)), [None, "1 Introduction", "2 Method", "3 Results"])
+        # A heading always starts a chunk.
+        for title in ("1 Introduction", "2 Method", "3 Results"):
+            first = titles.index(title)
+            self.assertTrue(self.chunks[first].startswith(title))
+
+    def test_references_are_skipped(self):
+        self.assertFalse(any("A. Author" in chunk for chunk in self.chunks))
+
+    def test_overlap_within_a_section(self):
+        for i in range(1, len(self.chunks)):
+            if self.spans.sections[i] != self.spans.sections[i - 1]:
+                continue
+            overlap = self.spans.ends[i - 1] - self.spans.starts[i]
+            self.assertGreater(overlap, 0)
+            self.assertLessEqual(overlap, CHUNK_OVERLAP)
+
+    def test_metadata(self):
+        metadata = self.spans.metadata()
+        self.assertEqual(len(metadata), len(self.chunks))
+        self.assertEqual(
+            metadata[1],
+            {"page": self.spans.pages[1], "start": self.spans.starts[1], "end": self.spans.ends[1], "section": "1 Introduction"},
+        )
+
+    def test_same_chunks_with_or_without_spans(self):
+        self.assertEqual(list(iter_chunks(self.text)), self.chunks)
+        spans = ChunkSpans()
+        list(iter_chunks(self.text, spans=spans))
+        self.assertEqual(set(spans.pages), {0})
+
+    def test_text_before_the_first_heading(self):
+        bounds = sections("Untitled preamble.\n\n1 Introduction\nBody text.")
+        self.assertEqual([title for _, _, title in bounds], [None, "1 Introduction"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from rag import compressor
+
+
+class _BadBodyHandler(BaseHTTPRequestHandler):
+    """Answers 200 with a body that holds no compressed text: a JSON list, or broken JSON."""
+
+    bodies = {"/list/": b'["not", "text"]', "/broken/": b'{"compressed": '}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = self.bodies[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CompressFallbackTests(unittest.TestCase):
+    """A chunk whose compress response is unusable is kept as it is; the paper does not fail."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _BadBodyHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _env(self, path):
+        return mock.patch.dict(os.environ, {
+            "SCALEDOWN_API_KEY": "test", "SCALEDOWN_COMPRESS_URL": self.base + path,
+        })
+
+    def setUp(self):
+        patcher = mock.patch.object(compressor, "COMPRESS_MODE", "api")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Keep the test off the shared compress cache file.
+        cache = mock.patch("llm.scaledown_compress.COMPRESS_CACHE_MAX_ENTRIES", 0)
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def test_unusable_bodies_fall_back_to_the_chunk(self):
+        chunks = ["first chunk of text", "second chunk of text"]
+        for path in _BadBodyHandler.bodies:
+            with self.subTest(path=path), self._env(path):
+                self.assertEqual(compressor.compress_chunks(chunks), chunks)
+                self.assertEqual(asyncio.run(compressor.acompress_chunks(chunks)), chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
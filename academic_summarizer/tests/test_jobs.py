@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api import jobs
+from api.models import SummaryJob
+
+
+def _wait_for(job_id, status, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    job = SummaryJob.objects.get(pk=job_id)
+    while job.status != status and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job.refresh_from_db()
+    return job
+
+
+class SummaryJobTests(TransactionTestCase):
+    """Jobs run by api.jobs: submitted here, or taken over from a worker whose lease expired."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings = override_settings(JOB_UPLOAD_DIR=self.tmp, JOB_LEASE_SECONDS=60)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        summarize = mock.patch("rag.summarize.summarize_pdf", return_value="A summary.")
+        self.summarize = summarize.start()
+        self.addCleanup(summarize.stop)
+
+    def test_submit_runs_the_job_to_done(self):
+        # No owner id yet, as in a fresh worker: submit() and the lease thread race to make it.
+        jobs._owner = None
+        job = jobs.submit(SimpleUploadedFile("paper.pdf", b"%PDF-1.4"), "Summarize", "rag")
+
+        job = _wait_for(job.id, SummaryJob.Status.DONE)
+        self.assertEqual(job.status, SummaryJob.Status.DONE)
+        self.assertEqual(job.result, "A summary.")
+        self.assertEqual(job.owner, jobs.owner())
+        self.assertFalse(Path(job.file_path).exists())
+
+    def test_expired_lease_is_taken_over(self):
+        now = timezone.now()
+        expired, live = [], []
+        for heartbeat, group in ((now - timedelta(seconds=120), expired), (now, live)):
+            path = Path(self.tmp) / f"{uuid.uuid4()}.pdf"
+            path.write_bytes(b"%PDF-1.4")
+            group.append(SummaryJob.objects.create(
+                query="Summarize", file_path=str(path), owner="other-host:1:dead", heartbeat_at=heartbeat,
+                status=SummaryJob.Status.RUNNING,
+            ))
+
+        jobs._claim_expired()
+
+        job = _wait_for(expired[0].id, SummaryJob.Status.DONE)
+        self.assertEqual(job.status, SummaryJob.Status.DONE)
+        self.assertEqual(job.owner, jobs.owner())
+        live_job = SummaryJob.objects.get(pk=live[0].id)
+        self.assertEqual(live_job.status, SummaryJob.Status.RUNNING)
+        self.assertEqual(live_job.owner, "other-host:1:dead")
+        self.assertEqual(self.summarize.call_count, 1)
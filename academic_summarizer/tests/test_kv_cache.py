@@ -0,0 +1,32 @@
+import shutil
+import tempfile
+import unittest
+
+from llm.kv_cache import SQLiteCache
+
+
+class UnusableFileTests(unittest.TestCase):
+    """A cache whose file cannot be opened degrades to misses and no-ops instead of raising."""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        # A directory where the SQLite file should be.
+        self.cache = SQLiteCache("test", path=tmp)
+
+    def test_every_method_degrades(self):
+        with self.assertLogs("llm.kv_cache", "WARNING"):
+            self.assertIsNone(self.cache.get("key"))
+            self.cache.set("key", "value")
+            self.assertTrue(self.cache.add("key", "value"))
+            self.assertTrue(self.cache.touch("key", "value"))
+            self.cache.update("key", lambda value: "value")
+            self.cache.delete("key")
+            self.cache.delete("key", "value")
+            self.cache.clear()
+            self.assertEqual(self.cache.evict(), 0)
+        self.assertIsNone(self.cache.stats()["entries"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import httpx
+import requests
+
+from bench.fake_llm_server import _completion_words, start_in_thread
+from llm import async_sessions, response_cache
+from llm.kv_cache import SQLiteCache
+from llm.scaledown_client import AsyncScaleDownLLM, ScaleDownLLM, _sse_content
+
+
+def _chunk(content: str) -> str:
+    return 'data: {"choices": [{"index": 0, "delta": {"content": "%s"}}]}' % content
+
+
+def _expected(prompt: str) -> str:
+    return " ".join(_completion_words(prompt))
+
+
+class SseContentTests(unittest.TestCase):
+    def test_delta_content(self):
+        self.assertEqual(_sse_content(_chunk("Hello")), ["Hello"])
+
+    def test_done_and_other_lines_carry_no_text(self):
+        for line in ("data: [DONE]", "", ": keep-alive", "event: ping", 'data: {"choices": []}', "data: {not json"):
+            with self.subTest(line=line):
+                self.assertEqual(_sse_content(line), [])
+
+
+class _FakeServerTestCase(unittest.TestCase):
+    """Runs ScaleDownLLM against bench.fake_llm_server, with the answer cache in a temporary file."""
+
+    server_options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = start_in_thread(**cls.server_options)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.cache = SQLiteCache("llm_responses", path=os.path.join(tmp, "kv.sqlite3"))
+        for patcher in (
+            mock.patch.object(response_cache, "exact_cache", self.cache),
+            mock.patch.dict(os.environ, {
+                "LLM_PROVIDERS": "openai", "OPENAI_API_KEY": "test", "OPENAI_BASE_URL": self.url,
+                "OPENAI_MODEL": "fake-model",
+            }),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, prompt: str) -> list[str]:
+        return list(ScaleDownLLM().generate_stream(prompt))
+
+    def astream(self, prompt: str) -> list[str]:
+        async def collect():
+            try:
+                return [part async for part in AsyncScaleDownLLM().generate_stream(prompt)]
+            finally:
+                await async_sessions.close_all()
+
+        return asyncio.run(collect())
+
+
+class GenerateStreamTests(_FakeServerTestCase):
+    def test_stream_is_assembled_and_cached(self):
+        parts = self.stream("a prompt")
+        self.assertGreater(len(parts), 1)
+        self.assertEqual("".join(parts), _expected("a prompt"))
+        calls = self.server.stats["chat"]
+
+        # Read back from the cache in one piece, without another request.
+        self.assertEqual(self.stream("a prompt"), [_expected("a prompt")])
+        self.assertEqual(self.server.stats["chat"], calls)
+
+    def test_async_stream_is_assembled_and_cached(self):
+        parts = self.astream("an async prompt")
+        self.assertGreater(len(parts), 1)
+        self.assertEqual("".join(parts), _expected("an async prompt"))
+        self.assertEqual(self.astream("an async prompt"), [_expected("an async prompt")])
+
+
+class SplitLineStreamTests(_FakeServerTestCase):
+    # Every event arrives in two HTTP chunks, cut in the middle of its JSON.
+    server_options = {"split_lines": True}
+
+    def test_lines_split_across_chunks(self):
+        self.assertEqual("".join(self.stream("split prompt")), _expected("split prompt"))
+        self.assertEqual("".join(self.astream("split async prompt")), _expected("split async prompt"))
+
+
+class FailedStreamTests(_FakeServerTestCase):
+    # The connection drops after three tokens.
+    server_options = {"fail_after": 3}
+
+    def test_error_mid_stream_is_raised_and_not_cached(self):
+        parts = []
+        with self.assertRaises(requests.RequestException):
+            for part in ScaleDownLLM().generate_stream("doomed prompt"):
+                parts.append(part)
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_async_error_mid_stream_is_raised_and_not_cached(self):
+        with self.assertRaises(httpx.HTTPError):
+            self.astream("doomed async prompt")
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
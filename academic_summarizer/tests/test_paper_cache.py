@@ -0,0 +1,31 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from rag import paper_cache
+
+
+class SaveTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        patcher = mock.patch.object(paper_cache, "PAPER_CACHE_DIR", self.dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_save_leaves_no_partial_entry(self):
+        # Not only OSError: a serialization error or an interrupt mid-write.
+        for error in (ValueError("cannot serialize"), KeyboardInterrupt()):
+            with self.subTest(error=type(error).__name__):
+                with mock.patch("rag.vector_store.save_vectorstore", side_effect=error):
+                    with self.assertRaises(type(error)):
+                        paper_cache.save("key", "text", ["chunk"], ["chunk"], np.ones((1, 4), np.float32), None)
+                self.assertEqual(list(self.dir.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
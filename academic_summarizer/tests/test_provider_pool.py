@@ -0,0 +1,89 @@
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+
+from llm import provider_pool
+from llm.provider_pool import Provider, ProviderPool
+from llm.scaledown_client import _parse_weights
+
+
+def _provider(name: str, weight: int = 1) -> Provider:
+    return Provider(name, f"https://{name}.example/v1", f"key-{name}", "model", weight=weight)
+
+
+class WeightedRoundRobinTests(unittest.TestCase):
+    def test_calls_follow_the_weights_evenly_interleaved(self):
+        heavy, light = _provider("heavy", weight=3), _provider("light")
+        pool = ProviderPool([heavy, light])
+        picks = [pool.choose() for _ in range(8)]
+        self.assertEqual(Counter(picks), {heavy: 6, light: 2})
+        # Smooth round-robin: the light provider is not starved until the end of a cycle.
+        self.assertIn(light, picks[:4])
+
+    def test_exclude(self):
+        first, second = _provider("first"), _provider("second")
+        pool = ProviderPool([first, second])
+        self.assertEqual({pool.choose(exclude={first}) for _ in range(3)}, {second})
+        self.assertIsNone(pool.choose(exclude={first, second}))
+
+    def test_bad_weights_fall_back_to_one(self):
+        _parse_weights.cache_clear()
+        with self.assertLogs("llm.scaledown_client", "WARNING") as logs:
+            weights = _parse_weights("groq=3,openai=x,scaledown=0")
+        self.assertEqual(weights, {"groq": 3, "openai": 1, "scaledown": 1})
+        self.assertEqual(len(logs.output), 2)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("LLM_BREAKER_FAILURES", 2), ("LLM_BREAKER_COOLDOWN", 0.2)):
+            patcher = mock.patch.object(provider_pool, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.flaky, self.steady = _provider("flaky"), _provider("steady")
+        self.pool = ProviderPool([self.flaky, self.steady])
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        self.pool.failure(self.flaky)
+        self.assertIn(self.flaky, {self.pool.choose() for _ in range(2)})
+        self.pool.failure(self.flaky)
+        # Open: every call goes to the healthy provider.
+        self.assertEqual({self.pool.choose() for _ in range(4)}, {self.steady})
+
+        with mock.patch("time.monotonic", return_value=self._later(0.3)):
+            # Half-open after the cooldown: a single trial call.
+            self.assertEqual(self.pool.choose(exclude={self.steady}), self.flaky)
+            self.assertIsNone(self.pool.choose(exclude={self.steady}))
+            self.pool.success(self.flaky, 0.1)
+            self.assertEqual(self.pool.choose(exclude={self.steady}), self.flaky)
+
+    def test_failed_trial_opens_it_again(self):
+        self.pool.failure(self.flaky)
+        self.pool.failure(self.flaky)
+        with mock.patch("time.monotonic", return_value=self._later(0.3)):
+            self.assertEqual(self.pool.choose(exclude={self.steady}), self.flaky)
+            self.pool.failure(self.flaky)
+            self.assertIsNone(self.pool.choose(exclude={self.steady}))
+
+    def test_rate_limit_pauses_only_until_retry_after(self):
+        self.pool.failure(self.flaky, retry_after=5)
+        self.pool.failure(self.steady, retry_after=2)
+        self.assertIsNone(self.pool.choose())
+        self.assertAlmostEqual(self.pool.wait_time(), 2, delta=0.1)
+        with mock.patch("time.monotonic", return_value=self._later(2.5)):
+            self.assertEqual(self.pool.choose(), self.steady)
+
+    def test_only_tripped_breakers_left_means_fail_fast(self):
+        for provider in (self.flaky, self.steady):
+            self.pool.failure(provider)
+            self.pool.failure(provider)
+        self.assertIsNone(self.pool.wait_time())
+
+    @staticmethod
+    def _later(seconds: float) -> float:
+        return time.monotonic() + seconds
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import email.utils
+import threading
+import time
+import unittest
+
+from llm.rate_limit import TokenBucket, parse_retry_after
+
+
+class ParseRetryAfterTests(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertEqual(parse_retry_after(" 1.5 "), 1.5)
+        self.assertEqual(parse_retry_after("-4"), 0.0)
+
+    def test_http_date(self):
+        when = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(when), 30, delta=2)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # One token to start with, then 5 more at 50 per second.
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_burst_up_to_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_zero_rate_is_unlimited_but_honours_pauses(self):
+        bucket = TokenBucket(rate=0, capacity=1)
+        start = time.monotonic()
+        for _ in range(1000):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        bucket.pause(0.2)
+        start = time.monotonic()
+        bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_pause_holds_every_waiting_caller(self):
+        bucket = TokenBucket(rate=0, capacity=1)
+        bucket.pause(0.2)
+        finished = []
+
+        def worker():
+            bucket.acquire()
+            finished.append(time.monotonic())
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(finished), 4)
+        self.assertGreaterEqual(min(finished) - start, 0.18)
+
+    def test_acquire_async(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+
+        async def main():
+            start = time.monotonic()
+            await asyncio.gather(*(bucket.acquire_async() for _ in range(6)))
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(main()), 0.09)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from bench.fake_llm_server import _completion_words, start_in_thread
+from llm import response_cache
+from llm.kv_cache import SQLiteCache
+from llm.scaledown_client import ScaleDownLLM
+
+
+def _vector(seed: int) -> np.ndarray:
+    vector = np.random.default_rng(seed).normal(size=32)
+    return vector / np.linalg.norm(vector)
+
+
+class SemanticCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.cache = SQLiteCache("llm_semantic", path=os.path.join(tmp, "kv.sqlite3"))
+        for patcher in (
+            mock.patch.object(response_cache, "semantic_cache", self.cache),
+            mock.patch.object(response_cache, "LLM_SEMANTIC_THRESHOLD", 0.95),
+            mock.patch.object(response_cache, "LLM_SEMANTIC_MAX_PER_PAPER", 1000),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_scope_must_match_one_of_the_providers(self):
+        scope = response_cache.semantic_scope("rag", "openai", "gpt-4o-mini")
+        response_cache.semantic_put("paper", scope, "Summarize this paper", _vector(1), "the answer")
+
+        groq = response_cache.semantic_scope("rag", "groq", "llama")
+        self.assertIsNone(response_cache.semantic_get("paper", [groq], _vector(1)))
+        self.assertEqual(response_cache.semantic_get("paper", [groq, scope], _vector(1)), "the answer")
+        self.assertIsNone(response_cache.semantic_get("paper", [scope], _vector(2)))
+
+    def test_concurrent_puts_keep_every_entry(self):
+        scope = response_cache.semantic_scope("rag", "openai", "gpt-4o-mini")
+        barrier = threading.Barrier(8)
+
+        def put(worker):
+            barrier.wait()
+            for i in range(8):
+                response_cache.semantic_put("paper", scope, f"query {worker}.{i}", _vector(worker * 8 + i), "answer")
+
+        threads = [threading.Thread(target=put, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(response_cache._entries(self.cache.get("paper"))), 64)
+
+
+class AnsweredByTests(unittest.TestCase):
+    """The provider that answers is reported, so answers are cached under it rather than the first one."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = start_in_thread()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        cache = SQLiteCache("llm_responses", path=os.path.join(tmp, "kv.sqlite3"))
+        for patcher in (
+            mock.patch.object(response_cache, "exact_cache", cache),
+            # Groq comes first in the pool but nothing listens on its port.
+            mock.patch.dict(os.environ, {
+                "LLM_PROVIDERS": "groq,openai",
+                "GROQ_API_KEY": "test", "GROQ_BASE_URL": "http://127.0.0.1:1", "GROQ_MODEL": "down-model",
+                "OPENAI_API_KEY": "test", "OPENAI_BASE_URL": self.url, "OPENAI_MODEL": "fake-model",
+            }),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failover_and_cache_hit_report_the_answering_provider(self):
+        llm = ScaleDownLLM()
+        self.assertEqual(llm.model, "down-model")
+        self.assertEqual(llm.cache_targets(), [("groq", "down-model"), ("openai", "fake-model")])
+
+        answered_by = {}
+        answer = llm.generate("which provider", answered_by=answered_by)
+        self.assertEqual(answer, " ".join(_completion_words("which provider")))
+        self.assertEqual(answered_by, {"provider": "openai", "model": "fake-model"})
+
+        calls = self.server.stats["chat"]
+        answered_by = {}
+        self.assertEqual(llm.generate("which provider", answered_by=answered_by), answer)
+        self.assertEqual(self.server.stats["chat"], calls)
+        self.assertEqual(answered_by, {"provider": "openai", "model": "fake-model"})
+
+
+if __name__ == "__main__":
+    unittest.main()
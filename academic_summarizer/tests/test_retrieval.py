@@ -0,0 +1,137 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag import retriever, sparse_index
+from rag.retriever import fuse_rankings, pack_context
+from rag.sparse_index import BM25Index, tokenize
+from rag.vector_store import build_vectorstore, load_vectorstore, reconstruct, save_vectorstore
+
+
+class TokenizeTests(unittest.TestCase):
+    def test_compounds_are_kept_whole_and_split(self):
+        self.assertEqual(tokenize("Results on ImageNet-1k"), ["results", "imagenet-1k", "imagenet", "1k"])
+
+    def test_stop_words_are_dropped(self):
+        self.assertEqual(tokenize("The model and the data"), ["model", "data"])
+
+
+class BM25Tests(unittest.TestCase):
+    texts = [
+        "the cat sat on the mat",
+        "ImageNet-1k top-1 accuracy of the baseline",
+        "imagenet is a large dataset of images",
+        "accuracy accuracy accuracy on a benchmark that is long and full of other words",
+        "",
+    ]
+
+    def setUp(self):
+        self.index = BM25Index.build(self.texts)
+
+    def test_exact_term_ranks_first(self):
+        # The query's parts ("imagenet") match too, but the whole compound ranks first.
+        self.assertEqual(list(self.index.top("imagenet-1k", 5)), [1, 2])
+        self.assertEqual(set(self.index.top("imagenet", 5)), {1, 2})
+
+    def test_only_matching_chunks_at_most_k(self):
+        self.assertEqual(len(self.index.top("zebra", 3)), 0)
+        self.assertEqual(len(self.index.top("accuracy imagenet", 1)), 1)
+        self.assertEqual(self.index.scores("zebra").shape, (len(self.texts),))
+
+    def test_rare_terms_weigh_more(self):
+        scores = self.index.scores("cat accuracy")
+        self.assertGreater(scores[0], scores[1])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.index.save(folder)
+            loaded = sparse_index.load(folder)
+        np.testing.assert_allclose(loaded.scores("imagenet accuracy"), self.index.scores("imagenet accuracy"))
+        self.assertIsNone(sparse_index.load(folder))
+
+
+class FuseRankingsTests(unittest.TestCase):
+    def test_agreement_beats_one_top_rank(self):
+        best, scores = fuse_rankings([[7, 3, 5], [3, 9]], k=10)
+        self.assertEqual(best[0], 3)
+        self.assertEqual(set(best), {3, 5, 7, 9})
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_k(self):
+        best, scores = fuse_rankings([[1, 2, 3], [4, 5, 6]], k=2)
+        self.assertEqual(len(best), 2)
+        self.assertEqual(len(scores), 2)
+
+
+class _FixedQuery(Embeddings):
+    """Every query embeds to the same vector; documents come with precomputed vectors."""
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_documents(self, texts):
+        raise AssertionError("documents are embedded up front")
+
+    def embed_query(self, text):
+        return list(self.vector)
+
+
+class PackContextTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(8, 16)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        cls.texts = [f"Chunk {i} discusses the general approach in some detail." for i in range(8)]
+        # The only chunk naming the dataset, and the one least similar to the query embedding.
+        query = vectors[0]
+        cls.keyword_chunk = int(np.argmin(vectors @ query))
+        cls.texts[cls.keyword_chunk] = "Results on SQuAD2.0 are reported in Table 4."
+        cls.store = build_vectorstore(
+            cls.texts, _FixedQuery(query), vectors=vectors, index_type="flat", keyword_texts=cls.texts,
+            metadatas=[{"page": i + 1} for i in range(8)],
+        )
+
+    def pack(self, mode: str):
+        with mock.patch.object(retriever, "RETRIEVE_MODE", mode), mock.patch.object(retriever, "RETRIEVE_CANDIDATES", 3):
+            return pack_context(self.store, "SQuAD2.0 results", budget=10000)
+
+    def test_hybrid_finds_the_exact_term_dense_misses(self):
+        self.assertNotIn(self.texts[self.keyword_chunk], self.pack("dense").texts)
+        self.assertIn(self.texts[self.keyword_chunk], self.pack("hybrid").texts)
+
+    def test_texts_in_document_order_with_their_metadata(self):
+        packed = self.pack("hybrid")
+        pages = [entry["page"] for entry in packed.metadata]
+        self.assertEqual(pages, sorted(pages))
+        self.assertEqual([self.texts[page - 1] for page in pages], packed.texts)
+
+    def test_budget(self):
+        with mock.patch.object(retriever, "RETRIEVE_MODE", "hybrid"):
+            packed = pack_context(self.store, "approach", budget=15)
+        self.assertLessEqual(packed.tokens, 15)
+        self.assertEqual(len(packed.texts), 1)
+
+
+class ReconstructTests(unittest.TestCase):
+    def test_ivf_stores_are_ready_to_reconstruct_when_built_or_loaded(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+        store = build_vectorstore(
+            [str(i) for i in range(2000)], _FixedQuery(vectors[0]), vectors=vectors, index_type="ivf_flat"
+        )
+        with tempfile.TemporaryDirectory() as folder:
+            save_vectorstore(store, folder)
+            loaded = load_vectorstore(folder, _FixedQuery(vectors[0]))
+        for index in (store.index, loaded.index):
+            # Retrieval threads only read the index: the direct map must already exist.
+            self.assertNotEqual(faiss.extract_index_ivf(index).direct_map.type, faiss.DirectMap.NoMap)
+            np.testing.assert_allclose(reconstruct(index, [3, 1999]), vectors[[3, 1999]], rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
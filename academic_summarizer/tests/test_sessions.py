@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm import sessions
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.dumps({"echo": json.loads(body)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is needed to make a test certificate")
+class HttpsSessionTests(unittest.TestCase):
+    """sessions.post over TLS: SNI and hostname verification must use the hostname, not the resolved IP."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.cert = os.path.join(cls.tmp, "cert.pem")
+        key = os.path.join(cls.tmp, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+             "-keyout", key, "-out", cls.cert],
+            check=True, capture_output=True,
+        )
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cls.cert, key)
+        cls.server.socket = context.wrap_socket(cls.server.socket, server_side=True)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"https://localhost:{cls.server.server_address[1]}/v1/chat"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_post_verifies_the_hostname(self):
+        response = sessions.post(self.url, json={"n": 1}, verify=self.cert)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"echo": {"n": 1}})
+        self.assertFalse(response.timing.reused)
+        self.assertGreaterEqual(response.timing.dns, 0.0)
+        self.assertGreater(response.timing.connect, 0.0)
+
+        again = sessions.post(self.url, json={"n": 2}, verify=self.cert)
+        self.assertEqual(again.json(), {"echo": {"n": 2}})
+        self.assertTrue(again.timing.reused)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from llm import single_flight
+from llm.kv_cache import SQLiteCache
+
+_TIMEOUT = 0.3
+
+
+class SingleFlightTests(unittest.TestCase):
+    """Claims and results live in a temporary cache file; a claim expires after 0.3 s unless renewed."""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path = os.path.join(tmp, "kv.sqlite3")
+        self.claims = SQLiteCache("single_flight_claims", ttl_seconds=_TIMEOUT, path=path)
+        self.results = SQLiteCache("single_flight_results", ttl_seconds=_TIMEOUT, path=path)
+        for name, value in (
+            ("SINGLE_FLIGHT", True), ("SINGLE_FLIGHT_TIMEOUT", _TIMEOUT), ("SINGLE_FLIGHT_POLL", 0.02),
+            ("_claims", self.claims), ("_results", self.results),
+            # A renewer started by an earlier test may be asleep for its old interval.
+            ("_renewer", None),
+        ):
+            patcher = mock.patch.object(single_flight, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow(self, result="answer", seconds=0.2):
+        def fn():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(seconds)
+            return result
+
+        return fn
+
+    def test_concurrent_calls_share_one_computation(self):
+        fn = self.slow()
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(lambda _: single_flight.do("key", fn), range(5)))
+        self.assertEqual(results, ["answer"] * 5)
+        self.assertEqual(self.calls, 1)
+        # The finished leader released its claim.
+        self.assertTrue(self.claims.add("key", "someone else"))
+
+    def test_followers_share_the_leaders_error(self):
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("provider down")
+
+        errors = []
+
+        def call(fn):
+            try:
+                single_flight.do("key", fn)
+            except RuntimeError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call, args=(fail,))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call, args=(self.slow(),))
+        follower.start()
+        leader.join()
+        follower.join()
+        self.assertEqual([str(e) for e in errors], ["provider down"] * 2)
+        self.assertEqual(self.calls, 0)
+
+    def test_result_published_by_another_worker(self):
+        self.assertTrue(self.claims.add("key", "other-worker"))
+
+        def other_worker_finishes():
+            time.sleep(0.1)
+            self.results.set("key", "theirs")
+            self.claims.delete("key", "other-worker")
+
+        threading.Thread(target=other_worker_finishes).start()
+        self.assertEqual(single_flight.do("key", self.slow()), "theirs")
+        self.assertEqual(self.calls, 0)
+
+    def test_abandoned_claim_is_taken_over(self):
+        # Claimed by a worker that died: nobody renews it.
+        self.assertTrue(self.claims.add("key", "dead-worker"))
+        start = time.monotonic()
+        self.assertEqual(single_flight.do("key", self.slow(seconds=0)), "answer")
+        self.assertEqual(self.calls, 1)
+        self.assertGreaterEqual(time.monotonic() - start, _TIMEOUT * 0.9)
+
+    def test_long_leader_keeps_its_claim(self):
+        leader = threading.Thread(target=single_flight.do, args=("key", self.slow(seconds=4 * _TIMEOUT)))
+        leader.start()
+        time.sleep(3 * _TIMEOUT)
+        # Well past the timeout, yet another worker still cannot take the claim.
+        self.assertFalse(self.claims.add("key", "other-worker"))
+        leader.join()
+        self.assertEqual(self.calls, 1)
+
+    def test_async_calls_share_one_computation(self):
+        async def compute():
+            with self.calls_lock:
+                self.calls += 1
+            await asyncio.sleep(0.1)
+            return "answer"
+
+        async def main():
+            return await asyncio.gather(*(single_flight.ado("key", compute) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(main()), ["answer"] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_disabled(self):
+        with mock.patch.object(single_flight, "SINGLE_FLIGHT", False), ThreadPoolExecutor(3) as pool:
+            list(pool.map(lambda _: single_flight.do("key", self.slow()), range(3)))
+        self.assertEqual(self.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from api.uploads import PdfUpload
+from rag import compressor, extractive, summarize
+
+
+class _RecordingUpload(PdfUpload):
+    instances = []
+
+    def __init__(self, request, upload, *args, **kwargs):
+        super().__init__(request, upload, *args, **kwargs)
+        self.upload = upload
+        self.instances.append(self)
+
+
+class SummarizeStreamViewTests(SimpleTestCase):
+    def test_unread_stream_releases_the_upload(self):
+        # A client that disconnects before the stream starts: the generator never runs.
+        with mock.patch("api.views.PdfUpload", _RecordingUpload):
+            response = self.client.post(
+                "/api/summarize/stream/", {"file": SimpleUploadedFile("paper.pdf", b"%PDF-1.4 tiny")}
+            )
+        self.assertEqual(response.status_code, 200)
+        upload = _RecordingUpload.instances[-1]
+        self.assertIsInstance(upload.source, memoryview)
+
+        response.close()
+        self.assertIsNone(upload._view)
+        # Django could close the in-memory file only because no buffer export was left.
+        self.assertTrue(upload.upload.file.closed)
+
+
+class CompressViewTests(SimpleTestCase):
+    """In extractive mode only a context the caller gave biases which sentences are kept."""
+
+    def setUp(self):
+        text = "Our method reaches 91.2% accuracy on ImageNet. The weather was pleasant that year. " * 4
+        for patcher in (
+            mock.patch.object(compressor, "COMPRESS_MODE", "extractive"),
+            mock.patch.object(summarize, "_extract", return_value=(text, [0])),
+            mock.patch.object(extractive, "compress_text", wraps=extractive.compress_text),
+        ):
+            self.compress_text = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _queries(self, **form):
+        for url in ("/api/compress/", "/api/async/compress/"):
+            data = {"file": SimpleUploadedFile("paper.pdf", b"%PDF-1.4 tiny"), **form}
+            self.assertEqual(self.client.post(url, data).status_code, 200)
+        return [call.kwargs["query"] for call in self.compress_text.call_args_list]
+
+    def test_no_context_scores_by_centrality_alone(self):
+        self.assertEqual(self._queries(), [None, None])
+
+    def test_given_context_is_the_query(self):
+        self.assertEqual(self._queries(context="accuracy results"), ["accuracy results", "accuracy results"])
+
+
+class SummarizeBatchViewTests(SimpleTestCase):
+    def _post(self, queries):
+        data = {"file": SimpleUploadedFile("paper.pdf", b"%PDF-1.4 tiny"), "queries": queries}
+        return self.client.post("/api/summarize/batch/", data)
+
+    def test_queries_must_be_non_empty_strings(self):
+        for queries in ('[{"a": 1}]', "[1, 2]", '["fine", null]', '["fine", "  "]', ["fine", ""], "[broken"):
+            with self.subTest(queries=queries), mock.patch("api.pipeline.answer_queries") as answer_queries:
+                self.assertEqual(self._post(queries).status_code, 400)
+                answer_queries.assert_not_called()
+
+    def test_form_fields_and_json_list(self):
+        for queries in (["first ", "second"], '["first", " second"]'):
+            with self.subTest(queries=queries), mock.patch(
+                "api.pipeline.answer_queries", return_value={"results": []}
+            ) as answer_queries:
+                self.assertEqual(self._post(queries).status_code, 200)
+                self.assertEqual(answer_queries.call_args.args[1], ["first", "second"])